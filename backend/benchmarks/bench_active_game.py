@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Active-game lookup and create latency as archived games pile up.
+
+Seeds a scratch database with increasing numbers of archived games and times
+`find_one({"is_active": True})` and `POST /game` (via the route function) at
+each size. With the partial unique index from `ensure_indexes` both should
+stay flat; pass --no-index to see the collection-scan baseline.
+
+Requires a reachable MongoDB (MONGO_URL, defaults to localhost).
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi import Request, Response
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from database import ensure_indexes
+from models.game import GameCreate
+from storage.mongo import MongoGameRepository
+from routes.roulette import create_game
+
+SIZES = [0, 1_000, 10_000, 100_000]
+SEED_BATCH = 5_000
+
+
+def empty_request():
+    return Request({"type": "http", "method": "POST", "path": "/", "headers": [], "query_string": b""})
+
+
+async def seed_archived(db, count, start):
+    """Insert `count` archived games after the first `start` ones"""
+    base = datetime.utcnow() - timedelta(days=365)
+    for offset in range(start, start + count, SEED_BATCH):
+        batch = min(SEED_BATCH, start + count - offset)
+        await db.games.insert_many([
+            {
+                "batches": [0],
+                "participant_count": 6,
+                "winner_count": 0,
+                "created_at": base + timedelta(seconds=offset + i),
+                "updated_at": base + timedelta(seconds=offset + i),
+                "is_active": False,
+                "version": 0
+            }
+            for i in range(batch)
+        ])
+
+
+async def time_ms(coro_factory, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await coro_factory()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), max(samples)
+
+
+async def main(args):
+    client = AsyncIOMotorClient(os.environ.get('MONGO_URL', 'mongodb://localhost:27017'))
+    db = client[args.db_name]
+    await db.games.drop()
+    await db.participants.drop()
+    await db.winners.drop()
+    if not args.no_index:
+        await ensure_indexes(db)
+
+    print(f"{'archived':>10} {'lookup p50':>12} {'lookup max':>12} {'create p50':>12} {'create max':>12}")
+    seeded = 0
+    for size in SIZES:
+        await seed_archived(db, size - seeded, seeded)
+        seeded = size
+
+        lookup = await time_ms(lambda: db.games.find_one({"is_active": True}), args.repeat)
+        create = await time_ms(
+            lambda: create_game(
+                GameCreate(participants=["A", "B", "C"]), empty_request(), Response(), repo=MongoGameRepository(db)
+            ),
+            args.repeat
+        )
+        print(f"{size:>10} {lookup[0]:>10.2f}ms {lookup[1]:>10.2f}ms {create[0]:>10.2f}ms {create[1]:>10.2f}ms")
+
+    await db.games.drop()
+    await db.participants.drop()
+    await db.winners.drop()
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--db-name", default="roulette_bench")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--no-index", action="store_true", help="skip ensure_indexes to measure the scan baseline")
+    asyncio.run(main(parser.parse_args()))
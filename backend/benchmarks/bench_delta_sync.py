@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Bytes per poll for a client following a big game, full reads against deltas.
+
+Creates a game with --participants names and spins it --spins times; after
+every spin a poller catches up the way a client would, through each of:
+
+  full            GET /games/{id}, uncompressed (what pollers did before)
+  full gzip/br    the same with Accept-Encoding
+  delta           GET /games/{id}/changes?since=<its version>
+  snapshot gzip   the changes route for a client further behind than the
+                  change feed reaches, answered with the compressed game
+
+Reports the median response body size and route time per poll. Route
+functions are called directly, so HTTP framing is not counted.
+
+With --storage mongo (the default) this needs a reachable MongoDB
+(MONGO_URL, defaults to localhost); --storage memory runs without one.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi import Request, Response
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from database import ensure_indexes
+from storage.memory import MemoryGameRepository
+from storage.mongo import MongoGameRepository
+from routes.roulette import get_current_game, get_game_changes, spin_roulette
+from services import serialization
+
+
+def make_request(encoding=None):
+    headers = [(b"accept-encoding", encoding.encode())] if encoding else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers, "query_string": b""})
+
+
+async def poll_full(repo, game_id, version, encoding):
+    return await get_current_game(make_request(encoding), Response(), game_id=game_id, repo=repo)
+
+
+async def poll_delta(repo, game_id, version, encoding):
+    return await get_game_changes(make_request(encoding), Response(), since=version - 1, game_id=game_id, repo=repo)
+
+
+async def poll_behind(repo, game_id, version, encoding):
+    return await get_game_changes(make_request(encoding), Response(), since=-1, game_id=game_id, repo=repo)
+
+
+async def main(args):
+    client = None
+    if args.storage == "memory":
+        repo = MemoryGameRepository()
+    else:
+        client = AsyncIOMotorClient(os.environ.get('MONGO_URL', 'mongodb://localhost:27017'))
+        db = client[args.db_name]
+        await client.drop_database(args.db_name)
+        await ensure_indexes(db)
+        repo = MongoGameRepository(db)
+
+    game = await repo.create_game([f"Participant {i:06d}" for i in range(args.participants)], activate=False)
+    game_id = str(game["_id"])
+
+    modes = [("full", poll_full, None), ("full gzip", poll_full, "gzip")]
+    if serialization.brotli is not None:
+        modes.append(("full br", poll_full, "br"))
+    modes += [("delta", poll_delta, None), ("snapshot gzip", poll_behind, "gzip")]
+    sizes = {label: [] for label, _, _ in modes}
+    times = {label: [] for label, _, _ in modes}
+
+    for _ in range(args.spins):
+        await spin_roulette(make_request(), Response(), game_id=game_id, repo=repo)
+        version = (await repo.find_game(game_id))["version"]
+        for label, poll, encoding in modes:
+            started = time.perf_counter()
+            response = await poll(repo, game_id, version, encoding)
+            times[label].append((time.perf_counter() - started) * 1000)
+            sizes[label].append(len(response.body))
+
+    baseline = statistics.median(sizes["full"])
+    print(f"{args.participants:,} participants, {args.spins} spins, one poll per spin ({args.storage} storage)\n")
+    print(f"{'poll':<15} {'bytes p50':>12} {'vs full':>9} {'route p50':>11}")
+    for label, _, _ in modes:
+        size = statistics.median(sizes[label])
+        print(f"{label:<15} {size:>12,.0f} {size / baseline:>8.2%} {statistics.median(times[label]):>9.2f}ms")
+
+    if client is not None:
+        await client.drop_database(args.db_name)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--participants", type=int, default=10_000)
+    parser.add_argument("--spins", type=int, default=50)
+    parser.add_argument("--storage", choices=("mongo", "memory"), default="mongo")
+    parser.add_argument("--db-name", default="roulette_bench")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Draw-and-remove cost of the Fenwick-tree draw pool against the old list scan.
+
+For each pool size, times the previous spin logic (`random.choice` followed
+by rebuilding the participant list without the winner) against `DrawPool`
+pick + position lookup + remove, for each RNG mode. Pool construction, paid
+once per game version, is reported separately.
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.draw_engine import DrawPool, make_rng
+
+SIZES = [10, 10_000, 1_000_000]
+
+
+def per_draw_us(draw, spins):
+    started = time.perf_counter()
+    for _ in range(spins):
+        draw()
+    return (time.perf_counter() - started) / spins * 1e6
+
+
+def bench_size(size, spins):
+    names = [f"Participant {i}" for i in range(size)]
+    spins = min(spins, size - 1)
+    rows = []
+
+    participants = list(names)
+
+    def list_scan():
+        nonlocal participants
+        winner = random.choice(participants)
+        participants = [p for p in participants if p != winner]
+
+    rows.append(("list scan (before)", per_draw_us(list_scan, spins)))
+
+    for mode in ("pseudo", "secure", "audited"):
+        pool = DrawPool(names, [1 + i % 5 for i in range(size)])
+
+        def fenwick():
+            rng, _ = make_rng(mode)
+            index = pool.pick(rng)
+            pool.position_of(index)
+            pool.remove(index)
+
+        rows.append((f"fenwick, {mode} rng", per_draw_us(fenwick, spins)))
+
+    started = time.perf_counter()
+    DrawPool(names, [1 + i % 5 for i in range(size)])
+    build_ms = (time.perf_counter() - started) * 1000
+    return rows, build_ms
+
+
+def main(args):
+    for size in SIZES:
+        rows, build_ms = bench_size(size, args.spins)
+        print(f"\n{size:,} participants (pool build {build_ms:.2f} ms)")
+        for label, micros in rows:
+            print(f"  {label:<24} {micros:>12.2f} us/draw")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--spins", type=int, default=200)
+    main(parser.parse_args())
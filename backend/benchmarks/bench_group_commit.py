@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Spin and participant-edit latency and throughput with and without group commit.
+
+Creates --games rooms and has --spinners concurrent clients per room call
+the `POST /games/{id}/spin` route function --spins times each, first with
+one write per request (the default) and then with a GroupCommit coalescing
+the roll-forward and event log writes of concurrent requests. The same is
+done for `PUT /games/{id}/participants`. Reports requests/s, p50/p95/p99
+latency, MongoDB commands per request and, with group commit, how many
+requests shared each batch.
+
+Needs a reachable MongoDB (MONGO_URL, defaults to localhost); group commit
+only applies to the MongoDB storage. Put the write concern to compare in
+the URL, e.g. ?w=majority&journal=true.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi import HTTPException, Request, Response
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+
+from database import ensure_indexes
+from models.game import GameUpdate
+from routes.roulette import spin_roulette, update_participants
+from services.metrics import group_commit_batch_size
+from storage.group_commit import GROUP_COMMIT_MAX_OPS, GROUP_COMMIT_WINDOW_MS, GroupCommit
+from storage.mongo import MongoGameRepository
+
+
+class CommandCounter(monitoring.CommandListener):
+    """Counts the commands sent to MongoDB, i.e. round trips"""
+
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def empty_request():
+    return Request({"type": "http", "method": "POST", "path": "/", "headers": [], "query_string": b""})
+
+
+def spin(repo, game_id, names):
+    return spin_roulette(empty_request(), Response(), game_id=game_id, repo=repo)
+
+
+def edit(repo, game_id, names):
+    return update_participants(GameUpdate(participants=names), empty_request(), Response(), game_id=game_id, repo=repo)
+
+
+async def requester(call, repo, game_id, names, requests, latencies, failures):
+    for _ in range(requests):
+        started = time.perf_counter()
+        try:
+            await call(repo, game_id, names)
+        except HTTPException:
+            failures.append(game_id)
+            continue
+        latencies.append((time.perf_counter() - started) * 1000)
+
+
+async def run(label, call, repo, args, commands):
+    names = [f"Player {i}" for i in range(max(args.participants, args.spinners * args.spins + 1))]
+    rooms = [str((await repo.create_game(names, activate=False))["_id"]) for _ in range(args.games)]
+    batches = group_commit_batch_size.labels()
+    batch_count, batch_sum = batches.count, batches.sum
+    sent = commands.count
+    latencies, failures = [], []
+    started = time.perf_counter()
+    await asyncio.gather(*[
+        requester(call, repo, game_id, names, args.spins, latencies, failures)
+        for game_id in rooms
+        for _ in range(args.spinners)
+    ])
+    seconds = time.perf_counter() - started
+
+    print(f"\n{label}")
+    print(f"  requests:    {len(latencies):,} ok, {len(failures):,} failed in {seconds:.2f}s")
+    print(f"  throughput:  {len(latencies) / seconds:,.0f} requests/s")
+    if latencies:
+        print(f"  latency:     p50 {statistics.median(latencies):.1f} ms, "
+              f"p95 {percentile(latencies, 0.95):.1f} ms, p99 {percentile(latencies, 0.99):.1f} ms")
+        print(f"  commands:    {(commands.count - sent) / len(latencies):.1f} per request")
+    if batches.count > batch_count:
+        print(f"  batches:     {batches.count - batch_count:,}, "
+              f"{(batches.sum - batch_sum) / (batches.count - batch_count):.1f} requests each")
+
+
+async def main(args):
+    commands = CommandCounter()
+    client = AsyncIOMotorClient(os.environ.get('MONGO_URL', 'mongodb://localhost:27017'), event_listeners=[commands])
+    db = client[args.db_name]
+    await client.drop_database(args.db_name)
+    await ensure_indexes(db)
+
+    plain = MongoGameRepository(db)
+    grouped = MongoGameRepository(db, group_commit=GroupCommit(window=args.window_ms / 1000, max_ops=args.max_ops))
+    shape = f"{args.games:,} games x {args.spinners} clients x {args.spins} requests"
+    for name, call in (("spins", spin), ("participant edits", edit)):
+        await run(f"{name}, one write per request ({shape})", call, plain, args, commands)
+        await run(f"{name}, group commit {args.window_ms:g} ms ({shape})", call, grouped, args, commands)
+
+    await grouped.close()
+    await client.drop_database(args.db_name)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--games", type=int, default=200)
+    parser.add_argument("--spinners", type=int, default=2, help="concurrent clients per game")
+    parser.add_argument("--spins", type=int, default=10, help="requests per client")
+    parser.add_argument("--participants", type=int, default=50)
+    parser.add_argument("--window-ms", type=float, default=GROUP_COMMIT_WINDOW_MS)
+    parser.add_argument("--max-ops", type=int, default=GROUP_COMMIT_MAX_OPS)
+    parser.add_argument("--db-name", default="roulette_bench_group_commit")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+Load test: concurrent clients running a mixed workload against the API.
+
+Creates --rooms games, then runs --clients asyncio clients for --duration
+seconds. Each request picks a random room and an operation from --mix:
+
+    read     GET  /games/{id}               full game
+    summary  GET  /games/{id}/summary       counters only
+    spin     POST /games/{id}/spin          (an exhausted room is refilled)
+    update   PUT  /games/{id}/participants  fresh participant list
+
+By default the FastAPI app is called in-process through ASGI, against
+MongoDB at MONGO_URL, and every MongoDB command is counted to report DB
+operations per request. Each operation is also replayed sequentially to
+measure its own DB ops. --storage memory serves the rooms from the
+in-memory storage instead, without DB ops. With --url the requests go to
+a running server (needs httpx), and DB ops are not available.
+
+Every in-process client comes from the same address, so those runs turn
+the write rate limits off (RATE_LIMIT_CLIENT_PER_SECOND and
+RATE_LIMIT_GAME_PER_SECOND, unless set in the environment); a server
+under --url keeps its own, and requests it turns away count as errors.
+
+Reports RPS, p50/p95/p99, errors and 429s per operation. --output writes
+them as JSON, tagged with the current commit, so runs can be compared over
+time.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from pymongo import monitoring
+
+DEFAULT_MIX = "read=50,summary=20,spin=20,update=10"
+OPERATIONS = ("read", "summary", "spin", "update")
+# Sequential requests per operation when measuring its DB operations
+CALIBRATION_REQUESTS = 20
+
+
+class CommandCounter(monitoring.CommandListener):
+    """Counts MongoDB commands sent by the client it is registered on"""
+
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+class InProcessClient:
+    """Calls an ASGI app directly, without sockets or an HTTP library"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def request(self, method, path, body=None):
+        payload = json.dumps(body).encode() if body is not None else b""
+        path, _, query = path.partition("?")
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "root_path": "",
+            "headers": [
+                (b"host", b"bench"),
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(payload)).encode())
+            ],
+            "client": ("127.0.0.1", 0),
+            "server": ("bench", 80)
+        }
+        received = False
+
+        async def receive():
+            nonlocal received
+            if received:
+                return {"type": "http.disconnect"}
+            received = True
+            return {"type": "http.request", "body": payload, "more_body": False}
+
+        status = 0
+        chunks = []
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        await self.app(scope, receive, send)
+        return status, b"".join(chunks)
+
+    async def close(self):
+        pass
+
+
+class HttpClient:
+    """Sends requests to a running server over HTTP"""
+
+    def __init__(self, base_url, connections):
+        try:
+            import httpx
+        except ImportError:
+            sys.exit("--url needs httpx: pip install httpx")
+        self.client = httpx.AsyncClient(
+            base_url=base_url, timeout=30, limits=httpx.Limits(max_connections=connections)
+        )
+
+    async def request(self, method, path, body=None):
+        response = await self.client.request(method, path, json=body)
+        return response.status_code, response.content
+
+    async def close(self):
+        await self.client.aclose()
+
+
+def parse_mix(mix):
+    weights = {}
+    for part in mix.split(","):
+        operation, _, weight = part.partition("=")
+        if operation not in OPERATIONS:
+            sys.exit(f"Unknown operation '{operation}' in --mix, use {', '.join(OPERATIONS)}")
+        weights[operation] = float(weight)
+    return weights
+
+
+def participant_names(count):
+    return [f"Player {random.getrandbits(32):08x}" for _ in range(count)]
+
+
+async def run_operation(client, operation, room, participants):
+    """Run one operation; returns the HTTP status"""
+    base = f"/api/roulette/games/{room}"
+    if operation == "read":
+        status, _ = await client.request("GET", base)
+    elif operation == "summary":
+        status, _ = await client.request("GET", f"{base}/summary")
+    elif operation == "spin":
+        status, _ = await client.request("POST", f"{base}/spin")
+        if status == 400:
+            # Not enough participants left; refill the room and count the spin as done
+            status, _ = await client.request("PUT", f"{base}/participants", {"participants": participant_names(participants)})
+    else:
+        status, _ = await client.request("PUT", f"{base}/participants", {"participants": participant_names(participants)})
+    return status
+
+
+async def worker(client, rooms, operations, weights, deadline, participants, samples):
+    while time.perf_counter() < deadline:
+        operation = random.choices(operations, weights)[0]
+        started = time.perf_counter()
+        try:
+            status = await run_operation(client, operation, random.choice(rooms), participants)
+        except Exception:
+            status = 599
+        samples.append((operation, (time.perf_counter() - started) * 1000, status))
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def summarize(samples, seconds):
+    latencies = [ms for _, ms, _ in samples]
+    if not latencies:
+        return {"requests": 0}
+    return {
+        "requests": len(samples),
+        "errors": sum(1 for _, _, status in samples if status >= 400),
+        "rate_limited": sum(1 for _, _, status in samples if status == 429),
+        "rps": round(len(samples) / seconds, 1),
+        "p50_ms": round(statistics.median(latencies), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+        "max_ms": round(max(latencies), 3)
+    }
+
+
+async def calibrate(client, counter, rooms, participants):
+    """DB operations issued by one request of each operation, run alone"""
+    per_operation = {}
+    for operation in OPERATIONS:
+        before = counter.count
+        for i in range(CALIBRATION_REQUESTS):
+            await run_operation(client, operation, rooms[i % len(rooms)], participants)
+        per_operation[operation] = round((counter.count - before) / CALIBRATION_REQUESTS, 2)
+    return per_operation
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def open_client(args):
+    """Return (client, command counter or None, cleanup coroutine function)"""
+    if args.url:
+        return HttpClient(args.url, args.clients), None, None
+
+    os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    os.environ.setdefault("DB_NAME", args.db_name)
+    # Read when the app is imported; all clients share one address and would share one bucket
+    os.environ.setdefault("RATE_LIMIT_CLIENT_PER_SECOND", "0")
+    os.environ.setdefault("RATE_LIMIT_GAME_PER_SECOND", "0")
+    from motor.motor_asyncio import AsyncIOMotorClient
+    import server
+    from database import ensure_indexes, get_repository
+    from storage.memory import MemoryGameRepository
+    from storage.mongo import MongoGameRepository
+
+    if args.storage == "memory":
+        repo = MemoryGameRepository()
+
+        async def memory_repository():
+            return repo
+
+        server.app.dependency_overrides[get_repository] = memory_repository
+        return InProcessClient(server.app), None, None
+
+    counter = CommandCounter()
+    mongo = AsyncIOMotorClient(os.environ["MONGO_URL"], event_listeners=[counter])
+    db = mongo[args.db_name]
+    await ensure_indexes(db)
+    repo = MongoGameRepository(db)
+
+    async def scratch_repository():
+        return repo
+
+    server.app.dependency_overrides[get_repository] = scratch_repository
+
+    async def cleanup():
+        await mongo.drop_database(args.db_name)
+        mongo.close()
+
+    return InProcessClient(server.app), counter, cleanup
+
+
+async def main(args):
+    weights = parse_mix(args.mix)
+    operations = list(weights)
+    client, counter, cleanup = await open_client(args)
+
+    rooms = []
+    for _ in range(args.rooms):
+        status, body = await client.request("POST", "/api/roulette/games", {"participants": participant_names(args.participants)})
+        if status != 200:
+            sys.exit(f"Creating a room failed with HTTP {status}: {body[:200]!r}")
+        rooms.append(json.loads(body)["id"])
+
+    samples = []
+    commands_before = counter.count if counter else 0
+    started = time.perf_counter()
+    await asyncio.gather(*[
+        worker(client, rooms, operations, list(weights.values()), started + args.duration, args.participants, samples)
+        for _ in range(args.clients)
+    ])
+    seconds = time.perf_counter() - started
+    commands = counter.count - commands_before if counter else None
+
+    result = {
+        "commit": current_commit(),
+        "started_at": datetime.utcnow().isoformat() + "Z",
+        "target": args.url or f"in-process ({args.storage})",
+        "config": {
+            "clients": args.clients,
+            "duration_s": args.duration,
+            "rooms": args.rooms,
+            "participants": args.participants,
+            "mix": weights
+        },
+        "overall": summarize(samples, seconds),
+        "operations": {
+            operation: summarize([sample for sample in samples if sample[0] == operation], seconds)
+            for operation in operations
+        }
+    }
+    if counter:
+        result["overall"]["db_ops_per_request"] = round(commands / max(len(samples), 1), 2)
+        for operation, ops in (await calibrate(client, counter, rooms, args.participants)).items():
+            result["operations"].setdefault(operation, {"requests": 0})["db_ops_per_request"] = ops
+
+    await client.close()
+    if cleanup:
+        await cleanup()
+
+    overall = result["overall"]
+    print(f"{overall['requests']:,} requests in {seconds:.1f}s from {args.clients} clients: {overall.get('rps', 0):,.0f} req/s")
+    print(f"{'operation':<10} {'requests':>9} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'errors':>7} {'429':>7} {'db ops':>7}")
+    for operation, stats in [("overall", overall)] + list(result["operations"].items()):
+        if not stats.get("requests"):
+            continue
+        print(f"{operation:<10} {stats['requests']:>9,} {stats['rps']:>8,.0f} {stats['p50_ms']:>8.2f} "
+              f"{stats['p95_ms']:>8.2f} {stats['p99_ms']:>8.2f} {stats['errors']:>7,} {stats['rate_limited']:>7,} "
+              f"{stats.get('db_ops_per_request', '-'):>7}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(result, indent=2))
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", help="base URL of a running server, e.g. http://localhost:8001")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument("--rooms", type=int, default=20)
+    parser.add_argument("--participants", type=int, default=100, help="participants per room")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="operation weights, e.g. read=50,spin=50")
+    parser.add_argument("--storage", choices=("mongo", "memory"), default="mongo", help="storage for in-process runs")
+    parser.add_argument("--db-name", default="roulette_bench_load")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    asyncio.run(main(parser.parse_args()))
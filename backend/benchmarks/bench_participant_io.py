@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Throughput and memory of the streaming participant import/export path.
+
+Feeds a generated CSV or NDJSON upload of N names through the same parsing,
+normalization and de-duplication used by `POST /game/participants/import`
+in fixed-size byte chunks, then streams the result back out through
+`iter_export`. Reports names/s and tracemalloc peak for each phase. The
+MongoDB writes are not included, so this runs without a database.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.participant_io import iter_export, iter_new_names
+
+UPLOAD_CHUNK_BYTES = 64 * 1024
+
+
+async def upload_chunks(count, fmt):
+    """Generate the upload body lazily, the way request.stream() delivers it"""
+    buffer = []
+    size = 0
+    if fmt == "csv":
+        buffer.append("name\n")
+    for i in range(count):
+        name = f"Participant {i:07d}"
+        line = (json.dumps(name) if fmt == "ndjson" else name) + "\n"
+        buffer.append(line)
+        size += len(line)
+        if size >= UPLOAD_CHUNK_BYTES:
+            yield "".join(buffer).encode()
+            buffer.clear()
+            size = 0
+    if buffer:
+        yield "".join(buffer).encode()
+
+
+async def run_import(args):
+    stats = {"duplicates": 0, "invalid": 0}
+    names = []
+    async for name in iter_new_names(upload_chunks(args.names, args.format), args.format, set(), stats):
+        names.append(name)
+    return names
+
+
+async def aiter_list(values):
+    for value in values:
+        yield value
+
+
+async def run_export(names, fmt):
+    return sum([len(chunk) async for chunk in iter_export(aiter_list(names), aiter_list([]), fmt)])
+
+
+async def main(args):
+    # Timed without tracemalloc, which slows allocation-heavy code severalfold
+    started = time.perf_counter()
+    names = await run_import(args)
+    import_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    exported = await run_export(names, args.format)
+    export_seconds = time.perf_counter() - started
+
+    # The accepted names themselves have to live somewhere; report the
+    # parser's overhead on top of them separately
+    names_bytes = sum(sys.getsizeof(name) for name in names) + sys.getsizeof(names)
+    del names
+
+    tracemalloc.start()
+    names = await run_import(args)
+    _, import_peak = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    baseline, _ = tracemalloc.get_traced_memory()
+    await run_export(names, args.format)
+    _, export_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"names:              {args.names:,} ({args.format})")
+    print(f"import throughput:  {args.names / import_seconds:,.0f} names/s ({import_seconds:.2f}s)")
+    print(f"import peak memory: {import_peak / 1024 / 1024:.1f} MiB "
+          f"({names_bytes / 1024 / 1024:.1f} MiB of it is the accepted names)")
+    print(f"export throughput:  {args.names / export_seconds:,.0f} names/s ({exported / 1024 / 1024:.1f} MiB)")
+    print(f"export peak memory: {(export_peak - baseline) / 1024 / 1024:.1f} MiB above the names")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--names", type=int, default=1_000_000)
+    parser.add_argument("--format", choices=("csv", "ndjson"), default="csv")
+    asyncio.run(main(parser.parse_args()))
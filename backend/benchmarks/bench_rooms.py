@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Spin throughput and latency with many games running at once.
+
+Creates --games rooms in a scratch database and has --spinners concurrent
+clients per room call the `POST /games/{id}/spin` route function until each
+room has drawn --spins winners. Spins of one room queue on its lock while
+rooms proceed in parallel. The same total number of spins is then run
+against a single shared game as the contended baseline. Reports spins/s,
+p50/p95/p99 latency and how many spins failed.
+
+With --storage mongo (the default) this needs a reachable MongoDB
+(MONGO_URL, defaults to localhost); --storage memory runs without one.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi import HTTPException, Request, Response
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from database import ensure_indexes
+from storage.memory import MemoryGameRepository
+from storage.mongo import MongoGameRepository
+from routes.roulette import spin_roulette
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def empty_request():
+    return Request({"type": "http", "method": "POST", "path": "/", "headers": [], "query_string": b""})
+
+
+async def spinner(repo, game_id, spins, latencies, failures):
+    for _ in range(spins):
+        started = time.perf_counter()
+        try:
+            await spin_roulette(empty_request(), Response(), game_id=game_id, repo=repo)
+        except HTTPException:
+            failures.append(game_id)
+            continue
+        latencies.append((time.perf_counter() - started) * 1000)
+
+
+async def run(repo, game_ids, spinners, spins_per_game):
+    """Spin every game with `spinners` clients at once; returns (seconds, latencies, failures)"""
+    latencies, failures = [], []
+    per_spinner = spins_per_game // spinners
+    started = time.perf_counter()
+    await asyncio.gather(*[
+        spinner(repo, game_id, per_spinner, latencies, failures)
+        for game_id in game_ids
+        for _ in range(spinners)
+    ])
+    return time.perf_counter() - started, latencies, failures
+
+
+def report(label, seconds, latencies, failures):
+    print(f"\n{label}")
+    print(f"  spins:       {len(latencies):,} ok, {len(failures):,} failed in {seconds:.2f}s")
+    print(f"  throughput:  {len(latencies) / seconds:,.0f} spins/s")
+    if latencies:
+        print(f"  latency:     p50 {statistics.median(latencies):.1f} ms, "
+              f"p95 {percentile(latencies, 0.95):.1f} ms, p99 {percentile(latencies, 0.99):.1f} ms")
+
+
+async def main(args):
+    client = None
+    if args.storage == "memory":
+        repo = MemoryGameRepository()
+    else:
+        client = AsyncIOMotorClient(os.environ.get('MONGO_URL', 'mongodb://localhost:27017'))
+        db = client[args.db_name]
+        for name in ("games", "participants", "winners"):
+            await db[name].drop()
+        await ensure_indexes(db)
+        repo = MongoGameRepository(db)
+
+    participants = max(args.participants, args.spins + 1)
+    names = [f"Player {i}" for i in range(participants)]
+    rooms = [str((await repo.create_game(names, activate=False))["_id"]) for _ in range(args.games)]
+    report(
+        f"{args.games:,} games x {args.spinners} spinners, {args.spins} spins each",
+        *await run(repo, rooms, args.spinners, args.spins)
+    )
+
+    # Baseline: the same number of spins and clients against one game
+    shared_names = [f"Player {i}" for i in range(args.games * args.spins + 1)]
+    shared = str((await repo.create_game(shared_names, activate=False))["_id"])
+    report(
+        f"1 shared game x {args.games * args.spinners:,} spinners, {args.games * args.spins:,} spins",
+        *await run(repo, [shared], args.games * args.spinners, args.games * args.spins)
+    )
+
+    if client is not None:
+        await client.drop_database(args.db_name)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--games", type=int, default=1_000)
+    parser.add_argument("--spinners", type=int, default=2, help="concurrent clients per game")
+    parser.add_argument("--spins", type=int, default=10, help="spins per game")
+    parser.add_argument("--participants", type=int, default=50)
+    parser.add_argument("--storage", choices=("mongo", "memory"), default="mongo")
+    parser.add_argument("--db-name", default="roulette_bench_rooms")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Cost of turning stored game data into a JSON response body.
+
+Compares, for a game with --participants participants and --winners
+winners, the previous response path with the current one:
+
+    validated  Game(**...) / Winner(**w), then FastAPI's response_model
+               validation and encoding, then the stdlib JSON encoder
+    direct     Game.model_construct / Winner.model_construct, dumped once
+               and encoded with orjson (or the stdlib fallback)
+
+for a full `GET /game` and for a spin response, which also carries the
+remaining participant list. Both paths must produce the same JSON. Runs
+without a database.
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from models.game import Game, SpinResponse, Winner
+from services import serialization
+from services.serialization import model_response
+from storage.base import to_model, to_winner
+
+
+def stored_game(participants, winners):
+    """A game document, its participant names and its winner documents as storage returns them"""
+    now = datetime.utcnow().replace(microsecond=123000)
+    game = {
+        "_id": ObjectId(),
+        "created_at": now,
+        "updated_at": now,
+        "is_active": True,
+        "weighted": False,
+        "version": winners
+    }
+    names = [f"Participant {i:07d}" for i in range(participants)]
+    winner_docs = [
+        {
+            "name": f"Winner {i}",
+            "position": i + 1,
+            "timestamp": now + timedelta(seconds=i),
+            "total_participants": participants + winners - i,
+            "draw_seed": None
+        }
+        for i in range(winners)
+    ]
+    return game, names, winner_docs
+
+
+async def validated_game(game, names, winner_docs, field):
+    model = Game(
+        id=str(game["_id"]),
+        participants=names,
+        tickets=None,
+        winners=[Winner(**winner) for winner in winner_docs],
+        created_at=game["created_at"],
+        updated_at=game["updated_at"],
+        is_active=game["is_active"],
+        version=game["version"]
+    )
+    content = await serialize_response(field=field, response_content=model)
+    return JSONResponse(content).body
+
+
+async def direct_game(game, names, winner_docs, field):
+    return model_response(to_model(game, names, None, [to_winner(winner) for winner in winner_docs])).body
+
+
+async def validated_spin(game, names, winner_docs, field):
+    winner = Winner(**winner_docs[-1])
+    model = SpinResponse(winner=winner, remaining_participants=names, total_winners=winner.position)
+    content = await serialize_response(field=field, response_content=model)
+    return JSONResponse(content).body
+
+
+async def direct_spin(game, names, winner_docs, field):
+    winner = Winner(**winner_docs[-1])
+    return model_response(
+        SpinResponse.model_construct(winner=winner, remaining_participants=names, total_winners=winner.position)
+    ).body
+
+
+async def measure(render, args, data, field):
+    timings = []
+    body = b""
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        body = await render(*data, field)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), body
+
+
+async def main(args):
+    data = stored_game(args.participants, args.winners)
+    encoder = "orjson" if serialization.orjson is not None else "stdlib json"
+    print(f"{args.participants:,} participants, {args.winners:,} winners, "
+          f"median of {args.repeat} runs, direct path encodes with {encoder}")
+
+    cases = [
+        ("GET /game", Game, validated_game, direct_game),
+        ("POST /spin", SpinResponse, validated_spin, direct_spin)
+    ]
+    for label, model, validated, direct in cases:
+        field = create_response_field(name=f"Response_{model.__name__}", type_=model)
+        old_ms, old_body = await measure(validated, args, data, field)
+        new_ms, new_body = await measure(direct, args, data, field)
+        if json.loads(old_body) != json.loads(new_body):
+            sys.exit(f"{label}: the two paths produced different JSON")
+        print(f"\n{label} ({len(new_body) / 1e6:.1f} MB)")
+        print(f"  validated:  {old_ms:8.1f} ms")
+        print(f"  direct:     {new_ms:8.1f} ms  ({old_ms / new_ms:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--participants", type=int, default=100_000)
+    parser.add_argument("--winners", type=int, default=1_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Cold start time of the API: import, startup and first request.
+
+Each run starts a fresh interpreter that imports `server`, enters the app
+lifespan and answers one `GET /api/roulette/game/summary` through an
+in-process ASGI transport, the way a scale-to-zero platform would after
+routing the first request to a new instance. Reports the median of --runs
+for each startup mode in --modes:
+
+    default   indexes, migrations and pool warmup on every start
+    lean      LEAN_STARTUP=1, leaving those to `python manage.py prepare`
+
+The two only differ with --storage mongo, which needs a reachable MongoDB
+(MONGO_URL, defaults to localhost). With --profile the slowest imports are
+listed as well, from `python -X importtime`: the service's own modules and
+third-party packages, with the time spent importing each including what
+it imported first.
+
+With --budget-ms the script exits non-zero when the median time to the
+first response of the last mode is above the budget, to catch startup
+regressions.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Runs in the child interpreter; times only what the service adds on top
+# of the interpreter and the benchmark's own imports
+CHILD = """
+import asyncio, json, sys, time
+import httpx
+started = time.perf_counter()
+import server
+imported = time.perf_counter()
+
+async def main():
+    async with server.app.router.lifespan_context(server.app):
+        ready = time.perf_counter()
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            response = await client.get("/api/roulette/game/summary")
+        answered = time.perf_counter()
+    print(json.dumps({
+        "import": imported - started,
+        "startup": ready - imported,
+        "first_request": answered - ready,
+        "status": response.status_code
+    }))
+
+asyncio.run(main())
+"""
+
+
+def child_env(args, mode):
+    env = dict(os.environ, STORAGE_BACKEND=args.storage, LEAN_STARTUP="1" if mode == "lean" else "0")
+    if args.storage == "mongo":
+        env.setdefault("DB_NAME", args.db_name)
+    env.pop("MEMORY_SNAPSHOT_PATH", None)
+    return env
+
+
+def run_once(args, mode):
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD], cwd=BACKEND_DIR, env=child_env(args, mode),
+        capture_output=True, text=True
+    )
+    elapsed = time.perf_counter() - started
+    if result.returncode != 0:
+        sys.exit(f"{mode} startup failed:\n{result.stderr}")
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    timings["process"] = elapsed
+    return timings
+
+
+def import_profile(args):
+    """(first-party modules, third-party packages) by cumulative import time in ms, slowest first"""
+    def importtime(code):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code], cwd=BACKEND_DIR,
+            env=child_env(args, "lean"), capture_output=True, text=True
+        )
+        rows = {}
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:") or "|" not in line or "cumulative" in line:
+                continue
+            _, self_us, cumulative_us, name = (part.strip() for part in line.replace("import time:", "|").split("|"))
+            rows[name] = (int(self_us), int(cumulative_us))
+        return rows
+
+    # Modules the interpreter loads anyway are not the service's cost
+    baseline = importtime("pass")
+    rows = {name: row for name, row in importtime("import server").items() if name not in baseline}
+    local = {path.stem for path in BACKEND_DIR.iterdir() if path.suffix == ".py" or path.is_dir()}
+
+    own, packages = {}, defaultdict(int)
+    for name, (self_us, cumulative_us) in rows.items():
+        top = name.split(".")[0]
+        if top in local:
+            own[name] = cumulative_us / 1000
+        else:
+            packages[top] += self_us / 1000
+    by_time = lambda items: sorted(items, key=lambda item: item[1], reverse=True)
+    return by_time(own.items()), by_time(packages.items())
+
+
+def main(args):
+    modes = args.modes.split(",")
+    print(f"storage {args.storage}, median of {args.runs} cold starts per mode\n")
+    print(f"{'mode':8} {'import':>9} {'startup':>9} {'request':>9} {'first resp':>11} {'process':>9}")
+    totals = {}
+    for mode in modes:
+        runs = [run_once(args, mode) for _ in range(args.runs)]
+        median = lambda key: statistics.median(run[key] for run in runs) * 1000
+        totals[mode] = statistics.median(
+            (run["import"] + run["startup"] + run["first_request"]) * 1000 for run in runs
+        )
+        print(f"{mode:8} {median('import'):7.0f}ms {median('startup'):7.0f}ms {median('first_request'):7.0f}ms "
+              f"{totals[mode]:9.0f}ms {median('process'):7.0f}ms  (HTTP {runs[-1]['status']})")
+
+    if args.profile:
+        own, packages = import_profile(args)
+        print(f"\nslowest service modules (cumulative, ms)")
+        for name, ms in own[:args.profile]:
+            print(f"  {ms:7.1f}  {name}")
+        print(f"\nslowest third-party packages (own import time, ms)")
+        for name, ms in packages[:args.profile]:
+            print(f"  {ms:7.1f}  {name}")
+
+    if args.budget_ms is not None and totals[modes[-1]] > args.budget_ms:
+        sys.exit(f"\n{modes[-1]} cold start took {totals[modes[-1]]:.0f} ms, over the {args.budget_ms:.0f} ms budget")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--modes", default="default,lean", help="comma-separated: default, lean")
+    parser.add_argument("--storage", choices=("mongo", "memory"), default="memory")
+    parser.add_argument("--db-name", default="roulette_bench_startup")
+    parser.add_argument("--profile", type=int, default=0, metavar="N", help="list the N slowest imports")
+    parser.add_argument("--budget-ms", type=float, help="fail when the last mode's time to first response is above this")
+    main(parser.parse_args())
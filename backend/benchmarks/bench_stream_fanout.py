@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Memory per idle stream subscriber and spin fan-out latency.
+
+Opens N subscribers on the in-process broadcaster, each driven by the same
+`sse_stream` generator that backs `GET /api/roulette/stream`, and measures
+the memory they hold while idle (tracemalloc) and how long a published spin
+takes to reach every one of them. Runs fully in-process, no MongoDB needed.
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from models.game import Winner
+from services.broadcaster import Broadcaster, format_sse, sse_stream
+
+
+async def never_disconnected():
+    return False
+
+
+async def consume(stream, ready, received):
+    """Read frames off one subscriber stream, timestamping each event"""
+    await stream.__anext__()  # initial snapshot frame
+    ready.set()
+    async for frame in stream:
+        if frame.startswith("id:"):
+            received.append(time.perf_counter())
+
+
+async def main(args):
+    broadcaster = Broadcaster()
+    # Subscribers follow the active game, which the spins are published for
+    broadcaster.activate("bench")
+    snapshot = format_sse("game", {"participants": [f"Player {i}" for i in range(6)], "winners": [], "version": 0})
+
+    tracemalloc.start()
+    baseline = tracemalloc.take_snapshot()
+
+    consumers, received = [], []
+    for _ in range(args.subscribers):
+        ready = asyncio.Event()
+        stream = sse_stream(broadcaster, broadcaster.subscribe(), snapshot, never_disconnected)
+        consumers.append(asyncio.create_task(consume(stream, ready, received)))
+        await ready.wait()
+
+    idle = tracemalloc.take_snapshot()
+    idle_bytes = sum(stat.size_diff for stat in idle.compare_to(baseline, "filename"))
+    tracemalloc.stop()
+
+    latencies = []
+    for version in range(1, args.events + 1):
+        received.clear()
+        winner = Winner(name="Player 1", position=version, timestamp=datetime.utcnow(), total_participants=6)
+        started = time.perf_counter()
+        broadcaster.publish("spin", {"game_id": "bench", "version": version, "winner": winner, "removed": [winner.name]})
+        while len(received) < args.subscribers:
+            await asyncio.sleep(0)
+        latencies.append((max(received) - started) * 1000)
+
+    for task in consumers:
+        task.cancel()
+    await asyncio.gather(*consumers, return_exceptions=True)
+
+    print(f"subscribers:          {args.subscribers}")
+    print(f"idle memory total:    {idle_bytes / 1024 / 1024:.2f} MiB")
+    print(f"idle memory per conn: {idle_bytes / args.subscribers / 1024:.2f} KiB")
+    print(f"fan-out p50:          {statistics.median(latencies):.2f} ms")
+    print(f"fan-out max:          {max(latencies):.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--subscribers", type=int, default=5_000)
+    parser.add_argument("--events", type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
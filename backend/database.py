@@ -1,11 +1,210 @@
-from motor.motor_asyncio import AsyncIOMotorClient
+import asyncio
 import os
+import logging
 
-# MongoDB connection
-mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ.get('DB_NAME', 'roulette_db')]
+from services.metrics import command_metrics, pool_metrics, registry
+from storage.base import GameRepository
+from storage.group_commit import GROUP_COMMIT_MAX_OPS, GROUP_COMMIT_WINDOW_MS, GroupCommit, group_commit_enabled
+from storage.idempotency import IDEMPOTENCY_TTL_SECONDS, MemoryIdempotencyStore, MongoIdempotencyStore
+from storage.memory import SNAPSHOT_INTERVAL_SECONDS, MemoryGameRepository
+from storage.mongo import MongoGameRepository
+from storage.rate_limits import MemoryRateLimitStore, MongoRateLimitStore
 
-async def get_database():
-    """Dependency to get database connection"""
-    return db
\ No newline at end of file
+logger = logging.getLogger(__name__)
+
+STORAGE_BACKENDS = ("mongo", "memory")
+# Where token buckets live: per worker (default) or shared through MongoDB
+RATE_LIMIT_STORES = ("memory", "mongo")
+
+# Connection pool settings read from the environment: (variable, client option, type).
+# Unset variables keep the driver defaults (100 connections, no minimum,
+# no wait queue timeout, no compression).
+POOL_SETTINGS = (
+    ('MONGO_MAX_POOL_SIZE', 'maxPoolSize', int),
+    ('MONGO_MIN_POOL_SIZE', 'minPoolSize', int),
+    ('MONGO_MAX_IDLE_TIME_MS', 'maxIdleTimeMS', int),
+    ('MONGO_WAIT_QUEUE_TIMEOUT_MS', 'waitQueueTimeoutMS', int),
+    ('MONGO_SERVER_SELECTION_TIMEOUT_MS', 'serverSelectionTimeoutMS', int),
+    # Comma-separated, in order of preference, e.g. "zstd,snappy"
+    ('MONGO_COMPRESSORS', 'compressors', str),
+)
+# Connections opened at startup when MONGO_MIN_POOL_SIZE is not set
+DEFAULT_WARMUP_CONNECTIONS = 4
+# Seconds the readiness check waits for MongoDB to answer a ping
+READINESS_TIMEOUT_SECONDS = 2.0
+
+# MongoDB connection, opened on first use so the memory backend never needs one
+client = None
+
+# Storage chosen by STORAGE_BACKEND, created on first use
+repository = None
+idempotency_store = None
+rate_limit_store = None
+
+def client_options():
+    """Motor client options set through POOL_SETTINGS variables"""
+    options = {}
+    for variable, option, kind in POOL_SETTINGS:
+        value = os.environ.get(variable)
+        if value:
+            options[option] = kind(value)
+    return options
+
+def get_client():
+    """The shared Motor client"""
+    global client
+    if client is None:
+        # Imported here so the memory backend and cold starts don't load Motor
+        from motor.motor_asyncio import AsyncIOMotorClient
+        client = AsyncIOMotorClient(
+            os.environ.get('MONGO_URL', 'mongodb://localhost:27017'),
+            event_listeners=[command_metrics, pool_metrics],
+            **client_options()
+        )
+    return client
+
+def get_db():
+    """The roulette database on the shared client"""
+    return get_client()[os.environ.get('DB_NAME', 'roulette_db')]
+
+def storage_backend():
+    """Storage backend name from STORAGE_BACKEND: mongo (default) or memory"""
+    backend = os.environ.get('STORAGE_BACKEND', 'mongo').lower()
+    if backend not in STORAGE_BACKENDS:
+        raise ValueError(f"Unknown STORAGE_BACKEND '{backend}', use one of {', '.join(STORAGE_BACKENDS)}")
+    return backend
+
+def create_repository(backend=None) -> GameRepository:
+    """Build the storage for `backend`, by default the configured one"""
+    backend = backend or storage_backend()
+    if backend == "memory":
+        return MemoryGameRepository(
+            snapshot_path=os.environ.get('MEMORY_SNAPSHOT_PATH') or None,
+            snapshot_interval=float(os.environ.get('MEMORY_SNAPSHOT_SECONDS', SNAPSHOT_INTERVAL_SECONDS))
+        )
+    group_commit = None
+    if group_commit_enabled():
+        group_commit = GroupCommit(
+            window=float(os.environ.get('GROUP_COMMIT_WINDOW_MS', GROUP_COMMIT_WINDOW_MS)) / 1000,
+            max_ops=int(os.environ.get('GROUP_COMMIT_MAX_OPS', GROUP_COMMIT_MAX_OPS))
+        )
+    return MongoGameRepository(get_db(), group_commit=group_commit)
+
+def get_storage() -> GameRepository:
+    """The process-wide storage"""
+    global repository
+    if repository is None:
+        repository = create_repository()
+    return repository
+
+def get_idempotency_keys():
+    """The process-wide Idempotency-Key store, kept next to the games"""
+    global idempotency_store
+    if idempotency_store is None:
+        ttl_seconds = int(os.environ.get('IDEMPOTENCY_TTL_SECONDS', IDEMPOTENCY_TTL_SECONDS))
+        if storage_backend() == "memory":
+            idempotency_store = MemoryIdempotencyStore(ttl_seconds)
+        else:
+            idempotency_store = MongoIdempotencyStore(get_db(), ttl_seconds)
+    return idempotency_store
+
+def get_rate_limit_store():
+    """The process-wide token bucket store chosen by RATE_LIMIT_STORE"""
+    global rate_limit_store
+    if rate_limit_store is None:
+        kind = os.environ.get('RATE_LIMIT_STORE', 'memory').lower()
+        if kind not in RATE_LIMIT_STORES:
+            raise ValueError(f"Unknown RATE_LIMIT_STORE '{kind}', use one of {', '.join(RATE_LIMIT_STORES)}")
+        rate_limit_store = MongoRateLimitStore(get_db()) if kind == "mongo" else MemoryRateLimitStore()
+    return rate_limit_store
+
+def lean_startup():
+    """Whether LEAN_STARTUP asks to skip MongoDB maintenance and pool warmup on start.
+
+    Meant for scale-to-zero deployments, where every cold start would pay
+    for the index builds, the migration scan and the warmup pings; run
+    `python manage.py prepare` once per deploy instead.
+    """
+    return os.environ.get('LEAN_STARTUP', '').lower() in ('1', 'true', 'yes')
+
+async def start_storage():
+    """Start the storage and the stores kept next to it: load snapshots, create indexes, migrate"""
+    await get_storage().start()
+    await get_idempotency_keys().start()
+    await get_rate_limit_store().start()
+
+async def warm_pool(connections=None):
+    """Open `connections` pooled connections up front with concurrent pings.
+
+    Defaults to MONGO_WARMUP_CONNECTIONS, else the minimum pool size, else
+    DEFAULT_WARMUP_CONNECTIONS, so the first requests after a deploy don't
+    pay for TCP, TLS and authentication handshakes.
+    """
+    if connections is None:
+        connections = int(os.environ.get(
+            'MONGO_WARMUP_CONNECTIONS',
+            client_options().get('minPoolSize') or DEFAULT_WARMUP_CONNECTIONS
+        ))
+    db = get_db()
+    await asyncio.gather(*[db.command('ping') for _ in range(connections)])
+    return pool_metrics.open
+
+def pool_status():
+    """Connection pool usage of the shared client, or None before it exists"""
+    if client is None:
+        return None
+    pool = client.options.pool_options
+    capacity = pool.max_pool_size * max(len(client.nodes), 1)
+    return {
+        "max_pool_size": pool.max_pool_size,
+        "min_pool_size": pool.min_pool_size,
+        "servers": len(client.nodes),
+        "open": pool_metrics.open,
+        "checked_out": pool_metrics.checked_out,
+        "waiting": pool_metrics.waiting,
+        "checkout_failures": pool_metrics.checkout_failures,
+        "saturation": round(pool_metrics.checked_out / capacity, 4) if capacity else 0.0
+    }
+
+async def readiness():
+    """Whether the storage can serve requests, with pool usage for the mongo backend"""
+    backend = storage_backend()
+    if backend != "mongo":
+        return True, {"storage": backend}
+    try:
+        await asyncio.wait_for(get_db().command('ping'), READINESS_TIMEOUT_SECONDS)
+        ready = True
+    except Exception as error:
+        logger.warning(f"Readiness ping failed: {error}")
+        ready = False
+    return ready, {"storage": backend, "pool": pool_status()}
+
+async def close_storage():
+    """Close the storage and the shared client; both are recreated on next use"""
+    global client, repository, idempotency_store, rate_limit_store
+    if repository is not None:
+        await repository.close()
+        repository = None
+    idempotency_store = None
+    rate_limit_store = None
+    if client is not None:
+        client.close()
+        client = None
+
+registry.gauge(
+    "mongodb_pool_max_size", "Maximum connections per server of the shared client",
+    function=lambda: client.options.pool_options.max_pool_size if client is not None else 0
+)
+
+async def get_repository():
+    """Dependency to get the game storage layer"""
+    return get_storage()
+
+async def get_idempotency_store():
+    """Dependency to get the Idempotency-Key store"""
+    return get_idempotency_keys()
+
+async def ensure_indexes(database=None):
+    """Create the indexes the roulette routes rely on"""
+    database = database if database is not None else get_db()
+    await MongoGameRepository(database).ensure_indexes()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Maintenance commands for the roulette backend.
+
+    prepare   create the MongoDB indexes and migrate games still embedding
+              their lists; the API does this on every start unless it runs
+              with LEAN_STARTUP=1, in which case run it once per deploy
+    archive   move finished games untouched for --older-than-days (default
+              ARCHIVE_AFTER_DAYS) to the compressed archive, e.g. from cron
+              when the API doesn't run the archiver itself
+
+Uses the same environment (and .env file) as the API.
+"""
+
+import argparse
+import asyncio
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+load_dotenv(Path(__file__).resolve().parent / '.env')
+
+from database import close_storage, get_storage, start_storage, storage_backend
+from services.archive import ARCHIVE_AFTER_DAYS, archive_games
+
+
+async def prepare(args):
+    backend = storage_backend()
+    if backend != "mongo":
+        print(f"Nothing to prepare for the {backend} backend")
+        return
+    try:
+        await start_storage()
+    finally:
+        await close_storage()
+    print("Indexes created and games migrated")
+
+
+async def archive(args):
+    try:
+        await start_storage()
+        archived = await archive_games(get_storage(), args.older_than_days, args.limit)
+    finally:
+        await close_storage()
+    print(f"Archived {archived} games untouched for {args.older_than_days:g} days")
+
+
+COMMANDS = {"prepare": prepare, "archive": archive}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    parser.add_argument("--older-than-days", type=float, default=ARCHIVE_AFTER_DAYS, help="archive: age of the last write")
+    parser.add_argument("--limit", type=int, help="archive: stop after this many games")
+    args = parser.parse_args()
+    asyncio.run(COMMANDS[args.command](args))
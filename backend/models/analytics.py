@@ -0,0 +1,29 @@
+from pydantic import BaseModel
+from typing import Optional
+from datetime import datetime
+
+class NameWins(BaseModel):
+    name: str
+    wins: int
+
+class DailyDraws(BaseModel):
+    day: str
+    draws: int
+
+class PoolSizeStats(BaseModel):
+    games: int
+    draws: int
+    # Participants left in the pool at each draw, averaged over all draws
+    average_pool_size: Optional[float] = None
+
+class GameFairness(BaseModel):
+    game_id: str
+    created_at: datetime
+    participants: int
+    winners: int
+    bins: int
+    chi_square: float
+    degrees_of_freedom: int
+    # Chance of a chi-square at least this large from a fair draw; only
+    # meaningful with a few expected winners per bin
+    p_value: Optional[float] = None
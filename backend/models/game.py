@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field, model_validator
 from typing import List, Optional
 from datetime import datetime
 import uuid
@@ -11,20 +11,45 @@ class Winner(BaseModel):
     position: int
     timestamp: datetime = Field(default_factory=datetime.utcnow)
     total_participants: int
+    draw_seed: Optional[str] = None
+
+def check_tickets(participants, tickets):
+    """Tickets, when given, hold one positive count per participant"""
+    if tickets is None:
+        return
+    if participants is None or len(tickets) != len(participants):
+        raise ValueError("tickets must have one entry per participant")
+    if any(count < 1 for count in tickets):
+        raise ValueError("every participant needs at least 1 ticket")
 
 class Game(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     participants: List[str] = Field(default_factory=list)
+    tickets: Optional[List[int]] = None
     winners: List[Winner] = Field(default_factory=list)
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     is_active: bool = True
+    # Bumped by every write; also the game's ETag
+    version: int = 0
 
 class GameCreate(BaseModel):
     participants: List[str] = Field(default_factory=list)
+    tickets: Optional[List[int]] = None
+
+    @model_validator(mode="after")
+    def validate_tickets(self):
+        check_tickets(self.participants, self.tickets)
+        return self
 
 class GameUpdate(BaseModel):
     participants: Optional[List[str]] = None
+    tickets: Optional[List[int]] = None
+
+    @model_validator(mode="after")
+    def validate_tickets(self):
+        check_tickets(self.participants, self.tickets)
+        return self
 
 class SpinRequest(BaseModel):
     game_id: str
@@ -32,4 +57,93 @@ class SpinRequest(BaseModel):
 class SpinResponse(BaseModel):
     winner: Winner
     remaining_participants: List[str]
-    total_winners: int
\ No newline at end of file
+    total_winners: int
+
+class BatchSpinRequest(BaseModel):
+    count: int = Field(ge=1, le=1000)
+
+class BatchSpinResponse(BaseModel):
+    winners: List[Winner]
+    remaining_count: int
+    total_winners: int
+
+class ImportResult(BaseModel):
+    game_id: str
+    imported: int
+    duplicates: int
+    invalid: int
+    total_participants: int
+    version: int
+
+class GameSummary(BaseModel):
+    id: str
+    version: int
+    participant_count: int
+    winner_count: int
+    last_winner: Optional[Winner] = None
+    created_at: datetime
+    updated_at: datetime
+    is_active: bool = True
+
+class ParticipantEntry(BaseModel):
+    seq: int
+    name: str
+
+class ParticipantMatch(ParticipantEntry):
+    # False when the name only matches with one letter of the query off
+    exact: bool = True
+
+class DuplicateGroup(BaseModel):
+    # True when the names are equal once normalized, False when they differ by a letter
+    exact: bool
+    participants: List[ParticipantEntry]
+
+class ArchivedGame(BaseModel):
+    id: str
+    created_at: datetime
+    updated_at: datetime
+    archived_at: datetime
+    version: int
+    participant_count: int
+    winner_count: int
+    # How the packed game is compressed: zstd, or gzip without zstandard
+    codec: str
+    compressed_bytes: int
+    raw_bytes: int
+
+class GameEvent(BaseModel):
+    """One write in a game's log; the remaining fields depend on `type`"""
+    model_config = ConfigDict(extra="allow")
+
+    game_id: str
+    version: int
+    type: str
+    at: datetime
+
+class ReplayedGame(BaseModel):
+    game_id: str
+    version: int
+    participants: List[str]
+    tickets: Optional[List[int]] = None
+    winners: List[Winner]
+    # Versions with no logged event, so the replay may differ from the game
+    missing_versions: List[int] = Field(default_factory=list)
+
+class GameChange(BaseModel):
+    """One write in a delta: a draw (`winners`, `removed`) or an append (`participants`)"""
+    version: int
+    type: str
+    winners: Optional[List[Winner]] = None
+    # Positions in the participant list as it was before the draw
+    removed: Optional[List[int]] = None
+    # Appended at the end of the list, with one ticket each in weighted games
+    participants: Optional[List[str]] = None
+
+class GameChanges(BaseModel):
+    game_id: str
+    since: int
+    version: int
+    # The writes after `since`, oldest first, when they are still kept
+    changes: Optional[List[GameChange]] = None
+    # Otherwise the whole game, which replaces the client's copy
+    game: Optional[Game] = None
@@ -0,0 +1,75 @@
+from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from models.analytics import DailyDraws, GameFairness, NameWins, PoolSizeStats
+from database import get_repository
+from services.analytics import DEFAULT_FAIRNESS_BINS, MAX_FAIRNESS_BINS, analytics_cache, with_p_value
+from services.paging import check_limit
+from services.serialization import model_response
+
+# Reports over finished games, computed by the storage backend and cached
+# for ANALYTICS_CACHE_SECONDS; `since`/`until` select games by creation time
+router = APIRouter(prefix="/api/analytics", tags=["analytics"])
+
+DEFAULT_LIMIT = 100
+
+def naive_utc(moment):
+    """Stored times are naive UTC; bring an aware `since`/`until` to the same form"""
+    if moment is None or moment.tzinfo is None:
+        return moment
+    return moment.astimezone(timezone.utc).replace(tzinfo=None)
+
+@router.get("/wins", response_model=List[NameWins])
+async def get_wins_per_name(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = DEFAULT_LIMIT,
+    repo = Depends(get_repository)
+):
+    """Names that won most often"""
+    since, until = naive_utc(since), naive_utc(until)
+    check_limit(limit)
+    rows = await analytics_cache.get(("wins", since, until, limit), lambda: repo.wins_per_name(since, until, limit))
+    return model_response(rows)
+
+@router.get("/draws-per-day", response_model=List[DailyDraws])
+async def get_draws_per_day(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    repo = Depends(get_repository)
+):
+    """Number of draws per UTC day"""
+    since, until = naive_utc(since), naive_utc(until)
+    rows = await analytics_cache.get(("draws-per-day", since, until), lambda: repo.draws_per_day(since, until))
+    return model_response(rows)
+
+@router.get("/pool-size", response_model=PoolSizeStats)
+async def get_pool_size(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    repo = Depends(get_repository)
+):
+    """Average number of participants left at each draw"""
+    since, until = naive_utc(since), naive_utc(until)
+    stats = await analytics_cache.get(("pool-size", since, until), lambda: repo.pool_size_stats(since, until))
+    return model_response(stats)
+
+@router.get("/fairness", response_model=List[GameFairness])
+async def get_fairness(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    bins: int = DEFAULT_FAIRNESS_BINS,
+    limit: int = DEFAULT_LIMIT,
+    repo = Depends(get_repository)
+):
+    """Chi-square test per game of winners against their position in the participant list, newest games first"""
+    since, until = naive_utc(since), naive_utc(until)
+    check_limit(limit)
+    if not 2 <= bins <= MAX_FAIRNESS_BINS:
+        raise HTTPException(status_code=400, detail=f"bins must be between 2 and {MAX_FAIRNESS_BINS}")
+    
+    async def compute():
+        return [with_p_value(row) for row in await repo.fairness(since, until, bins, limit)]
+    
+    return model_response(await analytics_cache.get(("fairness", since, until, bins, limit), compute))
@@ -1,183 +1,645 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
+from fastapi.responses import StreamingResponse
 from datetime import datetime
-import random
+from typing import List, Optional
 
-from models.game import Game, GameCreate, GameUpdate, SpinRequest, SpinResponse, Winner
-from database import get_database
+from models.game import (
+    Game, GameCreate, GameUpdate, SpinRequest, SpinResponse, Winner, ImportResult,
+    BatchSpinRequest, BatchSpinResponse, GameSummary, GameEvent, ReplayedGame,
+    ParticipantEntry, ParticipantMatch, DuplicateGroup, ArchivedGame, GameChange, GameChanges
+)
+from database import get_idempotency_store, get_repository
+from storage.base import to_model, to_winner
+from services import spin_engine, participant_io
+from services.paging import check_limit, decode_cursor, encode_cursor, parse_fields, project
+from services.serialization import compressed_response, model_response
+from services.conditional import check_precondition, if_match, make_etag, not_modified
+from services.idempotency import idempotent
+from services.admission import admit_game_write, admit_write
+from services.game_cache import game_cache
+from services.broadcaster import broadcaster, format_sse, sse_stream
+from services.change_feed import APPEND, SPIN, change_feed
+from services.event_log import rebuild
+from services.participant_index import DEFAULT_SEARCH_LIMIT, build_index, participant_indexes, search_key
+from services.metrics import change_polls, games_restored
 
+# Every game route exists twice: `/game...` for the single active game and
+# `/games/{game_id}/...` for any game, so several rooms can run side by side
 router = APIRouter(prefix="/api/roulette", tags=["roulette"])
 
-@router.get("/game", response_model=Game)
-async def get_current_game(db = Depends(get_database)):
-    """Get the current active game"""
-    game = await db.games.find_one({"is_active": True})
+DEFAULT_PARTICIPANTS = [
+    "Ana García",
+    "Carlos Rodríguez", 
+    "María López",
+    "José Martínez",
+    "Laura González",
+    "Pablo Sánchez"
+]
+
+# Archived games listed per request unless asked for another limit
+DEFAULT_ARCHIVE_LIMIT = 100
+
+def remember_game(game, model):
+    """Cache a freshly written game and restart its change feed"""
+    version = game.get("version", 0)
+    model = game_cache.put(model, version)
+    change_feed.restart(model.id, version)
+    return model
+
+def publish_game(game, model):
+    """Cache a freshly written game and push it to stream subscribers"""
+    model = remember_game(game, model)
+    if model.is_active:
+        broadcaster.activate(model.id)
+    if broadcaster.wants_local_events:
+        broadcaster.publish("game", model.model_dump())
+    return model
+
+def cached_game(game_id):
+    """The cached Game addressed by a route, or None"""
+    return game_cache.get_active() if game_id is None else game_cache.get(game_id)
+
+async def find_game(repo, game_id):
+    """The game document addressed by a route: by id, or the active one"""
+    return await (repo.find_active() if game_id is None else repo.find_game(game_id))
+
+async def require_game(repo, game_id):
+    game = await find_game(repo, game_id)
     if not game:
-        # Create a default game if none exists
-        default_participants = [
-            "Ana García",
-            "Carlos Rodríguez", 
-            "María López",
-            "José Martínez",
-            "Laura González",
-            "Pablo Sánchez"
-        ]
-        game_data = {
-            "participants": default_participants,
-            "winners": [],
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow(),
-            "is_active": True
-        }
-        result = await db.games.insert_one(game_data)
-        game = await db.games.find_one({"_id": result.inserted_id})
-    
-    # Convert MongoDB ObjectId to string for the response
-    game["id"] = str(game["_id"])
-    del game["_id"]
-    return Game(**game)
+        raise HTTPException(status_code=404, detail="No active game found" if game_id is None else "Game not found")
+    return game
 
-@router.post("/game", response_model=Game)
-async def create_game(game_data: GameCreate, db = Depends(get_database)):
-    """Create a new game"""
-    # Mark existing games as inactive
-    await db.games.update_many({}, {"$set": {"is_active": False}})
-    
-    # Create new game
-    game_dict = game_data.dict()
-    game_dict.update({
-        "winners": [],
-        "created_at": datetime.utcnow(),
-        "updated_at": datetime.utcnow(),
-        "is_active": True
-    })
+async def load_active_game(repo, game_id=None):
+    """Get a game (default: the active one) from the cache, falling back to MongoDB"""
+    cached = cached_game(game_id)
+    if cached is not None:
+        return cached
     
-    result = await db.games.insert_one(game_dict)
-    game = await db.games.find_one({"_id": result.inserted_id})
+    game = await find_game(repo, game_id)
+    if not game:
+        return None
+    return game_cache.put(await repo.load_game(game), game.get("version", 0))
+
+async def find_for_read(repo, game_id=None):
+    """The cached Game, or else the small game document.
+
+    Either is enough to answer a conditional GET without loading any lists.
+    """
+    cached = cached_game(game_id)
+    if cached is not None:
+        return cached, None
+    return None, await find_game(repo, game_id)
+
+def read_version(cached, game):
+    """(game id, version) of whatever find_for_read returned"""
+    if cached is not None:
+        return cached.id, cached.version
+    return str(game["_id"]), game.get("version", 0)
+
+def set_etag(response, game_id, version):
+    response.headers["ETag"] = make_etag(game_id, version)
+
+def set_next_cursor(response, page, limit, key):
+    """Point clients at the next page when this one came back full"""
+    if limit is not None and len(page) == limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(key(page[-1]))
+
+@router.post("/games", response_model=Game)
+async def create_room(
+    game_data: GameCreate,
+    request: Request,
+    response: Response,
+    repo = Depends(get_repository),
+    keys = Depends(get_idempotency_store),
+    admitted = Depends(admit_write)
+):
+    """Create a game that runs alongside the others instead of replacing the active one"""
+    async def run():
+        game = await repo.create_game(game_data.participants, game_data.tickets, activate=False)
+        set_etag(response, game["_id"], game["version"])
+        return model_response(publish_game(game, to_model(game, game_data.participants, game_data.tickets, [])), response)
     
-    game["id"] = str(game["_id"])
-    del game["_id"]
-    return Game(**game)
+    return await idempotent(request, keys, run)
 
-@router.put("/game/participants", response_model=Game)
-async def update_participants(update_data: GameUpdate, db = Depends(get_database)):
-    """Update participants in the current game"""
-    game = await db.games.find_one({"is_active": True})
-    if not game:
-        raise HTTPException(status_code=404, detail="No active game found")
+@router.get("/game", response_model=Game, response_model_exclude_unset=True)
+@router.get("/games/{game_id}", response_model=Game, response_model_exclude_unset=True)
+async def get_current_game(
+    request: Request,
+    response: Response,
+    fields: Optional[str] = None,
+    game_id: Optional[str] = None,
+    repo = Depends(get_repository)
+):
+    """Get the current active game, optionally only some of its fields"""
+    fields = parse_fields(fields, Game)
+    cached, game = await find_for_read(repo, game_id)
+    if cached is not None or game is not None:
+        unchanged = not_modified(request, response, *read_version(cached, game))
+        if unchanged:
+            return unchanged
+    if cached is not None:
+        return compressed_response(request, project(cached, fields), response, exclude_unset=True)
     
-    update_dict = {
-        "updated_at": datetime.utcnow()
-    }
+    if game and fields is not None:
+        # Only the collections behind the requested fields are read; a
+        # partial game is not cached
+        return compressed_response(request, await repo.load_game(game, fields), response, exclude_unset=True)
+    if game:
+        return compressed_response(request, game_cache.put(await repo.load_game(game), game.get("version", 0)), response)
+    if game_id is not None:
+        raise HTTPException(status_code=404, detail="Game not found")
     
-    if update_data.participants is not None:
-        update_dict["participants"] = update_data.participants
+    # Create a default game if none exists; a concurrent request may win
+    game = await repo.create_game(DEFAULT_PARTICIPANTS, only_if_missing=True)
+    set_etag(response, game["_id"], game.get("version", 0))
+    return compressed_response(
+        request, project(publish_game(game, await repo.load_game(game)), fields), response, exclude_unset=True
+    )
+
+@router.get("/game/changes", response_model=GameChanges, response_model_exclude_unset=True)
+@router.get("/games/{game_id}/changes", response_model=GameChanges, response_model_exclude_unset=True)
+async def get_game_changes(
+    request: Request,
+    response: Response,
+    since: int,
+    game_id: Optional[str] = None,
+    repo = Depends(get_repository)
+):
+    """Get what changed in a game since version `since`, or the whole game when those changes are no longer kept.
+
+    Pollers send the version they hold (and its ETag as If-None-Match, for a
+    304 while nothing changed), apply `changes` in order and move to
+    `version`; when `game` comes back instead, or `game_id` is not the game
+    they hold, they replace their copy.
+    """
+    cached, game = await find_for_read(repo, game_id)
+    if cached is None and game is None:
+        raise HTTPException(status_code=404, detail="No active game found" if game_id is None else "Game not found")
+    current_id, version = read_version(cached, game)
+    unchanged = not_modified(request, response, current_id, version)
+    if unchanged:
+        change_polls.labels("unchanged").inc()
+        return unchanged
     
-    await db.games.update_one(
-        {"_id": game["_id"]}, 
-        {"$set": update_dict}
+    changes = change_feed.since(current_id, since, version)
+    if changes is not None:
+        change_polls.labels("delta").inc()
+        return model_response(GameChanges.model_construct(
+            game_id=current_id,
+            since=since,
+            version=version,
+            changes=[GameChange.model_construct(**change) for change in changes]
+        ), response, exclude_unset=True)
+    
+    change_polls.labels("snapshot").inc()
+    if cached is None:
+        cached = game_cache.put(await repo.load_game(game), version)
+    return compressed_response(
+        request, GameChanges.model_construct(game_id=current_id, since=since, version=cached.version, game=cached),
+        response, exclude_unset=True
     )
+
+@router.get("/game/summary", response_model=GameSummary)
+@router.get("/games/{game_id}/summary", response_model=GameSummary)
+async def get_game_summary(
+    request: Request,
+    response: Response,
+    game_id: Optional[str] = None,
+    repo = Depends(get_repository)
+):
+    """Counts, last winner and version of the current game, without its lists"""
+    cached, game = await find_for_read(repo, game_id)
+    if cached is None and game is None:
+        raise HTTPException(status_code=404, detail="No active game found" if game_id is None else "Game not found")
+    unchanged = not_modified(request, response, *read_version(cached, game))
+    if unchanged:
+        return unchanged
     
-    updated_game = await db.games.find_one({"_id": game["_id"]})
-    updated_game["id"] = str(updated_game["_id"])
-    del updated_game["_id"]
-    return Game(**updated_game)
+    if cached is not None:
+        return GameSummary(
+            id=cached.id,
+            version=cached.version,
+            participant_count=len(cached.participants),
+            winner_count=len(cached.winners),
+            last_winner=cached.winners[-1] if cached.winners else None,
+            created_at=cached.created_at,
+            updated_at=cached.updated_at,
+            is_active=cached.is_active
+        )
+    
+    return GameSummary(
+        id=str(game["_id"]),
+        version=game.get("version", 0),
+        participant_count=game.get("participant_count", 0),
+        winner_count=game.get("winner_count", 0),
+        last_winner=await repo.last_winner(game),
+        created_at=game["created_at"],
+        updated_at=game["updated_at"],
+        is_active=game.get("is_active", False)
+    )
 
-@router.post("/spin", response_model=SpinResponse)
-async def spin_roulette(db = Depends(get_database)):
-    """Spin the roulette and get a winner"""
-    game = await db.games.find_one({"is_active": True})
-    if not game:
-        raise HTTPException(status_code=404, detail="No active game found")
+@router.post("/game", response_model=Game)
+async def create_game(
+    game_data: GameCreate,
+    request: Request,
+    response: Response,
+    repo = Depends(get_repository),
+    keys = Depends(get_idempotency_store),
+    admitted = Depends(admit_write)
+):
+    """Create a new game; with If-Match only if the active game is unchanged"""
+    async def run():
+        expected = if_match(request)
+        current = None
+        if expected is not None:
+            current = await require_game(repo, None)
+            check_precondition(expected, current["_id"], current.get("version", 0))
+        
+        game = await repo.create_game(game_data.participants, game_data.tickets, expected=current)
+        set_etag(response, game["_id"], game["version"])
+        return model_response(publish_game(game, to_model(game, game_data.participants, game_data.tickets, [])), response)
+    
+    return await idempotent(request, keys, run)
+
+@router.put("/game/participants", response_model=Game)
+@router.put("/games/{game_id}/participants", response_model=Game)
+async def update_participants(
+    update_data: GameUpdate,
+    request: Request,
+    response: Response,
+    game_id: Optional[str] = None,
+    repo = Depends(get_repository),
+    admitted = Depends(admit_game_write)
+):
+    """Update participants in the current game"""
+    expected = if_match(request)
+    game = await require_game(repo, game_id)
+    check_precondition(expected, game["_id"], game.get("version", 0))
     
-    participants = game.get("participants", [])
-    if len(participants) < 2:
-        raise HTTPException(status_code=400, detail="At least 2 participants required")
+    if update_data.participants is not None:
+        # Tickets are positional, a new list always brings its own (or none)
+        game = await repo.replace_participants(
+            game, update_data.participants, update_data.tickets,
+            expected_version=expected[1] if expected else None
+        )
     
-    # Select random winner
-    winner_name = random.choice(participants)
+    version = game.get("version", 0)
+    set_etag(response, game["_id"], version)
+    game = game_cache.put(await repo.load_game(game), version)
+    change_feed.restart(game.id, version)
+    broadcaster.publish("participants", {
+        "game_id": game.id,
+        "version": version,
+        "participants": game.participants
+    })
+    return model_response(game, response)
+
+@router.post("/game/participants/import", response_model=ImportResult)
+@router.post("/games/{game_id}/participants/import", response_model=ImportResult)
+async def import_participants(
+    request: Request,
+    format: Optional[str] = None,
+    replace: bool = False,
+    game_id: Optional[str] = None,
+    repo = Depends(get_repository),
+    admitted = Depends(admit_game_write)
+):
+    """Append participants from a streamed CSV or NDJSON upload"""
+    fmt = participant_io.resolve_format(format, request.headers.get("content-type"))
+    expected = if_match(request)
+    game = await require_game(repo, game_id)
     
-    # Create winner object
-    winners = game.get("winners", [])
-    position = len(winners) + 1
+    def on_append(game, names):
+        change_feed.record(str(game["_id"]), game.get("version", 0), APPEND, participants=list(names))
     
-    winner = Winner(
-        name=winner_name,
-        position=position,
-        timestamp=datetime.utcnow(),
-        total_participants=len(participants)
-    )
+    try:
+        result = await participant_io.import_participants(
+            repo, game, request.stream(), fmt, replace=replace, expected=expected, on_append=on_append
+        )
+    finally:
+        # The game was written in several chunks, reload it on the next read
+        game_cache.invalidate(str(game["_id"]))
     
-    # Remove winner from participants
-    remaining_participants = [p for p in participants if p != winner_name]
-    
-    # Update game in database
-    updated_winners = winners + [winner.dict()]
-    await db.games.update_one(
-        {"_id": game["_id"]},
-        {
-            "$set": {
-                "participants": remaining_participants,
-                "winners": updated_winners,
-                "updated_at": datetime.utcnow()
-            }
-        }
-    )
+    broadcaster.publish("resync", {"game_id": result["game_id"], "version": result["version"]})
+    return result
+
+@router.get("/game/export")
+@router.get("/games/{game_id}/export")
+async def export_game(format: str = "ndjson", game_id: Optional[str] = None, repo = Depends(get_repository)):
+    """Stream the current participants and winners as NDJSON or CSV"""
+    fmt = participant_io.resolve_format(format, None)
+    game = await require_game(repo, game_id)
     
-    return SpinResponse(
-        winner=winner,
-        remaining_participants=remaining_participants,
-        total_winners=len(updated_winners)
+    # Straight from the collections, the game is never held in memory whole
+    return StreamingResponse(
+        participant_io.iter_export(repo.iter_participant_names(game), repo.iter_winners(game), fmt),
+        media_type=participant_io.MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="game-{game["_id"]}.{fmt}"'}
     )
 
+@router.post("/spin", response_model=SpinResponse)
+@router.post("/games/{game_id}/spin", response_model=SpinResponse)
+async def spin_roulette(
+    request: Request,
+    response: Response,
+    game_id: Optional[str] = None,
+    repo = Depends(get_repository),
+    keys = Depends(get_idempotency_store),
+    admitted = Depends(admit_game_write)
+):
+    """Spin the roulette and get a winner"""
+    async def run():
+        result = await spin_engine.spin(repo, expected=if_match(request), game_id=game_id)
+        winner = result.winners[0]
+        remaining = result.pool.remaining_names()
+        set_etag(response, result.game_id, result.version)
+        
+        game_cache.apply_draw(result.game_id, result.winners, result.positions, result.version)
+        participant_indexes.apply_draw(result.game_id, result.seqs, result.version)
+        change_feed.record(result.game_id, result.version, SPIN, winners=result.winners, removed=result.positions)
+        broadcaster.publish("spin", {
+            "game_id": result.game_id,
+            "version": result.version,
+            "winner": winner,
+            "removed": [winner.name]
+        })
+        
+        return model_response(SpinResponse.model_construct(
+            winner=winner,
+            remaining_participants=remaining,
+            total_winners=winner.position
+        ), response)
+    
+    return await idempotent(request, keys, run)
+
+@router.post("/spin/batch", response_model=BatchSpinResponse)
+@router.post("/games/{game_id}/spin/batch", response_model=BatchSpinResponse)
+async def spin_roulette_batch(
+    batch: BatchSpinRequest,
+    request: Request,
+    response: Response,
+    game_id: Optional[str] = None,
+    repo = Depends(get_repository),
+    keys = Depends(get_idempotency_store),
+    admitted = Depends(admit_game_write)
+):
+    """Draw several distinct winners in one atomic update"""
+    async def run():
+        result = await spin_engine.draw(repo, batch.count, expected=if_match(request), game_id=game_id)
+        set_etag(response, result.game_id, result.version)
+        
+        game_cache.apply_draw(result.game_id, result.winners, result.positions, result.version)
+        participant_indexes.apply_draw(result.game_id, result.seqs, result.version)
+        change_feed.record(result.game_id, result.version, SPIN, winners=result.winners, removed=result.positions)
+        broadcaster.publish("draw", {
+            "game_id": result.game_id,
+            "version": result.version,
+            "winners": result.winners,
+            "removed": [winner.name for winner in result.winners]
+        })
+        
+        last = result.winners[-1]
+        return model_response(BatchSpinResponse.model_construct(
+            winners=result.winners,
+            remaining_count=last.total_participants - 1,
+            total_winners=last.position
+        ), response)
+    
+    return await idempotent(request, keys, run)
+
 @router.get("/winners", response_model=List[Winner])
-async def get_winners(db = Depends(get_database)):
-    """Get all winners from the current game"""
-    game = await db.games.find_one({"is_active": True})
-    if not game:
+@router.get("/games/{game_id}/winners", response_model=List[Winner])
+async def get_winners(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    game_id: Optional[str] = None,
+    repo = Depends(get_repository)
+):
+    """Get winners from the current game, a page at a time with `limit`/`cursor`"""
+    limit, after = check_limit(limit), decode_cursor(cursor)
+    cached, game = await find_for_read(repo, game_id)
+    if cached is None and game is None:
         return []
+    unchanged = not_modified(request, response, *read_version(cached, game))
+    if unchanged:
+        return unchanged
     
-    winners_data = game.get("winners", [])
-    return [Winner(**winner) for winner in winners_data]
+    if limit is None and after is None:
+        game = cached or game_cache.put(await repo.load_game(game), game.get("version", 0))
+        return model_response(game.winners, response)
+    
+    if game is None:
+        # Pages come from the collections, which need the game document
+        game = await find_game(repo, game_id)
+        if not game:
+            return []
+        set_etag(response, game["_id"], game.get("version", 0))
+    page = [winner async for winner in repo.iter_winners(game, after=after, limit=limit)]
+    set_next_cursor(response, page, limit, lambda winner: winner["position"])
+    return model_response([to_winner(winner) for winner in page], response)
 
 @router.delete("/game/reset", response_model=Game)
-async def reset_game(db = Depends(get_database)):
+@router.delete("/games/{game_id}/reset", response_model=Game)
+async def reset_game(
+    request: Request,
+    response: Response,
+    game_id: Optional[str] = None,
+    repo = Depends(get_repository),
+    admitted = Depends(admit_game_write)
+):
     """Reset the current game"""
-    game = await db.games.find_one({"is_active": True})
-    if not game:
-        raise HTTPException(status_code=404, detail="No active game found")
+    expected = if_match(request)
+    game = await require_game(repo, game_id)
+    check_precondition(expected, game["_id"], game.get("version", 0))
     
     # Reset to default participants
-    default_participants = [
-        "Ana García",
-        "Carlos Rodríguez", 
-        "María López",
-        "José Martínez",
-        "Laura González",
-        "Pablo Sánchez"
-    ]
-    
-    await db.games.update_one(
-        {"_id": game["_id"]},
-        {
-            "$set": {
-                "participants": default_participants,
-                "winners": [],
-                "updated_at": datetime.utcnow()
-            }
-        }
-    )
-    
-    updated_game = await db.games.find_one({"_id": game["_id"]})
-    updated_game["id"] = str(updated_game["_id"])
-    del updated_game["_id"]
-    return Game(**updated_game)
+    game = await repo.reset_game(game, DEFAULT_PARTICIPANTS, expected_version=expected[1] if expected else None)
+    set_etag(response, game["_id"], game["version"])
+    return model_response(publish_game(game, to_model(game, DEFAULT_PARTICIPANTS, None, [])), response)
 
 @router.get("/participants", response_model=List[str])
-async def get_participants(db = Depends(get_database)):
-    """Get current participants"""
-    game = await db.games.find_one({"is_active": True})
-    if not game:
+@router.get("/games/{game_id}/participants", response_model=List[str])
+async def get_participants(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    game_id: Optional[str] = None,
+    repo = Depends(get_repository)
+):
+    """Get current participants, a page at a time with `limit`/`cursor`"""
+    limit, after = check_limit(limit), decode_cursor(cursor)
+    cached, game = await find_for_read(repo, game_id)
+    if cached is None and game is None:
         return []
+    unchanged = not_modified(request, response, *read_version(cached, game))
+    if unchanged:
+        return unchanged
+    
+    if limit is None and after is None:
+        game = cached or game_cache.put(await repo.load_game(game), game.get("version", 0))
+        return model_response(game.participants, response)
+    
+    if game is None:
+        # Pages come from the collections, which need the game document
+        game = await find_game(repo, game_id)
+        if not game:
+            return []
+        set_etag(response, game["_id"], game.get("version", 0))
+    page = [entry async for entry in repo.iter_participants(game, after=after, limit=limit)]
+    set_next_cursor(response, page, limit, lambda entry: entry["seq"])
+    return model_response([entry["name"] for entry in page], response)
+
+@router.get("/participants/search", response_model=List[ParticipantMatch])
+@router.get("/games/{game_id}/participants/search", response_model=List[ParticipantMatch])
+async def search_participants(
+    q: str,
+    request: Request,
+    response: Response,
+    limit: int = DEFAULT_SEARCH_LIMIT,
+    typos: bool = True,
+    game_id: Optional[str] = None,
+    repo = Depends(get_repository)
+):
+    """Find remaining participants by the start of any word of their name, ignoring case and accents.
+
+    With `typos`, names one letter off the query follow the exact matches.
+    """
+    check_limit(limit)
+    prefix = search_key(q)
+    if not prefix:
+        raise HTTPException(status_code=400, detail="q must contain part of a name")
+    game = await require_game(repo, game_id)
+    unchanged = not_modified(request, response, game["_id"], game.get("version", 0))
+    if unchanged:
+        return unchanged
     
-    return game.get("participants", [])
\ No newline at end of file
+    index = await participant_indexes.get(repo, game)
+    if index is None:
+        # Too big to keep in memory: exact matches only, from the storage's index
+        matches = await repo.search_participants(game, prefix, limit)
+        return model_response([ParticipantMatch.model_construct(**entry, exact=True) for entry in matches], response)
+    return model_response([
+        ParticipantMatch.model_construct(seq=seq, name=name, exact=exact)
+        for seq, name, exact in index.search(prefix, limit, typos)
+    ], response)
+
+@router.get("/participants/duplicates", response_model=List[DuplicateGroup])
+@router.get("/games/{game_id}/participants/duplicates", response_model=List[DuplicateGroup])
+async def get_duplicate_participants(
+    request: Request,
+    response: Response,
+    game_id: Optional[str] = None,
+    repo = Depends(get_repository)
+):
+    """Groups of remaining participants whose names are equal or one letter apart, to review before a draw"""
+    game = await require_game(repo, game_id)
+    unchanged = not_modified(request, response, game["_id"], game.get("version", 0))
+    if unchanged:
+        return unchanged
+    
+    index = await participant_indexes.get(repo, game)
+    if index is None:
+        # Too big to keep in memory, indexed just for this report
+        index = await build_index(repo, game)
+    return model_response([
+        DuplicateGroup.model_construct(
+            exact=exact,
+            participants=[ParticipantEntry.model_construct(seq=seq, name=name) for seq, name in entries]
+        )
+        for exact, entries in index.duplicates()
+    ], response)
+
+@router.get("/game/events", response_model=List[GameEvent])
+@router.get("/games/{game_id}/events", response_model=List[GameEvent])
+async def get_events(
+    response: Response,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    game_id: Optional[str] = None,
+    repo = Depends(get_repository)
+):
+    """Get a game's event log by version, a page at a time with `limit`/`cursor`"""
+    limit, after = check_limit(limit), decode_cursor(cursor)
+    game = await require_game(repo, game_id)
+    page = [event async for event in repo.iter_events(game["_id"], after=after, limit=limit)]
+    set_next_cursor(response, page, limit, lambda event: event["version"])
+    return model_response(page, response)
+
+@router.get("/game/replay", response_model=ReplayedGame)
+@router.get("/games/{game_id}/replay", response_model=ReplayedGame)
+async def replay_game(version: Optional[int] = None, game_id: Optional[str] = None, repo = Depends(get_repository)):
+    """Rebuild a game from its event log, as it was at `version` (default: now)"""
+    game = await require_game(repo, game_id)
+    state = await rebuild(repo, game["_id"], version)
+    if state.version is None:
+        raise HTTPException(status_code=404, detail="No events recorded for this game at that version")
+    replayed = state.as_dict()
+    replayed["winners"] = [to_winner(winner) for winner in replayed["winners"]]
+    return model_response(ReplayedGame.model_construct(**replayed))
+
+def to_archived(entry):
+    """ArchivedGame from an archive index entry"""
+    return ArchivedGame.model_construct(id=str(entry["_id"]), **{key: value for key, value in entry.items() if key != "_id"})
+
+@router.get("/archive", response_model=List[ArchivedGame])
+async def list_archived_games(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = DEFAULT_ARCHIVE_LIMIT,
+    repo = Depends(get_repository)
+):
+    """Games moved to the cold archive, newest first; pass the last `created_at` as `until` for the next page"""
+    check_limit(limit)
+    return model_response([to_archived(entry) async for entry in repo.iter_archived(since, until, limit)])
+
+@router.get("/archive/{game_id}", response_model=ArchivedGame)
+async def get_archived_game(game_id: str, repo = Depends(get_repository)):
+    """Index entry of an archived game"""
+    entry = await repo.find_archived(game_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Archived game not found")
+    return model_response(to_archived(entry))
+
+@router.post("/games/{game_id}/restore", response_model=Game)
+async def restore_game(
+    game_id: str,
+    response: Response,
+    repo = Depends(get_repository),
+    admitted = Depends(admit_write)
+):
+    """Bring an archived game back into the live storage, as an inactive game"""
+    game = await repo.restore_game(game_id)
+    if game is None:
+        raise HTTPException(status_code=404, detail="Archived game not found")
+    games_restored.inc()
+    set_etag(response, game["_id"], game.get("version", 0))
+    # Restored games are never the active one, so stream subscribers aren't told
+    return model_response(remember_game(game, await repo.load_game(game)), response)
+
+@router.get("/stream")
+@router.get("/games/{game_id}/stream")
+async def stream_game(request: Request, game_id: Optional[str] = None, repo = Depends(get_repository)):
+    """Stream a game's changes as Server-Sent Events; without an id, those of whichever game is active"""
+    # Subscribe before reading the snapshot so no change falls in between
+    subscription = broadcaster.subscribe(game_id)
+    game = await load_active_game(repo, game_id)
+    if game_id is None and game is not None:
+        broadcaster.activate(game.id)
+    elif game is None and game_id is not None:
+        broadcaster.unsubscribe(subscription)
+        raise HTTPException(status_code=404, detail="Game not found")
+    snapshot = game.model_dump() if game else {}
+    
+    return StreamingResponse(
+        sse_stream(broadcaster, subscription, format_sse("game", snapshot), request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """Get hit/miss counters for the in-process game cache"""
+    return game_cache.stats()
@@ -1,24 +1,79 @@
-from fastapi import FastAPI, APIRouter
+from fastapi import FastAPI, APIRouter, Response
+from fastapi.responses import JSONResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
-import os
+from contextlib import asynccontextmanager
+import asyncio
 import logging
 from pathlib import Path
 
+# Load .env before the service modules, which read their settings on import
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
 # Import routes
 from routes.roulette import router as roulette_router
+from routes.analytics import router as analytics_router
+from database import close_storage, get_storage, lean_startup, readiness, start_storage, storage_backend, warm_pool
+from services.admission import write_admission
+from services.analytics import analytics_cache
+from services.archive import ARCHIVE_AFTER_DAYS, ARCHIVE_INTERVAL_SECONDS, archive_loop
+from services.broadcaster import broadcaster, change_streams_enabled, watch_game_changes
+from services.change_feed import change_feed
+from services.draw_engine import draw_pools
+from services.game_cache import game_cache
+from services.game_locks import game_locks
+from services.metrics import CONTENT_TYPE, MetricsMiddleware, registry
+from services.participant_index import participant_indexes
+from services.serialization import FastJSONResponse
 
-ROOT_DIR = Path(__file__).parent
-load_dotenv(ROOT_DIR / '.env')
+@asynccontextmanager
+async def lifespan(app):
+    logger.info("🚀 Roulette API server starting up...")
+    backend = storage_backend()
+    logger.info(f"📊 Storage backend: {backend}")
+    repo = get_storage()
+    lean = backend == "mongo" and lean_startup()
+    if lean:
+        logger.info("⚡ Lean startup: indexes and migrations are left to `python manage.py prepare`")
+    else:
+        await start_storage()
+    logger.info("🗂️ Storage ready")
+    change_stream_task = None
+    if backend == "mongo":
+        if not lean:
+            opened = await warm_pool()
+            logger.info(f"🔗 MongoDB pool warmed up with {opened} connections")
+        if change_streams_enabled():
+            change_stream_task = asyncio.create_task(
+                watch_game_changes(repo.db, broadcaster, on_change=invalidate_changed_game)
+            )
+            logger.info("📡 Streaming game changes from MongoDB change stream")
+    archive_task = None
+    if ARCHIVE_INTERVAL_SECONDS > 0:
+        archive_task = asyncio.create_task(archive_loop(repo))
+        logger.info(f"🗄️ Archiving games untouched for {ARCHIVE_AFTER_DAYS:g} days every {ARCHIVE_INTERVAL_SECONDS:g}s")
+    app.state.ready = True
+
+    yield
+
+    app.state.ready = False
+    if change_stream_task is not None:
+        change_stream_task.cancel()
+    if archive_task is not None:
+        archive_task.cancel()
+    logger.info("🔌 Closing storage...")
+    await close_storage()
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+def invalidate_changed_game(change):
+    """Drop cached games that another worker has written"""
+    game = change.get("fullDocument")
+    if game and game_cache.version_of(str(game["_id"])) != game.get("version", 0):
+        game_cache.invalidate(str(game["_id"]))
 
 # Create the main app without a prefix
-app = FastAPI(title="Roulette API", version="1.0.0")
+app = FastAPI(title="Roulette API", version="1.0.0", lifespan=lifespan, default_response_class=FastJSONResponse)
+app.state.ready = False
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -28,8 +83,40 @@ api_router = APIRouter(prefix="/api")
 async def root():
     return {"message": "Roulette API is running", "status": "healthy"}
 
-# Include roulette routes
+# Readiness check: 503 until startup finished, during shutdown and while
+# MongoDB is unreachable; reports connection pool saturation
+@api_router.get("/ready")
+async def ready():
+    storage_ready, details = await readiness()
+    is_ready = app.state.ready and storage_ready
+    return JSONResponse(
+        {"status": "ready" if is_ready else "unavailable", **details},
+        status_code=200 if is_ready else 503
+    )
+
+# Prometheus scrape endpoint
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(registry.render(), media_type=CONTENT_TYPE)
+
+# Sizes of the in-process caches and pools, read at scrape time
+registry.gauge("roulette_cached_games", "Games held in the game cache", function=lambda: game_cache.stats()["entries"])
+registry.counter("roulette_game_cache_hits_total", "Game cache hits", function=lambda: game_cache.hits)
+registry.counter("roulette_game_cache_misses_total", "Game cache misses", function=lambda: game_cache.misses)
+registry.gauge("roulette_cached_draw_pools", "Draw pools held between spins", function=lambda: len(draw_pools))
+registry.gauge("roulette_locked_games", "Games with a draw running or queued", function=lambda: len(game_locks))
+registry.gauge("roulette_stream_subscribers", "Connected event stream clients", function=lambda: broadcaster.subscriber_count)
+registry.gauge("roulette_write_concurrency_limit", "Writes allowed to run at once, 0 when off", function=lambda: write_admission.limit)
+registry.gauge("roulette_write_queue_limit", "Writes allowed to wait for a slot", function=lambda: write_admission.queue_size)
+registry.gauge("roulette_writes_running", "Writes holding a slot", function=lambda: write_admission.running)
+registry.gauge("roulette_writes_queued", "Writes waiting for a slot", function=lambda: write_admission.waiting)
+registry.gauge("roulette_cached_analytics_reports", "Analytics reports held in the cache", function=lambda: len(analytics_cache))
+registry.gauge("roulette_participant_indexes", "Games with a participant search index in memory", function=lambda: len(participant_indexes))
+registry.gauge("roulette_change_feeds", "Games with recent changes kept for delta polling", function=lambda: len(change_feed))
+
+# Include roulette and analytics routes
 app.include_router(roulette_router)
+app.include_router(analytics_router)
 
 # Include the main API router
 app.include_router(api_router)
@@ -40,21 +127,15 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+# Added last so it wraps CORS and sees every response
+app.add_middleware(MetricsMiddleware)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
-logger = logging.getLogger(__name__)
-
-@app.on_event("startup")
-async def startup_event():
-    logger.info("🚀 Roulette API server starting up...")
-    logger.info(f"📊 Connected to MongoDB: {mongo_url}")
-
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    logger.info("🔌 Closing database connection...")
-    client.close()
\ No newline at end of file
+logger = logging.getLogger(__name__)
\ No newline at end of file
@@ -0,0 +1,123 @@
+from fastapi import HTTPException, Request
+from contextlib import asynccontextmanager
+from typing import Optional
+import asyncio
+import math
+import os
+import time
+
+from database import get_rate_limit_store
+from services.metrics import admission_rejections, rate_limit_burst, rate_limit_per_second, write_queue_wait
+
+# Token bucket limits on writes: sustained requests per second and burst
+# size, per client and per game. A rate of 0 turns that limit off.
+CLIENT_RATE = float(os.environ.get('RATE_LIMIT_CLIENT_PER_SECOND', 10))
+CLIENT_BURST = float(os.environ.get('RATE_LIMIT_CLIENT_BURST', 50))
+GAME_RATE = float(os.environ.get('RATE_LIMIT_GAME_PER_SECOND', 50))
+GAME_BURST = float(os.environ.get('RATE_LIMIT_GAME_BURST', 100))
+# Identify clients by the first X-Forwarded-For address; only enable behind
+# a proxy that sets it, since clients can send anything. Left off behind a
+# reverse proxy, every client is seen as the proxy's address and all of them
+# share one client bucket, i.e. CLIENT_RATE requests per second in total
+TRUST_FORWARDED_FOR = os.environ.get('RATE_LIMIT_TRUST_FORWARDED_FOR', '').lower() in ('1', 'true', 'yes')
+# Writes running at once in this worker, kept well below the MongoDB pool
+# size so reads still find a free connection during a write burst; 0 turns
+# the cap off
+WRITE_CONCURRENCY = int(os.environ.get('WRITE_CONCURRENCY', 32))
+# Writes allowed to wait for a slot, and for how long, before getting a 503
+WRITE_QUEUE_SIZE = int(os.environ.get('WRITE_QUEUE_SIZE', 64))
+WRITE_QUEUE_TIMEOUT_SECONDS = float(os.environ.get('WRITE_QUEUE_TIMEOUT_SECONDS', 2.0))
+
+for scope, rate, burst in (("client", CLIENT_RATE, CLIENT_BURST), ("game", GAME_RATE, GAME_BURST)):
+    rate_limit_per_second.labels(scope).set(rate)
+    rate_limit_burst.labels(scope).set(burst)
+
+
+def reject(status_code, reason, detail, retry_after):
+    admission_rejections.labels(reason).inc()
+    raise HTTPException(
+        status_code=status_code, detail=detail, headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+    )
+
+
+class WriteAdmission:
+    """Caps the writes running at once, queueing a bounded number of others.
+
+    A write arriving with every slot taken and the queue full is rejected
+    at once, and one that waited `queue_timeout` without getting a slot
+    gives up; both get a 503 so clients back off instead of piling up on
+    the MongoDB pool.
+    """
+
+    def __init__(self, limit=WRITE_CONCURRENCY, queue_size=WRITE_QUEUE_SIZE, queue_timeout=WRITE_QUEUE_TIMEOUT_SECONDS):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.running = 0
+        self.waiting = 0
+        self._slots = asyncio.Semaphore(limit) if limit > 0 else None
+
+    @asynccontextmanager
+    async def slot(self):
+        if self._slots is None:
+            yield
+            return
+        if self._slots.locked():
+            if self.waiting >= self.queue_size:
+                reject(503, "queue_full", "Too many writes in progress, please retry", 1)
+            started = time.perf_counter()
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                reject(503, "queue_timeout", "Too many writes in progress, please retry", 1)
+            finally:
+                self.waiting -= 1
+            write_queue_wait.observe(time.perf_counter() - started)
+        else:
+            await self._slots.acquire()
+        self.running += 1
+        try:
+            yield
+        finally:
+            self.running -= 1
+            self._slots.release()
+
+
+write_admission = WriteAdmission()
+
+
+def client_key(request):
+    if TRUST_FORWARDED_FOR:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+async def check_rate_limits(request, game_id=None, per_game=False):
+    """429 when the client's, or with `per_game` the game's, bucket is empty"""
+    store = get_rate_limit_store()
+    if CLIENT_RATE > 0:
+        wait = await store.take(f"client:{client_key(request)}", CLIENT_RATE, CLIENT_BURST)
+        if wait:
+            reject(429, "client_rate", "Too many requests, please slow down", wait)
+    if per_game and GAME_RATE > 0:
+        # Routes without an id address the single active game
+        wait = await store.take(f"game:{game_id or 'active'}", GAME_RATE, GAME_BURST)
+        if wait:
+            reject(429, "game_rate", "Too many writes to this game, please slow down", wait)
+
+
+async def admit_write(request: Request):
+    """Dependency admitting a write that creates a game: client rate limit, then a write slot"""
+    await check_rate_limits(request)
+    async with write_admission.slot():
+        yield
+
+
+async def admit_game_write(request: Request, game_id: Optional[str] = None):
+    """Dependency admitting a write to a game: client and game rate limits, then a write slot"""
+    await check_rate_limits(request, game_id, per_game=True)
+    async with write_admission.slot():
+        yield
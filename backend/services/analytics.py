@@ -0,0 +1,192 @@
+from collections import Counter
+import asyncio
+import math
+import os
+import time
+
+# numpy and pandas modules once imported, or False when they are not installed
+_vectorized = None
+
+# How long a computed report is served before it is computed again
+ANALYTICS_CACHE_SECONDS = float(os.environ.get('ANALYTICS_CACHE_SECONDS', 60))
+# Participant list bins the fairness test compares winners across
+DEFAULT_FAIRNESS_BINS = 10
+MAX_FAIRNESS_BINS = 100
+
+
+class AnalyticsCache:
+    """Reports by name and parameters, recomputed once `ttl_seconds` have passed.
+
+    Concurrent requests for a report that is being computed wait for that
+    computation instead of starting their own; a failed one is not cached.
+    """
+
+    def __init__(self, ttl_seconds=ANALYTICS_CACHE_SECONDS, clock=time.monotonic):
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._reports = {}
+
+    async def get(self, key, compute):
+        now = self.clock()
+        cached = self._reports.get(key)
+        if cached is None or cached[0] <= now:
+            cached = (now + self.ttl_seconds, asyncio.ensure_future(compute()))
+            self._reports[key] = cached
+            for stale in [stale for stale, (expires_at, _) in self._reports.items() if expires_at <= now]:
+                del self._reports[stale]
+        task = cached[1]
+        try:
+            return await asyncio.shield(task)
+        except Exception:
+            if self._reports.get(key) is cached:
+                del self._reports[key]
+            raise
+
+    def clear(self):
+        self._reports.clear()
+
+    def __len__(self):
+        return len(self._reports)
+
+
+analytics_cache = AnalyticsCache()
+
+
+def chi_square_p_value(statistic, degrees_of_freedom):
+    """Upper tail probability of the chi-square distribution, Q(dof / 2, statistic / 2)"""
+    if degrees_of_freedom <= 0:
+        return None
+    a, x = degrees_of_freedom / 2, statistic / 2
+    if x <= 0:
+        return 1.0
+    log_prefix = a * math.log(x) - x - math.lgamma(a)
+    if x < a + 1:
+        # Series for the lower tail
+        term = total = 1 / a
+        n = a
+        while abs(term) > abs(total) * 1e-15:
+            n += 1
+            term *= x / n
+            total += term
+        return max(0.0, 1 - total * math.exp(log_prefix))
+    # Continued fraction for the upper tail (modified Lentz)
+    tiny = 1e-300
+    b = x + 1 - a
+    c, d = 1 / tiny, 1 / b
+    fraction = d
+    for i in range(1, 1000):
+        an = -i * (i - a)
+        b += 2
+        d = an * d + b
+        d = 1 / (d if abs(d) > tiny else tiny)
+        c = b + an / c
+        c = c if abs(c) > tiny else tiny
+        delta = c * d
+        fraction *= delta
+        if abs(delta - 1) < 1e-15:
+            break
+    return min(1.0, math.exp(log_prefix) * fraction)
+
+
+def with_p_value(report):
+    """Add degrees of freedom and p-value to a repository's fairness row"""
+    degrees_of_freedom = report["bins"] - 1
+    return dict(
+        report,
+        degrees_of_freedom=degrees_of_freedom,
+        p_value=chi_square_p_value(report["chi_square"], degrees_of_freedom)
+    )
+
+
+def vectorized():
+    """(numpy, pandas), or None to aggregate in plain Python when they are not installed.
+
+    They are imported on first use: loading them takes longer than loading
+    the rest of the service, and only these reports need them.
+    """
+    global _vectorized
+    if _vectorized is None:
+        try:
+            import numpy
+            import pandas
+            _vectorized = (numpy, pandas)
+        except ImportError:
+            _vectorized = False
+    return _vectorized or None
+
+
+# In-memory aggregations, over the visible winner dicts of the selected games
+
+def wins_per_name(winners, limit):
+    modules = vectorized()
+    if modules and winners:
+        _, pandas = modules
+        counts = pandas.Series([winner["name"] for winner in winners]).value_counts(sort=False)
+        counts = counts.sort_index(kind="stable").sort_values(ascending=False, kind="stable")
+        return [{"name": name, "wins": int(wins)} for name, wins in counts.head(limit).items()]
+    counts = sorted(Counter(winner["name"] for winner in winners).items(), key=lambda item: (-item[1], item[0]))
+    return [{"name": name, "wins": wins} for name, wins in counts[:limit]]
+
+
+def draws_per_day(winners):
+    modules = vectorized()
+    if modules and winners:
+        _, pandas = modules
+        days = pandas.to_datetime(pandas.Series([winner["timestamp"] for winner in winners])).dt.strftime("%Y-%m-%d")
+        return [{"day": day, "draws": int(draws)} for day, draws in days.value_counts().sort_index().items()]
+    counts = Counter(winner["timestamp"].strftime("%Y-%m-%d") for winner in winners)
+    return [{"day": day, "draws": counts[day]} for day in sorted(counts)]
+
+
+def pool_size_stats(games, winners):
+    modules = vectorized()
+    if modules and winners:
+        numpy, _ = modules
+        average = float(numpy.fromiter((winner["total_participants"] for winner in winners), float, len(winners)).mean())
+    else:
+        average = sum(winner["total_participants"] for winner in winners) / len(winners) if winners else None
+    return {"games": games, "draws": len(winners), "average_pool_size": average}
+
+
+def fairness_report(game_id, created_at, tickets, won, bins):
+    """Repository fairness row of a game, see `fairness_chi_square`"""
+    chi_square, used_bins = fairness_chi_square(tickets, won, bins)
+    return {
+        "game_id": str(game_id),
+        "created_at": created_at,
+        "participants": len(tickets),
+        "winners": sum(won),
+        "bins": used_bins,
+        "chi_square": chi_square
+    }
+
+
+def fairness_chi_square(tickets, won, bins):
+    """Chi-square of winners over `bins` about equal runs of the participant list.
+
+    `tickets` and `won` describe the participants in list order. A fair draw
+    spreads winners across the runs in proportion to their tickets.
+    """
+    modules = vectorized()
+    if modules:
+        numpy, _ = modules
+        tickets = numpy.asarray(tickets, dtype=float)
+        won = numpy.asarray(won, dtype=float)
+        splits = numpy.array_split(numpy.arange(len(tickets)), min(bins, len(tickets)))
+        starts = [split[0] for split in splits]
+        observed = numpy.add.reduceat(won, starts)
+        expected = won.sum() * numpy.add.reduceat(tickets, starts) / tickets.sum()
+        nonzero = expected > 0
+        return float((((observed - expected) ** 2)[nonzero] / expected[nonzero]).sum()), len(splits)
+
+    count = min(bins, len(tickets))
+    size, extra = divmod(len(tickets), count)
+    total_tickets, drawn = sum(tickets), sum(won)
+    statistic, start = 0.0, 0
+    for i in range(count):
+        end = start + size + (1 if i < extra else 0)
+        expected = drawn * sum(tickets[start:end]) / total_tickets
+        if expected > 0:
+            statistic += (sum(won[start:end]) - expected) ** 2 / expected
+        start = end
+    return statistic, count
@@ -0,0 +1,170 @@
+from bson import ObjectId
+from datetime import datetime, timedelta
+import asyncio
+import gzip
+import json
+import logging
+import os
+
+from services import analytics
+from services.change_feed import change_feed
+from services.draw_engine import draw_pools
+from services.game_cache import game_cache
+from services.metrics import archive_bytes, games_archived
+from services.participant_index import participant_indexes
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Finished games, ones replaced as the active game, are archived once untouched
+# for this many days. Their index entries keep the winners the analytics reports
+# count, so archived games stay covered by them.
+ARCHIVE_AFTER_DAYS = float(os.environ.get('ARCHIVE_AFTER_DAYS', 30))
+# Seconds between archiver runs inside the API; 0 leaves archiving to
+# `python manage.py archive`
+ARCHIVE_INTERVAL_SECONDS = float(os.environ.get('ARCHIVE_INTERVAL_SECONDS', 0))
+# Games fetched per storage query while archiving
+ARCHIVE_BATCH_SIZE = 100
+ZSTD_LEVEL = 10
+
+# Game document fields an archive keeps; the rest describe how a backend
+# lays the game out and are rebuilt on restore
+GAME_FIELDS = (
+    "_id", "version", "participant_count", "winner_count", "weighted",
+    "created_at", "updated_at", "ended_at", "is_active", "list_epoch", "next_seq"
+)
+
+
+def encode(value):
+    """JSON form of the non-JSON values games hold, for `json.dump(default=...)`"""
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat()}
+    if isinstance(value, ObjectId):
+        return {"$oid": str(value)}
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def decode(value):
+    """Inverse of `encode`, for `json.load(object_hook=...)`"""
+    if len(value) == 1 and "$date" in value:
+        return datetime.fromisoformat(value["$date"])
+    if len(value) == 1 and "$oid" in value:
+        return ObjectId(value["$oid"])
+    return value
+
+
+def pack(game, participants, winners, events):
+    """Compress a game into NDJSON lines: `{"game"}`, then `{"participant"}`, `{"winner"}` and `{"event"}` lines.
+
+    Participants are `{seq, name, tickets, won_version}` dicts covering the
+    whole list, drawn ones included. The format is the same for every
+    backend, so a game archived by one can be restored into another.
+    Returns (codec, compressed bytes, uncompressed size).
+    """
+    lines = [{"game": {field: game[field] for field in GAME_FIELDS if field in game}}]
+    lines.extend({"participant": participant} for participant in participants)
+    lines.extend({"winner": winner} for winner in winners)
+    lines.extend({"event": event} for event in events)
+    raw = "\n".join(json.dumps(line, default=encode, ensure_ascii=False) for line in lines).encode()
+    if zstandard is not None:
+        codec, data = "zstd", zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+    else:
+        codec, data = "gzip", gzip.compress(raw)
+    archive_bytes.labels("raw").inc(len(raw))
+    archive_bytes.labels("compressed").inc(len(data))
+    return codec, data, len(raw)
+
+
+def unpack(codec, data):
+    """(game, participants, winners, events) of a packed game"""
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("This archive is zstd-compressed; install zstandard to restore it")
+        raw = zstandard.ZstdDecompressor().decompress(data)
+    else:
+        raw = gzip.decompress(data)
+    game, parts = None, {"participant": [], "winner": [], "event": []}
+    for line in raw.decode().split("\n"):
+        (kind, value), = json.loads(line, object_hook=decode).items()
+        if kind == "game":
+            game = value
+        else:
+            parts[kind].append(value)
+    return game, parts["participant"], parts["winner"], parts["event"]
+
+
+def describe(game, codec, data, raw_bytes, winners):
+    """Index entry of an archived game, for lookups by id and date and for analytics without unpacking it"""
+    return {
+        "_id": game["_id"],
+        "created_at": game["created_at"],
+        "updated_at": game["updated_at"],
+        "archived_at": datetime.utcnow(),
+        "version": game.get("version", 0),
+        "participant_count": game.get("participant_count", 0),
+        "winner_count": game.get("winner_count", 0),
+        "codec": codec,
+        "compressed_bytes": len(data),
+        "raw_bytes": raw_bytes,
+        "winners": [
+            {"name": winner["name"], "timestamp": winner["timestamp"], "total_participants": winner["total_participants"]}
+            for winner in winners
+        ]
+    }
+
+
+def fairness(entry, data, bins):
+    """Fairness report row of an archived game, from the participant list packed in `data`"""
+    _, participants, _, _ = unpack(entry["codec"], data)
+    participants.sort(key=lambda participant: participant["seq"])
+    return analytics.fairness_report(
+        entry["_id"], entry["created_at"],
+        [participant["tickets"] for participant in participants],
+        [participant["won_version"] is not None for participant in participants],
+        bins
+    )
+
+
+def forget(game_id):
+    """Drop what this worker keeps in memory about a game that left the live storage"""
+    game_cache.invalidate(game_id)
+    draw_pools.discard(game_id)
+    participant_indexes.discard(game_id)
+    change_feed.discard(game_id)
+
+
+async def archive_games(repo, older_than_days=ARCHIVE_AFTER_DAYS, limit=None):
+    """Archive finished games untouched for `older_than_days`, at most `limit`; returns how many"""
+    await repo.finish_archiving()
+    before = datetime.utcnow() - timedelta(days=older_than_days)
+    archived = 0
+    while limit is None or archived < limit:
+        batch_size = ARCHIVE_BATCH_SIZE if limit is None else min(ARCHIVE_BATCH_SIZE, limit - archived)
+        games = await repo.find_archivable(before, batch_size)
+        moved = 0
+        for game in games:
+            # None when the game was written to since it was read; it stays live
+            if await repo.archive_game(game) is not None:
+                forget(str(game["_id"]))
+                moved += 1
+        archived += moved
+        games_archived.inc(moved)
+        if not moved:
+            break
+    return archived
+
+
+async def archive_loop(repo, interval=ARCHIVE_INTERVAL_SECONDS, older_than_days=ARCHIVE_AFTER_DAYS):
+    """Archive finished games every `interval` seconds until cancelled"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            archived = await archive_games(repo, older_than_days)
+            if archived:
+                logger.info(f"Archived {archived} games untouched for {older_than_days:g} days")
+        except Exception:
+            logger.exception("Archiving finished games failed")
@@ -0,0 +1,174 @@
+import asyncio
+import logging
+import os
+
+from services.serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+# Seconds between keep-alive comments on an idle stream
+HEARTBEAT_SECONDS = 15
+# Frames buffered per subscriber before it is told to resync
+SUBSCRIBER_QUEUE_SIZE = 64
+
+RESYNC_FRAME = "event: resync\ndata: {}\n\n"
+HEARTBEAT_FRAME = ": keep-alive\n\n"
+
+
+def format_sse(event, data):
+    """Encode one Server-Sent Events frame"""
+    payload = dumps(data).decode("utf-8")
+    frame = f"event: {event}\ndata: {payload}\n\n"
+    version = data.get("version") if isinstance(data, dict) else None
+    if version is not None:
+        frame = f"id: {version}\n" + frame
+    return frame
+
+
+class Subscription:
+    """One connected stream client and its pending frames; `game_id` None follows the active game"""
+
+    __slots__ = ("queue", "game_id")
+
+    def __init__(self, maxsize, game_id=None):
+        self.queue = asyncio.Queue(maxsize)
+        self.game_id = game_id
+
+    def offer(self, frame):
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            # The client fell behind; drop its backlog and ask it to reload
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC_FRAME)
+
+
+class Broadcaster:
+    """In-process fan-out of game changes to the subscribers of each game.
+
+    A subscriber follows one game, or whichever game is active: events of
+    a game reach its own subscribers, and those following the active game
+    while it is `active_id`. Each event is encoded once and the same frame
+    is queued for every subscriber it reaches, so publishing costs one
+    put_nowait per connection. When `local_publish` is off, route handlers'
+    publishes are ignored and events come only from the MongoDB change
+    stream, which every worker sees.
+    """
+
+    def __init__(self, queue_size=SUBSCRIBER_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.local_publish = True
+        self.active_id = None
+        # Subscriptions by game id, None holding those following the active game
+        self._subscribers = {}
+
+    @property
+    def subscriber_count(self):
+        return sum(len(subscriptions) for subscriptions in self._subscribers.values())
+
+    def subscribe(self, game_id=None):
+        subscription = Subscription(self.queue_size, game_id)
+        self._subscribers.setdefault(game_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscriptions = self._subscribers.get(subscription.game_id)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscribers[subscription.game_id]
+
+    def activate(self, game_id):
+        """Make `game_id` the game followed by subscribers of the active game"""
+        self.active_id = game_id
+
+    @property
+    def wants_local_events(self):
+        """Whether a change made by this worker would reach anyone"""
+        return self.local_publish and bool(self._subscribers)
+
+    def publish(self, event, data):
+        """Publish a change made by this worker; a "game" event carries the game as `id`, others as `game_id`"""
+        if self.wants_local_events:
+            self.publish_frame(data["id"] if event == "game" else data["game_id"], format_sse(event, data))
+
+    def publish_frame(self, game_id, frame):
+        for subscription in self._subscribers.get(game_id, ()):
+            subscription.offer(frame)
+        if game_id == self.active_id:
+            for subscription in self._subscribers.get(None, ()):
+                subscription.offer(frame)
+
+
+async def sse_stream(broadcaster, subscription, first_frame, is_disconnected):
+    """Yield SSE frames for one subscriber until it disconnects"""
+    try:
+        yield first_frame
+        while True:
+            try:
+                frame = await asyncio.wait_for(subscription.queue.get(), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                if await is_disconnected():
+                    break
+                frame = HEARTBEAT_FRAME
+            yield frame
+    finally:
+        broadcaster.unsubscribe(subscription)
+
+
+def change_to_events(change):
+    """Translate a games change stream document into stream events.
+
+    Game documents only carry counters, so draws are read from the pending
+    record they are committed with and any other write asks clients to
+    reload the game.
+    """
+    game = change.get("fullDocument")
+    if not game:
+        return []
+    game_id = str(game["_id"])
+    version = game.get("version", 0)
+
+    if change["operationType"] in ("insert", "replace"):
+        return [("resync", {"game_id": game_id, "version": version})]
+
+    updated = change.get("updateDescription", {}).get("updatedFields", {})
+    pending = updated.get("pending")
+    if pending:
+        winners = pending["winners"]
+        removed = [winner["name"] for winner in winners]
+        if len(winners) == 1:
+            return [("spin", {"game_id": game_id, "version": pending["version"], "winner": winners[0], "removed": removed})]
+        return [("draw", {"game_id": game_id, "version": pending["version"], "winners": winners, "removed": removed})]
+    if "version" in updated:
+        return [("resync", {"game_id": game_id, "version": version})]
+    return []
+
+
+async def watch_game_changes(db, broadcaster, on_change=None):
+    """Feed the broadcaster from a MongoDB change stream (needs a replica set)"""
+    broadcaster.local_publish = False
+    try:
+        async with db.games.watch(full_document="updateLookup") as stream:
+            async for change in stream:
+                game = change.get("fullDocument")
+                if change["operationType"] in ("insert", "replace") and game and game.get("is_active"):
+                    broadcaster.activate(str(game["_id"]))
+                for event, data in change_to_events(change):
+                    broadcaster.publish_frame(data["game_id"], format_sse(event, data))
+                if on_change is not None:
+                    on_change(change)
+    except asyncio.CancelledError:
+        raise
+    except Exception:
+        logger.exception("Game change stream stopped, falling back to local publishing")
+    finally:
+        broadcaster.local_publish = True
+
+
+def change_streams_enabled():
+    return os.environ.get('STREAM_CHANGE_STREAMS', '').lower() in ('1', 'true', 'yes')
+
+
+broadcaster = Broadcaster()
@@ -0,0 +1,83 @@
+from collections import OrderedDict, deque
+import os
+
+# Change types
+SPIN = "spin"
+APPEND = "append"
+
+# Changes kept per game; clients further behind get the whole game
+CHANGE_FEED_SIZE = 256
+# Games whose recent changes are kept at once
+MAX_FEED_GAMES = 256
+
+
+class Feed:
+    """Ring buffer of one game's latest changes, reaching up to `version`"""
+
+    __slots__ = ("version", "changes")
+
+    def __init__(self, version, size):
+        self.version = version
+        self.changes = deque(maxlen=size)
+
+    @property
+    def oldest(self):
+        """Earliest version a client can be at and still get the changes after it"""
+        return self.changes[0]["version"] - 1 if self.changes else self.version
+
+
+class ChangeFeed:
+    """Recent changes of games written through this worker, for delta polling.
+
+    Each change takes a game from one version to the next: a draw records
+    its winners and the positions it removed from the participant list
+    before it, an append the participants it added. Any other write (a new
+    list, a reset, a write missed by this worker) can't be told as a delta
+    and restarts the game's feed at its version, so clients behind it get
+    the whole game again. With several workers each one only holds its own
+    writes; a game last written elsewhere is answered with a snapshot.
+    """
+
+    def __init__(self, size=CHANGE_FEED_SIZE, max_games=MAX_FEED_GAMES):
+        self.size = size
+        self.max_games = max_games
+        self._feeds = OrderedDict()
+
+    def _store(self, game_id, feed):
+        self._feeds[game_id] = feed
+        self._feeds.move_to_end(game_id)
+        while len(self._feeds) > self.max_games:
+            self._feeds.popitem(last=False)
+        return feed
+
+    def record(self, game_id, version, kind, **data):
+        """Add the change that produced `version`"""
+        feed = self._feeds.get(game_id)
+        if feed is None or feed.version != version - 1:
+            feed = self._store(game_id, Feed(version - 1, self.size))
+        feed.changes.append({"version": version, "type": kind, **data})
+        feed.version = version
+
+    def restart(self, game_id, version):
+        """Forget a game's changes up to `version`, written in a way no delta describes"""
+        self._store(game_id, Feed(version, self.size))
+
+    def since(self, game_id, since, version):
+        """Changes taking a game from `since` to `version`, or None when they aren't all kept"""
+        feed = self._feeds.get(game_id)
+        if feed is None or feed.version != version or not feed.oldest <= since <= version:
+            return None
+        self._feeds.move_to_end(game_id)
+        return [change for change in feed.changes if change["version"] > since]
+
+    def discard(self, game_id):
+        self._feeds.pop(game_id, None)
+
+    def __len__(self):
+        return len(self._feeds)
+
+
+change_feed = ChangeFeed(
+    size=int(os.environ.get('CHANGE_FEED_SIZE', CHANGE_FEED_SIZE)),
+    max_games=int(os.environ.get('CHANGE_FEED_MAX_GAMES', MAX_FEED_GAMES))
+)
@@ -0,0 +1,49 @@
+from fastapi import HTTPException
+from fastapi.responses import Response
+
+
+def make_etag(game_id, version):
+    """Entity tag of a game at one version"""
+    return f'"{game_id}.{version}"'
+
+
+def _tags(header):
+    return [tag.strip().removeprefix("W/") for tag in header.split(",") if tag.strip()]
+
+
+def not_modified(request, response, game_id, version):
+    """Return a 304 response if the client's If-None-Match covers this version.
+
+    Otherwise the ETag is set on `response` and None is returned.
+    """
+    etag = make_etag(game_id, version)
+    header = request.headers.get("if-none-match")
+    if header and any(tag in ("*", etag) for tag in _tags(header)):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return None
+
+
+def if_match(request):
+    """(game_id, version) a write is conditional on, or None without If-Match"""
+    header = request.headers.get("if-match")
+    if not header or header.strip() == "*":
+        return None
+    tags = _tags(header)
+    try:
+        if len(tags) != 1:
+            raise ValueError(header)
+        game_id, version = tags[0].strip('"').rsplit(".", 1)
+        return game_id, int(version)
+    except ValueError:
+        raise HTTPException(status_code=412, detail="If-Match must be a single game ETag")
+
+
+def precondition_failed():
+    return HTTPException(status_code=412, detail="Game has changed since it was read")
+
+
+def check_precondition(expected, game_id, version):
+    """Fail with 412 unless the game is still at the version the client expects"""
+    if expected is not None and expected != (str(game_id), version):
+        raise precondition_failed()
@@ -0,0 +1,227 @@
+from collections import OrderedDict
+import hashlib
+import hmac
+import json
+import logging
+import os
+import random
+import secrets
+
+audit_logger = logging.getLogger("roulette.draw_audit")
+
+RNG_MODES = ("secure", "audited", "pseudo")
+# Games whose draw pools are kept in memory between spins
+MAX_CACHED_POOLS = 1_024
+
+
+class FenwickTree:
+    """Binary indexed tree over non-negative integer weights"""
+
+    __slots__ = ("size", "tree", "total", "_top")
+
+    def __init__(self, weights):
+        self.size = len(weights)
+        tree = [0] + list(weights)
+        for i in range(1, self.size + 1):
+            parent = i + (i & -i)
+            if parent <= self.size:
+                tree[parent] += tree[i]
+        self.tree = tree
+        self.total = sum(weights)
+        self._top = 1 << self.size.bit_length() if self.size else 0
+
+    def add(self, index, delta):
+        """Add `delta` to the weight at 0-based `index`"""
+        self.total += delta
+        i = index + 1
+        while i <= self.size:
+            self.tree[i] += delta
+            i += i & -i
+
+    def prefix_sum(self, index):
+        """Sum of the weights before 0-based `index`"""
+        total = 0
+        i = index
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def find(self, target):
+        """Smallest 0-based index whose cumulative weight exceeds `target`"""
+        position = 0
+        step = self._top
+        while step:
+            candidate = position + step
+            if candidate <= self.size and self.tree[candidate] <= target:
+                position = candidate
+                target -= self.tree[candidate]
+            step >>= 1
+        return position
+
+
+class DrawPool:
+    """Participants of one game with O(log n) weighted draw-and-remove.
+
+    Entries are identified by their index in the participant list the pool
+    was built from, so two people with the same name stay distinct; `ids`
+    maps an entry back to its stored participant. A second tree of unit
+    weights maps an entry to its current position in the list after earlier
+    winners were removed.
+    """
+
+    def __init__(self, names, tickets=None, winner_count=0, ids=None):
+        self.names = list(names)
+        self.ids = list(ids) if ids is not None else list(range(len(self.names)))
+        self.weighted = tickets is not None
+        self.tickets = list(tickets) if self.weighted else [1] * len(self.names)
+        self.weights = FenwickTree(self.tickets)
+        self.alive = FenwickTree([1] * len(self.names))
+        self.winner_count = winner_count
+
+    @property
+    def remaining(self):
+        return self.alive.total
+
+    @property
+    def total_tickets(self):
+        return self.weights.total
+
+    def remaining_names(self):
+        """Names of the entries not drawn yet, in list order"""
+        return [name for name, tickets in zip(self.names, self.tickets) if tickets]
+
+    def pick(self, rng):
+        """Choose an entry with probability proportional to its tickets"""
+        return self.weights.find(rng.randrange(self.weights.total))
+
+    def position_of(self, index):
+        """Current position of an entry among the remaining participants"""
+        return self.alive.prefix_sum(index)
+
+    def remove(self, index):
+        self.weights.add(index, -self.tickets[index])
+        self.alive.add(index, -1)
+        self.tickets[index] = 0
+
+    def _restore(self, index, tickets):
+        self.weights.add(index, tickets)
+        self.alive.add(index, 1)
+        self.tickets[index] = tickets
+
+    def sample(self, count, rng):
+        """Pick `count` distinct entries, in draw order, leaving the pool as is.
+
+        Entries are removed while drawing so none repeats and then put back,
+        all synchronously, so other coroutines never see a half-drawn pool.
+        Callers `remove` the entries once the draw is committed.
+        """
+        drawn = []
+        for _ in range(count):
+            index = self.pick(rng)
+            drawn.append((index, self.tickets[index]))
+            self.remove(index)
+        for index, tickets in drawn:
+            self._restore(index, tickets)
+        return [index for index, _ in drawn]
+
+
+class PoolCache:
+    """Draw pools of recently spun games, valid for one document version"""
+
+    def __init__(self, max_pools=MAX_CACHED_POOLS):
+        self.max_pools = max_pools
+        self._pools = OrderedDict()
+
+    def get(self, game_id, version):
+        entry = self._pools.get(game_id)
+        if entry is None or entry[0] != version:
+            return None
+        self._pools.move_to_end(game_id)
+        return entry[1]
+
+    def put(self, game_id, version, pool):
+        self._pools[game_id] = (version, pool)
+        self._pools.move_to_end(game_id)
+        while len(self._pools) > self.max_pools:
+            self._pools.popitem(last=False)
+
+    def discard(self, game_id):
+        self._pools.pop(game_id, None)
+
+    def __len__(self):
+        return len(self._pools)
+
+
+class AuditableRandom(random.Random):
+    """Deterministic CSPRNG: HMAC-SHA256 in counter mode keyed by a seed.
+
+    Anyone holding the seed can replay a draw exactly, while nobody can
+    predict its output before the seed is revealed.
+    """
+
+    def seed(self, seed=None):
+        self._key = (seed if seed is not None else secrets.token_hex(32)).encode()
+        self._counter = 0
+        self._buffer = b""
+
+    def _bytes(self, count):
+        while len(self._buffer) < count:
+            block = hmac.new(self._key, self._counter.to_bytes(8, "big"), hashlib.sha256).digest()
+            self._buffer += block
+            self._counter += 1
+        chunk, self._buffer = self._buffer[:count], self._buffer[count:]
+        return chunk
+
+    def getrandbits(self, k):
+        if k <= 0:
+            return 0
+        value = int.from_bytes(self._bytes((k + 7) // 8), "big")
+        return value >> ((k + 7) // 8 * 8 - k)
+
+    def random(self):
+        return self.getrandbits(53) * 2 ** -53
+
+    def getstate(self):
+        """Key, counter and unread output, so copies and pickles continue the same stream"""
+        return self._key, self._counter, self._buffer, self.gauss_next
+
+    def setstate(self, state):
+        self._key, self._counter, self._buffer, self.gauss_next = state
+
+
+_pseudo_rng = random.Random()
+_secure_rng = secrets.SystemRandom()
+
+
+def rng_mode():
+    mode = os.environ.get('DRAW_RNG_MODE', 'secure').lower()
+    return mode if mode in RNG_MODES else 'secure'
+
+
+def make_rng(mode=None):
+    """Return (rng, seed) for one draw; seed is only set in audited mode"""
+    mode = mode or rng_mode()
+    if mode == "audited":
+        seed = secrets.token_hex(32)
+        return AuditableRandom(seed), seed
+    if mode == "pseudo":
+        return _pseudo_rng, None
+    return _secure_rng, None
+
+
+def audit_draw(game_id, version, pool, indices, seed, mode=None):
+    """Record a committed draw so it can be checked or replayed later"""
+    if not audit_logger.isEnabledFor(logging.INFO):
+        return
+    audit_logger.info(json.dumps({
+        "game_id": game_id,
+        "version": version,
+        "rng": mode or rng_mode(),
+        "seed": seed,
+        "total_tickets": pool.total_tickets,
+        "drawn": [{"index": index, "name": pool.names[index]} for index in indices]
+    }, ensure_ascii=False))
+
+
+draw_pools = PoolCache(int(os.environ.get('DRAW_POOL_CACHE_SIZE', MAX_CACHED_POOLS)))
@@ -0,0 +1,117 @@
+from datetime import datetime
+import os
+
+# Event types
+CREATED = "created"
+PARTICIPANTS_CHANGED = "participants-changed"
+RESET = "reset"
+SPIN = "spin"
+# A game replaced as the active one; its participants and winners stay as they were
+ENDED = "ended"
+# Games moved over from the embedded storage start their log with their full state
+MIGRATED = "migrated"
+
+# participants-changed modes
+REPLACE = "replace"
+APPEND = "append"
+
+# A snapshot is stored whenever a game's version reaches a multiple of this
+SNAPSHOT_EVERY = int(os.environ.get('EVENT_SNAPSHOT_EVERY', 100))
+
+
+def make_event(game_id, version, kind, **data):
+    """One entry of a game's log: the write that produced `version`.
+
+    Participant lists carry the sequence number of their first entry
+    (`first_seq`), the others follow consecutively, and spins carry the
+    sequence numbers they removed, so duplicate names replay exactly.
+    """
+    return {"game_id": game_id, "version": version, "type": kind, "at": datetime.utcnow(), **data}
+
+
+class GameState:
+    """A game's participants and winners rebuilt from its event log"""
+
+    __slots__ = ("game_id", "version", "participants", "weighted", "winners", "missing_versions")
+
+    def __init__(self, game_id, version=None, participants=None, weighted=False, winners=None):
+        self.game_id = game_id
+        # None until the first event is applied
+        self.version = version
+        # seq -> (name, tickets), in list order
+        self.participants = participants if participants is not None else {}
+        self.weighted = weighted
+        self.winners = winners if winners is not None else []
+        # Versions whose event was never written, e.g. lost with a crashed worker
+        self.missing_versions = []
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        return cls(
+            snapshot["game_id"],
+            snapshot["version"],
+            {seq: (name, tickets) for seq, name, tickets in snapshot["participants"]},
+            snapshot.get("weighted", False),
+            list(snapshot["winners"])
+        )
+
+    def to_snapshot(self):
+        return {
+            "game_id": self.game_id,
+            "version": self.version,
+            "participants": [[seq, name, tickets] for seq, (name, tickets) in self.participants.items()],
+            "weighted": self.weighted,
+            "winners": list(self.winners)
+        }
+
+    def _batch(self, event):
+        names, tickets = event["participants"], event.get("tickets")
+        first_seq = event.get("first_seq", 0)
+        return {
+            first_seq + i: (name, tickets[i] if tickets is not None else 1)
+            for i, name in enumerate(names)
+        }
+
+    def apply(self, event):
+        expected = 0 if self.version is None else self.version + 1
+        if event["version"] > expected and event["type"] not in (CREATED, MIGRATED):
+            self.missing_versions.extend(range(expected, event["version"]))
+
+        kind = event["type"]
+        if kind == SPIN:
+            for seq in event["seqs"]:
+                self.participants.pop(seq, None)
+            self.winners.extend(event["winners"])
+        elif kind == PARTICIPANTS_CHANGED and event.get("mode") == APPEND:
+            self.participants.update(self._batch(event))
+        elif kind == ENDED:
+            pass
+        else:
+            # created, reset, migrated and replacing participants-changed
+            self.participants = self._batch(event)
+            self.weighted = event.get("tickets") is not None
+            if kind in (CREATED, RESET):
+                self.winners = []
+            elif kind == MIGRATED:
+                self.winners = list(event.get("winners", []))
+        self.version = event["version"]
+
+    def as_dict(self):
+        entries = list(self.participants.values())
+        return {
+            "game_id": str(self.game_id),
+            "version": self.version,
+            "participants": [name for name, _ in entries],
+            "tickets": [tickets for _, tickets in entries] if self.weighted else None,
+            "winners": self.winners,
+            "missing_versions": self.missing_versions
+        }
+
+
+async def rebuild(repo, game_id, version=None):
+    """State of a game at `version` (default: its latest event) from the nearest snapshot plus the events after it"""
+    snapshot = await repo.find_snapshot(game_id, version)
+    state = GameState.from_snapshot(snapshot) if snapshot is not None else GameState(game_id)
+    async for event in repo.iter_events(game_id, after=state.version, until=version):
+        state.apply(event)
+    return state
@@ -0,0 +1,133 @@
+from collections import OrderedDict
+import os
+import time
+
+# Games kept in memory at once; the least recently used ones are dropped
+MAX_CACHED_GAMES = 1_024
+
+
+class CachedGame:
+    """A Game model together with the document version it was built from"""
+
+    __slots__ = ("game", "version", "loaded_at")
+
+    def __init__(self, game, version, loaded_at):
+        self.game = game
+        self.version = version
+        self.loaded_at = loaded_at
+
+
+class GameCache:
+    """In-process cache of games keyed by id, tracking which one is active.
+
+    Mutating routes write the new state through with `put`/`apply_draw`, so a
+    single worker never needs to go back to MongoDB for reads. With several
+    workers each one only sees its own writes, so `ttl_seconds` bounds how long
+    another worker's change can stay invisible.
+    """
+
+    def __init__(self, ttl_seconds=None, clock=time.monotonic, max_games=MAX_CACHED_GAMES):
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self.max_games = max_games
+        self.hits = 0
+        self.misses = 0
+        self._games = OrderedDict()
+        self._active_id = None
+
+    def _fresh(self, entry):
+        if self.ttl_seconds is None:
+            return True
+        return self.clock() - entry.loaded_at < self.ttl_seconds
+
+    def get_active(self):
+        """Return the cached active Game, or None on a miss"""
+        return self.get(self._active_id)
+
+    def get(self, game_id):
+        """Return a cached Game by id, or None on a miss"""
+        entry = self._games.get(game_id)
+        if entry is not None and self._fresh(entry):
+            self.hits += 1
+            self._games.move_to_end(game_id)
+            return entry.game
+        self.misses += 1
+        return None
+
+    def put(self, game, version, active=None):
+        """Store `game` unless a newer version of it is already cached.
+
+        `active` defaults to the game's own is_active flag.
+        """
+        active = game.is_active if active is None else active
+        current = self._games.get(game.id)
+        if current is not None and current.version > version and self._fresh(current):
+            return current.game
+        if active and self._active_id not in (None, game.id):
+            self._games.pop(self._active_id, None)
+        self._games[game.id] = CachedGame(game, version, self.clock())
+        self._games.move_to_end(game.id)
+        if active:
+            self._active_id = game.id
+        while len(self._games) > self.max_games:
+            evicted, _ = self._games.popitem(last=False)
+            if evicted == self._active_id:
+                self._active_id = None
+        return game
+
+    def apply_draw(self, game_id, winners, positions, version):
+        """Apply a committed draw to the cached game without re-reading it"""
+        current = self._games.get(game_id)
+        if current is None or current.version != version - 1:
+            # We missed an intermediate write, let the next read reload it
+            self.invalidate(game_id)
+            return
+        removed = set(positions)
+        game = current.game
+        keep = lambda values: [value for i, value in enumerate(values) if i not in removed]
+        game = game.model_copy(update={
+            "participants": keep(game.participants),
+            "tickets": keep(game.tickets) if game.tickets is not None else None,
+            "winners": game.winners + winners,
+            "updated_at": winners[-1].timestamp,
+            "version": version
+        })
+        self._games[game_id] = CachedGame(game, version, self.clock())
+        self._games.move_to_end(game_id)
+        return game
+
+    def version_of(self, game_id):
+        """Return the cached version of a game, or None if it is not cached"""
+        entry = self._games.get(game_id)
+        return entry.version if entry is not None else None
+
+    def invalidate(self, game_id=None):
+        """Drop one game, or everything when no id is given"""
+        if game_id is None:
+            self._games.clear()
+            self._active_id = None
+            return
+        self._games.pop(game_id, None)
+        if self._active_id == game_id:
+            self._active_id = None
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": len(self._games),
+            "ttl_seconds": self.ttl_seconds
+        }
+
+
+def _ttl_from_env():
+    ttl = os.environ.get('GAME_CACHE_TTL_SECONDS')
+    return float(ttl) if ttl else None
+
+
+game_cache = GameCache(
+    ttl_seconds=_ttl_from_env(),
+    max_games=int(os.environ.get('GAME_CACHE_MAX_GAMES', MAX_CACHED_GAMES))
+)
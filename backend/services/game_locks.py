@@ -0,0 +1,34 @@
+from contextlib import asynccontextmanager
+import asyncio
+
+
+class GameLocks:
+    """asyncio locks keyed by game id.
+
+    Serializes writers of one game inside this worker while different games
+    proceed in parallel. A lock only exists while someone holds or waits on
+    it, so thousands of games don't leave thousands of locks behind.
+    """
+
+    def __init__(self):
+        self._locks = {}
+
+    @asynccontextmanager
+    async def hold(self, game_id):
+        entry = self._locks.get(game_id)
+        if entry is None:
+            entry = self._locks[game_id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[game_id]
+
+    def __len__(self):
+        return len(self._locks)
+
+
+game_locks = GameLocks()
@@ -0,0 +1,68 @@
+from fastapi import HTTPException
+from fastapi.responses import Response
+import hashlib
+import logging
+
+from storage.idempotency import DONE
+
+logger = logging.getLogger(__name__)
+
+MAX_KEY_LENGTH = 255
+# Response headers stored with the body and sent again on replay
+REPLAYED_HEADERS = ("content-type", "etag")
+
+
+async def request_fingerprint(request):
+    """Hash of what a request asks for, so a key can't be reused for another request"""
+    digest = hashlib.sha256()
+    for part in (request.method, request.url.path, request.url.query, request.headers.get("if-match", "")):
+        digest.update(part.encode())
+        digest.update(b"\0")
+    digest.update(await request.body())
+    return digest.hexdigest()
+
+
+def replay(record):
+    headers = dict(record.get("headers") or {})
+    headers["Idempotent-Replayed"] = "true"
+    return Response(content=record["body"], status_code=record["status"], headers=headers)
+
+
+async def idempotent(request, keys, run):
+    """Run a write at most once per Idempotency-Key.
+
+    Without the header `run()` is simply awaited. With it, the first request
+    claims the key in `keys` and its response is stored once `run()`
+    succeeds; retries with the same key get that response replayed without
+    running again. A retry while the first request is still running gets a
+    409, and a key reused for a different request a 422. Failed requests
+    release their key so the client can retry them.
+    """
+    key = request.headers.get("idempotency-key")
+    if key is None:
+        return await run()
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Idempotency-Key must have 1 to {MAX_KEY_LENGTH} characters")
+
+    fingerprint = await request_fingerprint(request)
+    record = await keys.claim(key, fingerprint)
+    if record is not None:
+        if record["fingerprint"] != fingerprint:
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+        if record["state"] != DONE:
+            raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+        return replay(record)
+
+    try:
+        response = await run()
+    except BaseException:
+        await keys.release(key)
+        raise
+
+    headers = {name: value for name, value in response.headers.items() if name in REPLAYED_HEADERS}
+    try:
+        await keys.save(key, response.status_code, bytes(response.body), headers)
+    except Exception:
+        # The write itself succeeded; a retry will wait for the key to be abandoned
+        logger.exception(f"Could not store the response for Idempotency-Key {key}")
+    return response
@@ -0,0 +1,370 @@
+from bisect import bisect_left
+from pymongo import monitoring
+import threading
+import time
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Histogram upper bounds; +Inf is always added
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SIZE_BUCKETS = (128, 1_024, 8_192, 65_536, 524_288, 4_194_304, 33_554_432)
+POOL_SIZE_BUCKETS = (2, 10, 100, 1_000, 10_000, 100_000, 1_000_000)
+BATCH_SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 1_000)
+
+# Route label of requests that matched no route, so random paths can't
+# create unbounded label values
+UNMATCHED_ROUTE = "unmatched"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Value:
+    """One labelled series of a counter or gauge"""
+
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+
+class Buckets:
+    """One labelled series of a histogram"""
+
+    __slots__ = ("bounds", "counts", "sum", "count", "_lock")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+
+class Metric:
+    """A named metric with one series per combination of label values.
+
+    Series are created on first use and kept for the life of the process,
+    so labels must come from small fixed sets (methods, route templates,
+    status codes, command names). Updates take a per-series lock because
+    MongoDB command events arrive on driver threads.
+    """
+
+    kind = None
+
+    def __init__(self, name, documentation, labels=(), function=None):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        # Unlabelled metrics can read their value at scrape time instead
+        self.function = function
+        self._series = {}
+        self._lock = threading.Lock()
+        if not self.label_names and function is None:
+            # Expose unlabelled metrics as zero before their first update
+            self.labels()
+
+    def _new_series(self):
+        return Value()
+
+    def labels(self, *values):
+        series = self._series.get(values)
+        if series is None:
+            with self._lock:
+                series = self._series.setdefault(values, self._new_series())
+        return series
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        if self.function is not None:
+            lines.append(f"{self.name} {_number(self.function())}")
+            return lines
+        for values, series in list(self._series.items()):
+            lines.append(f"{self.name}{_labels(self.label_names, values)} {_number(series.value)}")
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def dec(self, amount=1):
+        self.labels().dec(amount)
+
+    def set(self, value):
+        self.labels().set(value)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labels)
+
+    def _new_series(self):
+        return Buckets(self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, series in list(self._series.items()):
+            with series._lock:
+                counts, total, count = list(series.counts), series.sum, series.count
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                lines.append(
+                    f"{self.name}_bucket{_labels(self.label_names, values, ('le', _number(bound)))} {cumulative}"
+                )
+            labels = _labels(self.label_names, values)
+            lines.append(f"{self.name}_sum{labels} {_number(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    """The metrics exposed on /metrics, in Prometheus text format"""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labels=(), function=None):
+        return self.register(Counter(name, documentation, labels, function))
+
+    def gauge(self, name, documentation, labels=(), function=None):
+        return self.register(Gauge(name, documentation, labels, function))
+
+    def histogram(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def render(self):
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.counter(
+    "http_requests_total", "HTTP requests by method, route template and status", ("method", "route", "status")
+)
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "Time from receiving a request to sending the last response byte",
+    ("method", "route")
+)
+http_requests_in_progress = registry.gauge(
+    "http_requests_in_progress", "HTTP requests currently being served", ("method",)
+)
+http_response_size = registry.histogram(
+    "http_response_size_bytes", "Response body size", ("method", "route"), buckets=SIZE_BUCKETS
+)
+mongodb_command_duration = registry.histogram(
+    "mongodb_command_duration_seconds", "MongoDB command round trips as timed by the driver", ("command",)
+)
+mongodb_command_failures = registry.counter(
+    "mongodb_command_failures_total", "MongoDB commands that returned an error", ("command",)
+)
+spins = registry.counter("roulette_spins_total", "Winners drawn")
+draw_conflicts = registry.counter(
+    "roulette_draw_conflicts_total", "Draws redrawn because another writer changed the game first"
+)
+draw_pool_size = registry.histogram(
+    "roulette_draw_pool_size", "Participants left in the pool a draw picked from", buckets=POOL_SIZE_BUCKETS
+)
+admission_rejections = registry.counter(
+    "roulette_admission_rejections_total", "Writes turned away by rate limits (429) or the write cap (503)", ("reason",)
+)
+write_queue_wait = registry.histogram(
+    "roulette_write_queue_wait_seconds", "Time writes waited for a slot under the write concurrency cap"
+)
+rate_limit_per_second = registry.gauge(
+    "roulette_rate_limit_per_second", "Configured sustained write rate per token bucket, 0 when off", ("scope",)
+)
+rate_limit_burst = registry.gauge("roulette_rate_limit_burst", "Configured token bucket size", ("scope",))
+games_archived = registry.counter("roulette_games_archived_total", "Finished games moved to the compressed archive")
+archive_bytes = registry.counter(
+    "roulette_archive_bytes_total", "Size of archived games before and after compression", ("stage",)
+)
+games_restored = registry.counter("roulette_games_restored_total", "Archived games brought back on request")
+group_commit_flushes = registry.counter("roulette_group_commit_flushes_total", "Batches written by the group commit")
+group_commit_batch_size = registry.histogram(
+    "roulette_group_commit_batch_size", "Requests whose writes shared one group commit batch", buckets=BATCH_SIZE_BUCKETS
+)
+change_polls = registry.counter(
+    "roulette_change_polls_total", "Change polls by what they got: unchanged (304), delta or snapshot", ("served",)
+)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, size and status of every HTTP request.
+
+    Requests are labelled with the route template (`/api/roulette/games/{game_id}`)
+    that FastAPI stores in the scope once routing matched, never the raw path.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        in_progress = http_requests_in_progress.labels(method)
+        in_progress.inc()
+        started = time.perf_counter()
+        status = 500
+        size = 0
+
+        async def send_and_measure(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_measure)
+        finally:
+            elapsed = time.perf_counter() - started
+            in_progress.dec()
+            route = scope.get("route")
+            route = getattr(route, "path_format", UNMATCHED_ROUTE) if route is not None else UNMATCHED_ROUTE
+            http_requests.labels(method, route, status).inc()
+            http_request_duration.labels(method, route).observe(elapsed)
+            http_response_size.labels(method, route).observe(size)
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """Records the duration of every command sent by the client it is registered on"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        mongodb_command_duration.labels(event.command_name).observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        mongodb_command_duration.labels(event.command_name).observe(event.duration_micros / 1e6)
+        mongodb_command_failures.labels(event.command_name).inc()
+
+
+command_metrics = CommandMetrics()
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Tracks connections of the client it is registered on, summed over its servers"""
+
+    def __init__(self):
+        self.open = 0
+        self.checked_out = 0
+        self.waiting = 0
+        self.checkout_failures = 0
+        self._lock = threading.Lock()
+
+    def _add(self, **deltas):
+        with self._lock:
+            for name, delta in deltas.items():
+                setattr(self, name, getattr(self, name) + delta)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._add(open=1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._add(open=-1)
+
+    def connection_check_out_started(self, event):
+        self._add(waiting=1)
+
+    def connection_check_out_failed(self, event):
+        self._add(waiting=-1, checkout_failures=1)
+
+    def connection_checked_out(self, event):
+        self._add(waiting=-1, checked_out=1)
+
+    def connection_checked_in(self, event):
+        self._add(checked_out=-1)
+
+
+pool_metrics = PoolMetrics()
+
+registry.gauge("mongodb_pool_open_connections", "Open MongoDB connections", function=lambda: pool_metrics.open)
+registry.gauge(
+    "mongodb_pool_checked_out_connections", "MongoDB connections in use", function=lambda: pool_metrics.checked_out
+)
+registry.gauge(
+    "mongodb_pool_waiting_checkouts", "Operations waiting for a MongoDB connection", function=lambda: pool_metrics.waiting
+)
+registry.counter(
+    "mongodb_pool_checkout_failures_total", "Connection checkouts that failed or timed out",
+    function=lambda: pool_metrics.checkout_failures
+)
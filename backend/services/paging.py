@@ -0,0 +1,44 @@
+from fastapi import HTTPException
+import base64
+
+# Largest page a list endpoint returns at once
+MAX_PAGE_SIZE = 1_000
+
+
+def encode_cursor(value):
+    """Opaque cursor for the sort key of the last item on a page"""
+    return base64.urlsafe_b64encode(str(value).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Sort key a cursor points after, or None for the first page"""
+    if cursor is None:
+        return None
+    try:
+        return int(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def check_limit(limit):
+    if limit is not None and not 1 <= limit <= MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    return limit
+
+
+def parse_fields(fields, model):
+    """Set of requested model fields from a comma-separated `fields=` value"""
+    if fields is None:
+        return None
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = requested - set(model.model_fields)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return requested
+
+
+def project(model, fields):
+    """Copy of `model` with only `fields` set, for exclude_unset responses"""
+    if fields is None:
+        return model
+    return type(model).model_construct(_fields_set=fields, **{field: getattr(model, field) for field in fields})
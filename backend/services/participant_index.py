@@ -0,0 +1,250 @@
+from bisect import bisect_left
+from collections import OrderedDict, defaultdict
+import os
+import unicodedata
+
+from services.event_log import APPEND, PARTICIPANTS_CHANGED, SPIN
+from services.game_locks import GameLocks
+from services.participant_io import normalize_name
+
+# Games whose search indexes are kept in memory at once
+MAX_INDEXED_GAMES = 64
+# Games with more participants are searched in the storage instead
+MAX_INDEXED_PARTICIPANTS = 200_000
+# Matches a search returns unless asked for another limit
+DEFAULT_SEARCH_LIMIT = 20
+# Shorter queries only match exactly; one typo in three letters matches too much
+MIN_TYPO_QUERY_LENGTH = 4
+# Shorter names are only reported as duplicates when they are equal
+MIN_SIMILAR_NAME_LENGTH = 4
+# Removals above this many rebuild the key list once instead of deleting one by one
+BULK_REMOVE = 16
+
+
+def search_key(name):
+    """Normalized name with case and accents folded, as searches compare it"""
+    decomposed = unicodedata.normalize("NFKD", normalize_name(name).casefold())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def search_keys(name):
+    """The folded name and its tail from each later word on, so any word can start a match"""
+    words = search_key(name).split(" ")
+    return [" ".join(words[i:]) for i in range(len(words)) if words[i]]
+
+
+class ParticipantIndex:
+    """Remaining participants of one game at one version, for prefix search.
+
+    `keys` is a sorted list of (search key, seq) with one entry for every
+    word a name can be found by, so "gar" finds "Ana García"; a prefix is
+    looked up with a bisect and the keys after it. Draws remove their keys
+    in place and appended batches are merged in, so the index follows a
+    game without being rebuilt.
+    """
+
+    __slots__ = ("version", "names", "keys", "alphabet", "_duplicates")
+
+    def __init__(self, version, entries=()):
+        self.version = version
+        self.names = {}
+        self.keys = []
+        # Letters of the names ever added; typo variants only use these
+        self.alphabet = set()
+        self._duplicates = None
+        self.add(entries)
+
+    def add(self, entries):
+        """Add (seq, name) pairs"""
+        added = []
+        for seq, name in entries:
+            self.names[seq] = name
+            added.extend((key, seq) for key in search_keys(name))
+        # Two sorted runs, which the sort merges in linear time
+        added.sort()
+        self.keys.extend(added)
+        self.keys.sort()
+        self.alphabet.update("".join(key for key, _ in added))
+        self._duplicates = None
+
+    def remove(self, seqs):
+        """Remove participants by seq"""
+        removed = [(seq, self.names.pop(seq)) for seq in seqs if seq in self.names]
+        self._duplicates = None
+        if len(removed) > BULK_REMOVE:
+            gone = {seq for seq, _ in removed}
+            self.keys = [entry for entry in self.keys if entry[1] not in gone]
+            return
+        for seq, name in removed:
+            for key in search_keys(name):
+                index = bisect_left(self.keys, (key, seq))
+                if index < len(self.keys) and self.keys[index] == (key, seq):
+                    del self.keys[index]
+
+    def apply(self, event):
+        """Bring the index to the version an event log entry produced"""
+        kind = event["type"]
+        if kind == SPIN:
+            self.remove(event["seqs"])
+        else:
+            first_seq = event.get("first_seq", 0)
+            entries = [(first_seq + i, name) for i, name in enumerate(event["participants"])]
+            if kind == PARTICIPANTS_CHANGED and event.get("mode") == APPEND:
+                self.add(entries)
+            else:
+                # created, reset, migrated and replacing participants-changed
+                self.names, self.keys, self.alphabet = {}, [], set()
+                self.add(entries)
+        self.version = event["version"]
+
+    def search(self, query, limit, typos=True):
+        """(seq, name, exact) of up to `limit` participants with a word starting with `query`.
+
+        Exact matches come first, in key order. With `typos`, when they are
+        fewer than `limit`, names matching the query with one letter
+        dropped, added, changed or two swapped follow.
+        """
+        prefix = search_key(query)
+        found = {}
+        self._collect(prefix, limit, found, True)
+        if typos and len(found) < limit and len(prefix) >= MIN_TYPO_QUERY_LENGTH:
+            for variant in self._variants(prefix):
+                self._collect(variant, limit, found, False)
+                if len(found) >= limit:
+                    break
+        return [(seq, self.names[seq], exact) for seq, exact in found.items()]
+
+    def _collect(self, prefix, limit, found, exact):
+        keys = self.keys
+        i = bisect_left(keys, (prefix,))
+        while i < len(keys) and len(found) < limit:
+            key, seq = keys[i]
+            if not key.startswith(prefix):
+                return
+            found.setdefault(seq, exact)
+            i += 1
+
+    def _variants(self, word):
+        alphabet = sorted(self.alphabet)
+        splits = [(word[:i], word[i:]) for i in range(len(word) + 1)]
+        variants = {left + right[1:] for left, right in splits if right}
+        variants.update(left + right[1] + right[0] + right[2:] for left, right in splits if len(right) > 1)
+        variants.update(left + char + right[1:] for left, right in splits if right for char in alphabet)
+        # Inserting after the end only narrows the exact prefix
+        variants.update(left + char + right for left, right in splits[:-1] for char in alphabet)
+        variants.discard(word)
+        return sorted(variants)
+
+    def duplicates(self):
+        """Groups of participants whose names look alike, as (exact, [(seq, name)]).
+
+        A group is exact when its names are equal once normalized and
+        folded; otherwise each name is at most one letter apart from
+        another in the group (one dropped, added, changed or swapped),
+        found through the shared one-letter deletions of their keys.
+        """
+        if self._duplicates is None:
+            self._duplicates = self._find_duplicates()
+        return self._duplicates
+
+    def _find_duplicates(self):
+        by_key = defaultdict(list)
+        for seq in sorted(self.names):
+            by_key[search_key(self.names[seq])].append(seq)
+
+        parent = {key: key for key in by_key}
+        def root(key):
+            while parent[key] != key:
+                parent[key] = parent[parent[key]]
+                key = parent[key]
+            return key
+
+        buckets = {}
+        for key in by_key:
+            if len(key) < MIN_SIMILAR_NAME_LENGTH:
+                continue
+            for deleted in {key} | {key[:i] + key[i + 1:] for i in range(len(key))}:
+                other = buckets.setdefault(deleted, key)
+                if other != key:
+                    parent[root(key)] = root(other)
+
+        components = defaultdict(list)
+        for key in by_key:
+            components[root(key)].append(key)
+        groups = []
+        for keys in components.values():
+            seqs = sorted(seq for key in keys for seq in by_key[key])
+            if len(seqs) > 1:
+                groups.append((len(keys) == 1, [(seq, self.names[seq]) for seq in seqs]))
+        groups.sort(key=lambda group: group[1][0][0])
+        return groups
+
+    def __len__(self):
+        return len(self.names)
+
+
+async def build_index(repo, game):
+    """Index of a game's participants as of its document"""
+    entries = [(entry["seq"], entry["name"]) async for entry in repo.iter_participants(game)]
+    return ParticipantIndex(game.get("version", 0), entries)
+
+
+class ParticipantIndexes:
+    """Search indexes of recently searched games.
+
+    Draws in this worker are applied as they commit; any other write, here
+    or in another worker, is caught up from the game's event log when the
+    index is next used, and an index that can't be caught up is rebuilt.
+    """
+
+    def __init__(self, max_games=MAX_INDEXED_GAMES, max_participants=MAX_INDEXED_PARTICIPANTS):
+        self.max_games = max_games
+        self.max_participants = max_participants
+        self._indexes = OrderedDict()
+        self._locks = GameLocks()
+
+    async def get(self, repo, game):
+        """The index of a game at its document's version, or None when it is too big to keep in memory"""
+        if game.get("participant_count", 0) > self.max_participants:
+            return None
+        game_id, version = str(game["_id"]), game.get("version", 0)
+        # One catch-up or build per game at a time
+        async with self._locks.hold(game_id):
+            index = self._indexes.get(game_id)
+            if index is not None and index.version < version:
+                await self._catch_up(repo, game_id, index, version)
+            if index is None or index.version != version:
+                index = await build_index(repo, game)
+            self._indexes[game_id] = index
+            self._indexes.move_to_end(game_id)
+            while len(self._indexes) > self.max_games:
+                self._indexes.popitem(last=False)
+        return index
+
+    async def _catch_up(self, repo, game_id, index, version):
+        async for event in repo.iter_events(game_id, after=index.version, until=version):
+            if event["version"] <= index.version:
+                # Applied by a draw while we were reading
+                continue
+            if event["version"] != index.version + 1:
+                return
+            index.apply(event)
+
+    def apply_draw(self, game_id, seqs, version):
+        """Remove the participants a committed draw took, if the index is at the version before it"""
+        index = self._indexes.get(game_id)
+        if index is not None and index.version == version - 1:
+            index.remove(seqs)
+            index.version = version
+
+    def discard(self, game_id):
+        self._indexes.pop(game_id, None)
+
+    def __len__(self):
+        return len(self._indexes)
+
+
+participant_indexes = ParticipantIndexes(
+    max_games=int(os.environ.get('PARTICIPANT_INDEX_MAX_GAMES', MAX_INDEXED_GAMES)),
+    max_participants=int(os.environ.get('PARTICIPANT_INDEX_MAX_PARTICIPANTS', MAX_INDEXED_PARTICIPANTS))
+)
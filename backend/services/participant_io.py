@@ -0,0 +1,185 @@
+from fastapi import HTTPException
+import codecs
+import csv
+import io
+import json
+import re
+import unicodedata
+
+from services.conditional import check_precondition
+
+# Names appended per committed participant batch while importing
+IMPORT_CHUNK_SIZE = 5_000
+# Export lines joined into one chunk of the streamed response
+EXPORT_CHUNK_LINES = 1_000
+MAX_NAME_LENGTH = 200
+
+FORMATS = ("csv", "ndjson")
+MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_name(name):
+    """Canonical display form of a participant name"""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", name)).strip()
+
+
+def dedupe_key(name):
+    """Key under which two normalized names count as the same participant"""
+    return name.casefold()
+
+
+def resolve_format(fmt, content_type):
+    """Pick the upload/download format from an explicit value or a content type"""
+    if fmt is None:
+        content_type = (content_type or "").split(";")[0].strip().lower()
+        fmt = "csv" if content_type in ("text/csv", "application/csv") else "ndjson"
+    if fmt not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format '{fmt}', use one of {', '.join(FORMATS)}")
+    return fmt
+
+
+async def iter_lines(chunks):
+    """Split an async stream of byte chunks into decoded lines"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        lines = pending.split("\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+def _parse_csv_line(line):
+    if '"' not in line:
+        return line.split(",", 1)[0]
+    row = next(csv.reader([line]), [])
+    return row[0] if row else ""
+
+
+def _parse_ndjson_line(line):
+    try:
+        value = json.loads(line)
+    except ValueError:
+        return None
+    if isinstance(value, dict):
+        value = value.get("name")
+    return value if isinstance(value, str) else None
+
+
+async def iter_names(chunks, fmt):
+    """Yield raw names from a CSV (first column) or NDJSON upload stream.
+
+    Unparseable rows are yielded as None so callers can count them.
+    """
+    parse = _parse_csv_line if fmt == "csv" else _parse_ndjson_line
+    first = True
+    async for line in iter_lines(chunks):
+        line = line.rstrip("\r")
+        if not line.strip():
+            continue
+        name = parse(line)
+        if first and fmt == "csv" and name is not None and name.strip().lower() == "name":
+            # Header row
+            first = False
+            continue
+        first = False
+        yield name
+
+
+async def iter_new_names(chunks, fmt, existing, stats):
+    """Normalize and deduplicate uploaded names against `existing` keys"""
+    async for raw in iter_names(chunks, fmt):
+        name = normalize_name(raw) if raw is not None else ""
+        if not name or len(name) > MAX_NAME_LENGTH:
+            stats["invalid"] += 1
+            continue
+        key = dedupe_key(name)
+        if key in existing:
+            stats["duplicates"] += 1
+            continue
+        existing.add(key)
+        yield name
+
+
+async def import_participants(repo, game, chunks, fmt, replace=False, expected=None, on_append=None):
+    """Stream names from an upload into a game in chunked appends.
+
+    With `expected` (game id, version) the first write is conditional on the
+    game still being at that version; later chunks build on that write.
+    `on_append(game, names)` is called after each chunk is written.
+    """
+    check_precondition(expected, game["_id"], game.get("version", 0))
+    expected_version = expected[1] if expected else None
+
+    if replace:
+        game = await repo.replace_participants(game, [], expected_version=expected_version)
+        expected_version = None
+        existing = set()
+    else:
+        existing = {dedupe_key(normalize_name(name)) async for name in repo.iter_participant_names(game)}
+
+    stats = {"imported": 0, "duplicates": 0, "invalid": 0}
+    batch = []
+
+    async def flush():
+        nonlocal game, expected_version
+        game = await repo.append_participants(game, batch, expected_version=expected_version)
+        expected_version = None
+        if on_append is not None:
+            on_append(game, batch)
+        stats["imported"] += len(batch)
+        batch.clear()
+
+    async for name in iter_new_names(chunks, fmt, existing, stats):
+        batch.append(name)
+        if len(batch) >= IMPORT_CHUNK_SIZE:
+            await flush()
+    if batch:
+        await flush()
+
+    stats["game_id"] = str(game["_id"])
+    stats["version"] = game.get("version", 0)
+    stats["total_participants"] = game.get("participant_count", 0)
+    return stats
+
+
+async def _export_rows(participants, winners):
+    async for name in participants:
+        yield {"type": "participant", "name": name}
+    async for winner in winners:
+        yield {
+            "type": "winner",
+            "name": winner["name"],
+            "position": winner["position"],
+            "timestamp": winner["timestamp"].isoformat(),
+            "total_participants": winner["total_participants"]
+        }
+
+
+async def iter_export(participants, winners, fmt):
+    """Yield participant names and winner documents as CSV or NDJSON text chunks"""
+    buffer = io.StringIO()
+    if fmt == "csv":
+        columns = ["type", "name", "position", "timestamp", "total_participants"]
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerow(columns)
+        write = lambda row: writer.writerow([row.get(column, "") for column in columns])
+    else:
+        write = lambda row: buffer.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+    count = 0
+    async for row in _export_rows(participants, winners):
+        write(row)
+        count += 1
+        if count % EXPORT_CHUNK_LINES == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
@@ -0,0 +1,116 @@
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from datetime import date, datetime
+import gzip
+import json
+
+try:
+    import orjson
+except ImportError:
+    # Without orjson the stdlib encoder is used
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    # Without brotli responses are only gzip-compressed
+    brotli = None
+
+# Smaller bodies are sent as they are; compressing them saves less than it costs
+MIN_COMPRESSED_BYTES = 1_024
+GZIP_LEVEL = 6
+# Brotli's default quality (11) is meant for static assets, too slow per request
+BROTLI_QUALITY = 5
+
+
+def _default(value):
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    if isinstance(value, (datetime, date)):
+        # Same ISO 8601 form as orjson and Pydantic produce
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content):
+    """Compact UTF-8 JSON for plain data, datetimes and Pydantic models"""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with orjson when it is installed"""
+
+    def render(self, content):
+        return dumps(content)
+
+
+def model_response(content, response=None, exclude_unset=False):
+    """Serialize already valid models straight to a response.
+
+    Returning a model from a route makes FastAPI validate it against the
+    response_model and encode it again; for models this service built from
+    its own storage that repeats work proportional to the participant list.
+    Headers and status set on the route's injected `response` are kept.
+    """
+    if isinstance(content, BaseModel):
+        content = content.model_dump(exclude_unset=exclude_unset)
+    fast = FastJSONResponse(content)
+    if response is not None:
+        fast.raw_headers.extend(
+            (name, value) for name, value in response.raw_headers if name != b"content-length"
+        )
+        if response.status_code:
+            fast.status_code = response.status_code
+    return fast
+
+
+def _accepted_encodings(header):
+    """Content codings an Accept-Encoding header allows, leaving out those with q=0"""
+    accepted = set()
+    for part in header.split(","):
+        coding, _, quality = part.partition(";")
+        quality = quality.strip()
+        if quality.startswith("q="):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+def choose_encoding(request):
+    """br or gzip, whichever the client accepts, preferring br when brotli is installed; None for neither"""
+    accepted = _accepted_encodings(request.headers.get("accept-encoding", ""))
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def compressed_response(request, content, response=None, exclude_unset=False):
+    """`model_response` compressed with brotli or gzip when the client accepts it.
+
+    Meant for routes returning whole games, whose participant lists
+    compress several times over. The ETag is weakened on compressed
+    bodies, as they differ byte for byte from the uncompressed one.
+    """
+    fast = model_response(content, response, exclude_unset)
+    fast.headers["Vary"] = "Accept-Encoding"
+    encoding = choose_encoding(request)
+    if encoding is None or len(fast.body) < MIN_COMPRESSED_BYTES:
+        return fast
+    if encoding == "br":
+        fast.body = brotli.compress(fast.body, quality=BROTLI_QUALITY)
+    else:
+        fast.body = gzip.compress(fast.body, GZIP_LEVEL, mtime=0)
+    fast.headers["Content-Encoding"] = encoding
+    fast.headers["Content-Length"] = str(len(fast.body))
+    etag = fast.headers.get("etag")
+    if etag is not None and not etag.startswith("W/"):
+        fast.headers["ETag"] = "W/" + etag
+    return fast
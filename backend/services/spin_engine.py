@@ -0,0 +1,129 @@
+from fastapi import HTTPException
+from datetime import datetime
+import asyncio
+import random
+
+from models.game import Winner
+from services.conditional import check_precondition, precondition_failed
+from services.draw_engine import DrawPool, audit_draw, draw_pools, make_rng
+from services.game_locks import game_locks
+from services.metrics import draw_conflicts, draw_pool_size, spins
+
+# How many times a spin is re-drawn when another writer changed the game
+# between our read and our conditional update
+MAX_SPIN_RETRIES = 8
+RETRY_BACKOFF_SECONDS = 0.005
+
+
+async def load_pool(repo, game_id=None):
+    """Return a game document (default: the active one) and a draw pool matching its version.
+
+    Only the small game document is read when this worker already holds the
+    pool for its version, so back-to-back spins don't re-read participants.
+    """
+    game = await (repo.find_game(game_id) if game_id is not None else repo.find_active())
+    if not game:
+        raise HTTPException(status_code=404, detail="No active game found" if game_id is None else "Game not found")
+
+    game_id = str(game["_id"])
+    pool = draw_pools.get(game_id, game.get("version"))
+    if pool is not None:
+        return game, pool
+
+    seqs, names, tickets = await repo.load_pool_entries(game)
+    pool = DrawPool(names, tickets if game.get("weighted") else None, game.get("winner_count", 0), ids=seqs)
+    draw_pools.put(game_id, game.get("version"), pool)
+    return game, pool
+
+
+class DrawResult:
+    """Outcome of a committed draw"""
+
+    __slots__ = ("game_id", "version", "winners", "positions", "seqs", "pool")
+
+    def __init__(self, game_id, version, winners, positions, seqs, pool):
+        self.game_id = game_id
+        self.version = version
+        self.winners = winners
+        # Positions of the winners in the participant list they were drawn from
+        self.positions = positions
+        # Sequence numbers of the participants the winners were
+        self.seqs = seqs
+        # The draw pool after the draw, i.e. the remaining participants
+        self.pool = pool
+
+
+async def draw(repo, count=1, rng=None, expected=None, game_id=None):
+    """Draw `count` distinct winners and record them atomically.
+
+    Winners are picked from this worker's draw pool for the version it read
+    and committed with one update of the game document guarded by that
+    version; the winner and participant documents are then written from the
+    committed record. A draw that loses the race to another writer is
+    redrawn, up to MAX_SPIN_RETRIES times, unless the caller `expected` a
+    specific (game id, version), in which case losing the race is a 412.
+
+    Draws of one game are serialized within this worker, so local spins
+    queue instead of racing; other workers are still caught by the version
+    guard. Draws of different games run in parallel.
+    """
+    if game_id is None:
+        # Draws addressed to the active game queue with those addressed to it by id
+        active = await repo.find_active()
+        if not active:
+            raise HTTPException(status_code=404, detail="No active game found")
+        game_id = str(active["_id"])
+    async with game_locks.hold(game_id):
+        return await _draw(repo, count, rng, expected, game_id)
+
+
+async def _draw(repo, count, rng, expected, game_id):
+    for attempt in range(MAX_SPIN_RETRIES):
+        game, pool = await load_pool(repo, game_id)
+        check_precondition(expected, game["_id"], game.get("version", 0))
+        # Every single spin needs two participants, so K spins need K + 1
+        if pool.remaining < count + 1:
+            raise HTTPException(status_code=400, detail=f"At least {count + 1} participants required")
+
+        draw_rng, seed = (rng, None) if rng is not None else make_rng()
+        indices = pool.sample(count, draw_rng)
+        positions = [pool.position_of(index) for index in indices]
+        size = pool.remaining
+
+        now = datetime.utcnow()
+        winners = [
+            Winner(
+                name=pool.names[index],
+                position=pool.winner_count + offset + 1,
+                timestamp=now,
+                total_participants=size - offset,
+                draw_seed=seed
+            )
+            for offset, index in enumerate(indices)
+        ]
+
+        seqs = [pool.ids[index] for index in indices]
+        updated = await repo.commit_draw(game, winners, seqs)
+        if updated is not None:
+            game_id = str(updated["_id"])
+            audit_draw(game_id, updated["version"], pool, indices, seed)
+            for index in indices:
+                pool.remove(index)
+            pool.winner_count += count
+            draw_pools.put(game_id, updated["version"], pool)
+            spins.inc(count)
+            draw_pool_size.observe(size)
+            return DrawResult(game_id, updated["version"], winners, positions, seqs, pool)
+
+        draw_conflicts.inc()
+        if expected is not None:
+            raise precondition_failed()
+        # Someone else changed the game first; back off briefly and redraw
+        await asyncio.sleep(random.uniform(0, RETRY_BACKOFF_SECONDS * (2 ** attempt)))
+
+    raise HTTPException(status_code=409, detail="Game is being modified concurrently, please retry")
+
+
+async def spin(repo, rng=None, expected=None, game_id=None):
+    """Draw a single winner"""
+    return await draw(repo, 1, rng, expected, game_id)
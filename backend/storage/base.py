@@ -0,0 +1,212 @@
+from abc import ABC, abstractmethod
+import asyncio
+import logging
+
+from models.game import Game, Winner
+from services.event_log import SNAPSHOT_EVERY, make_event, rebuild
+
+logger = logging.getLogger(__name__)
+
+# Snapshot tasks still running, referenced so they aren't garbage collected
+_snapshot_tasks = set()
+
+
+def to_winner(winner):
+    """Winner model from a stored winner dict"""
+    # Stored winners were validated when drawn; extra keys are ignored
+    return Winner.model_construct(**winner)
+
+
+def to_model(game, participants, tickets, winners):
+    """Build the API Game from a game document and its participants and winners.
+
+    The parts come from storage written by this service, so the model is
+    constructed without re-validating every participant and winner.
+    """
+    return Game.model_construct(
+        id=str(game["_id"]),
+        participants=participants,
+        tickets=tickets if game.get("weighted") else None,
+        winners=winners,
+        created_at=game["created_at"],
+        updated_at=game["updated_at"],
+        is_active=game.get("is_active", False),
+        version=game.get("version", 0)
+    )
+
+
+class GameRepository(ABC):
+    """Storage of games, their participants and their winners.
+
+    Methods exchange small game documents: dicts with at least `_id`,
+    `version`, `participant_count`, `winner_count`, `weighted`,
+    `created_at`, `updated_at` and `is_active`, plus `ended_at` once another
+    game replaced it as the active one. A document is a snapshot;
+    reads given one return the game's lists as of that document's version,
+    and writes given one are applied to the game it identifies. Conditional
+    writes fail with 412 (`expected_version`) or return None (`commit_draw`).
+    """
+
+    async def start(self):
+        """Prepare the storage (indexes, migrations, snapshots) before serving"""
+
+    async def close(self):
+        """Flush and release whatever `start` acquired"""
+
+    # Reads
+
+    @abstractmethod
+    async def find_active(self):
+        """Return the active game document, or None"""
+
+    @abstractmethod
+    async def find_game(self, game_id):
+        """Return a game document by id, or None"""
+
+    @abstractmethod
+    async def load_game(self, game, fields=None):
+        """Assemble the API Game for a game document, optionally only `fields`"""
+
+    @abstractmethod
+    async def load_pool_entries(self, game):
+        """Return seqs, names and tickets of the remaining participants, in order"""
+
+    @abstractmethod
+    def iter_participant_names(self, game):
+        """Async iterator over the remaining participant names, in order"""
+
+    @abstractmethod
+    def iter_participants(self, game, after=None, limit=None):
+        """Async iterator over `{seq, name}` of the remaining participants after seq `after`"""
+
+    @abstractmethod
+    def iter_winners(self, game, after=None, limit=None):
+        """Async iterator over winner dicts by position, after position `after`"""
+
+    @abstractmethod
+    async def last_winner(self, game):
+        """The most recent winner dict, or None"""
+
+    @abstractmethod
+    async def search_participants(self, game, prefix, limit):
+        """Up to `limit` `{seq, name}` of the remaining participants with a search key starting with `prefix`, in order.
+
+        `prefix` is folded with `search_key`; games too big for an in-memory
+        index are searched this way.
+        """
+
+    # Writes
+
+    @abstractmethod
+    async def create_game(self, names, tickets=None, only_if_missing=False, expected=None, activate=True):
+        """Create a game, by default replacing the active one; returns its document.
+
+        The replaced game gets `ended_at` and its next version, logged as an `ended` event.
+        """
+
+    @abstractmethod
+    async def replace_participants(self, game, names, tickets=None, extra_set=None, expected_version=None):
+        """Replace a game's participant list, keeping its winners; returns the new document"""
+
+    @abstractmethod
+    async def append_participants(self, game, names, expected_version=None):
+        """Append participants with one ticket each; returns the new document"""
+
+    @abstractmethod
+    async def reset_game(self, game, names, expected_version=None):
+        """Restart a game with `names` and no winners; returns the new document"""
+
+    @abstractmethod
+    async def commit_draw(self, game, winners, seqs):
+        """Record winners drawn at `game`'s version, removing participants `seqs`.
+
+        Returns the new document, or None if the game changed first.
+        """
+
+    # Event log
+
+    async def record_event(self, game_id, version, kind, **data):
+        """Log the write that produced `version`, snapshotting in the background now and then"""
+        await self.store_event(make_event(game_id, version, kind, **data))
+        self.snapshot_if_due(game_id, version)
+
+    def snapshot_if_due(self, game_id, version):
+        """Snapshot a game in the background when `version` is a multiple of SNAPSHOT_EVERY"""
+        if version and version % SNAPSHOT_EVERY == 0:
+            task = asyncio.create_task(self._snapshot(game_id, version))
+            _snapshot_tasks.add(task)
+            task.add_done_callback(_snapshot_tasks.discard)
+
+    async def _snapshot(self, game_id, version):
+        try:
+            state = await rebuild(self, game_id, version)
+            if state.version == version:
+                await self.store_snapshot(state.to_snapshot())
+        except Exception:
+            logger.exception(f"Could not snapshot game {game_id} at version {version}")
+
+    @abstractmethod
+    async def store_event(self, event):
+        """Save an event; saving one for the same game and version again replaces it"""
+
+    @abstractmethod
+    def iter_events(self, game_id, after=None, until=None, limit=None):
+        """Async iterator over a game's events by version, after `after` up to `until`"""
+
+    @abstractmethod
+    async def find_snapshot(self, game_id, version=None):
+        """The latest snapshot of a game at or before `version`, or None"""
+
+    @abstractmethod
+    async def store_snapshot(self, snapshot):
+        """Save a GameState snapshot"""
+
+    # Cold archive: finished games moved out of the live storage, compressed
+    # with `services.archive.pack` and indexed by `services.archive.describe`
+
+    @abstractmethod
+    async def find_archivable(self, before, limit):
+        """Up to `limit` documents of finished games last written before `before`"""
+
+    @abstractmethod
+    async def archive_game(self, game):
+        """Move a game into the archive; returns its index entry, or None if the game changed first"""
+
+    async def finish_archiving(self):
+        """Complete archive moves interrupted part way, e.g. by a crashed worker"""
+
+    @abstractmethod
+    async def restore_game(self, game_id):
+        """Move an archived game back into the live storage; returns its document, or None if it isn't archived"""
+
+    @abstractmethod
+    async def find_archived(self, game_id):
+        """Index entry of an archived game, or None"""
+
+    @abstractmethod
+    def iter_archived(self, since=None, until=None, limit=None):
+        """Async iterator over index entries of games created in [since, until), newest first"""
+
+    # Analytics, over finished games created between `since` and `until`; a game
+    # finishes when another replaces it as the active game and gets `ended_at`.
+    # Archived games count too, from the winners kept in their index entries.
+
+    @abstractmethod
+    async def wins_per_name(self, since=None, until=None, limit=100):
+        """`{name, wins}` for the names that won most often, most wins first"""
+
+    @abstractmethod
+    async def draws_per_day(self, since=None, until=None):
+        """`{day, draws}` per UTC day with draws, by day"""
+
+    @abstractmethod
+    async def pool_size_stats(self, since=None, until=None):
+        """`{games, draws, average_pool_size}`, the pool size being the participants left at each draw"""
+
+    @abstractmethod
+    async def fairness(self, since=None, until=None, bins=10, limit=100):
+        """Per game with winners, newest first: `{game_id, created_at, participants, winners, bins, chi_square}`.
+
+        The participant list is cut into `bins` about equal runs and the
+        winners in each run are compared with its share of the tickets.
+        """
@@ -0,0 +1,111 @@
+from pymongo.errors import BulkWriteError
+import asyncio
+import os
+
+from services.metrics import group_commit_batch_size, group_commit_flushes
+from storage.mongo import DUPLICATE_KEY_ERROR
+
+# How long the first write of a batch waits for others to join it
+GROUP_COMMIT_WINDOW_MS = 1.0
+# A batch holding this many operations is written without waiting any longer
+GROUP_COMMIT_MAX_OPS = 1_000
+
+
+def group_commit_enabled():
+    return os.environ.get('GROUP_COMMIT', '').lower() in ('1', 'true', 'yes')
+
+
+class GroupCommit:
+    """Coalesces the writes of concurrent requests into one bulk_write per collection.
+
+    A write joins the current batch, which is sent `window` seconds after
+    its first write or once it holds `max_ops` operations, as one ordered
+    bulk write per collection. Within a batch each collection's operations
+    keep the order they were submitted in; writes that depend on each
+    other (a draw's winners, then clearing its pending record; one draw,
+    then the next) are only submitted once the earlier ones are written,
+    so the writes of one game land in the order its requests made them.
+    `write` returns once its batch is acknowledged with the collection's
+    write concern, so a request is only answered after its writes are as
+    durable as they would be on their own.
+
+    Duplicate-key errors are ignored, as `ignore_duplicates` does for the
+    idempotent writes sent through here; any other error fails the writes
+    of the request it belongs to and the batch carries on with the rest.
+    """
+
+    def __init__(self, window=GROUP_COMMIT_WINDOW_MS / 1000, max_ops=GROUP_COMMIT_MAX_OPS):
+        self.window = window
+        self.max_ops = max_ops
+        # (writes, future) of the batch being filled
+        self._queued = []
+        self._queued_ops = 0
+        self._timer = None
+        self._flushes = set()
+
+    async def write(self, writes):
+        """Apply `(collection, operations)` pairs with the next batch; returns once the batch is written"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queued.append((writes, future))
+        self._queued_ops += sum(len(operations) for _, operations in writes)
+        if self._queued_ops >= self.max_ops:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._queued, self._queued_ops = self._queued, [], 0
+        if batch:
+            task = asyncio.create_task(self._write_batch(batch))
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+    async def _write_batch(self, batch):
+        by_collection = {}
+        for owner, (writes, _) in enumerate(batch):
+            for collection, operations in writes:
+                _, pending, owners = by_collection.setdefault(collection.full_name, (collection, [], []))
+                pending.extend(operations)
+                owners.extend([owner] * len(operations))
+        errors = [None] * len(batch)
+        await asyncio.gather(*[
+            self._bulk_write(collection, operations, owners, errors)
+            for collection, operations, owners in by_collection.values()
+        ])
+        group_commit_flushes.inc()
+        group_commit_batch_size.observe(len(batch))
+        for (_, future), error in zip(batch, errors):
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(None)
+
+    async def _bulk_write(self, collection, operations, owners, errors):
+        start = 0
+        while start < len(operations):
+            try:
+                await collection.bulk_write(operations[start:], ordered=True)
+                return
+            except BulkWriteError as error:
+                # An ordered bulk write stops at its first error; go on after it
+                failed = error.details["writeErrors"][0]
+                index = start + failed["index"]
+                if failed.get("code") != DUPLICATE_KEY_ERROR:
+                    errors[owners[index]] = error
+                start = index + 1
+            except Exception as error:
+                for owner in set(owners[start:]):
+                    errors[owner] = error
+                return
+
+    async def close(self):
+        """Write the batch being filled and wait for those in flight"""
+        self._flush()
+        await asyncio.gather(*self._flushes)
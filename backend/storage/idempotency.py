@@ -0,0 +1,106 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from pymongo.errors import DuplicateKeyError
+
+# How long a completed response can be replayed for its key
+IDEMPOTENCY_TTL_SECONDS = 24 * 60 * 60
+# A request still marked as running after this long is presumed lost with
+# its worker, and a retry may run it again
+IN_PROGRESS_TIMEOUT_SECONDS = 60
+# Keys remembered by the in-memory store before the oldest are dropped
+MAX_MEMORY_KEYS = 10_000
+
+# Record states
+STARTED = "started"
+DONE = "done"
+
+
+def is_stale(record, now, ttl_seconds):
+    """Whether a record no longer holds its key: expired, or abandoned mid-request"""
+    age = now - record["created_at"]
+    if age > timedelta(seconds=ttl_seconds):
+        return True
+    return record["state"] == STARTED and age > timedelta(seconds=IN_PROGRESS_TIMEOUT_SECONDS)
+
+
+class MongoIdempotencyStore:
+    """Idempotency records in a collection whose TTL index expires old keys.
+
+    A record is `{_id: key, fingerprint, state, created_at}`, and once the
+    request completed also `status`, `body` and `headers` of its response.
+    Inserting the record claims the key, so of several concurrent requests
+    with one key exactly one runs.
+    """
+
+    def __init__(self, db, ttl_seconds=IDEMPOTENCY_TTL_SECONDS):
+        self.keys = db.idempotency_keys
+        self.ttl_seconds = ttl_seconds
+
+    async def start(self):
+        await self.keys.create_index(
+            "created_at", name="idempotency_ttl", expireAfterSeconds=self.ttl_seconds
+        )
+
+    async def claim(self, key, fingerprint):
+        """Return None when the caller now owns `key`, else the existing record"""
+        now = datetime.utcnow()
+        claimed = {"_id": key, "fingerprint": fingerprint, "state": STARTED, "created_at": now}
+        try:
+            await self.keys.insert_one(claimed)
+            return None
+        except DuplicateKeyError:
+            pass
+
+        record = await self.keys.find_one({"_id": key})
+        if record is None:
+            # Expired and removed in between
+            return await self.claim(key, fingerprint)
+        if not is_stale(record, now, self.ttl_seconds):
+            return record
+        # Take the key over, unless another retry got there first
+        taken = await self.keys.find_one_and_replace({"_id": key, "created_at": record["created_at"]}, claimed)
+        return None if taken is not None else await self.claim(key, fingerprint)
+
+    async def save(self, key, status, body, headers):
+        await self.keys.update_one(
+            {"_id": key},
+            {"$set": {"state": DONE, "status": status, "body": body, "headers": headers, "created_at": datetime.utcnow()}}
+        )
+
+    async def release(self, key):
+        """Forget a claimed key whose request failed, so a retry runs it again"""
+        await self.keys.delete_one({"_id": key, "state": STARTED})
+
+
+class MemoryIdempotencyStore:
+    """Idempotency records in a bounded LRU, for the in-memory storage backend"""
+
+    def __init__(self, ttl_seconds=IDEMPOTENCY_TTL_SECONDS, max_keys=MAX_MEMORY_KEYS):
+        self.ttl_seconds = ttl_seconds
+        self.max_keys = max_keys
+        self._records = OrderedDict()
+
+    async def start(self):
+        pass
+
+    async def claim(self, key, fingerprint):
+        now = datetime.utcnow()
+        record = self._records.get(key)
+        if record is not None and not is_stale(record, now, self.ttl_seconds):
+            self._records.move_to_end(key)
+            return record
+        self._records[key] = {"_id": key, "fingerprint": fingerprint, "state": STARTED, "created_at": now}
+        self._records.move_to_end(key)
+        while len(self._records) > self.max_keys:
+            self._records.popitem(last=False)
+        return None
+
+    async def save(self, key, status, body, headers):
+        record = self._records.get(key)
+        if record is not None:
+            record.update(state=DONE, status=status, body=body, headers=headers, created_at=datetime.utcnow())
+
+    async def release(self, key):
+        record = self._records.get(key)
+        if record is not None and record["state"] == STARTED:
+            del self._records[key]
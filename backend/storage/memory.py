@@ -0,0 +1,535 @@
+from fastapi import HTTPException
+from bson import ObjectId
+from bisect import bisect_left
+from datetime import datetime
+import asyncio
+import base64
+import json
+import logging
+import os
+
+from services import analytics, archive
+from services.conditional import precondition_failed
+from services.event_log import APPEND, CREATED, ENDED, PARTICIPANTS_CHANGED, REPLACE, RESET, SPIN
+from services.paging import project
+from services.participant_index import search_keys
+from storage.base import GameRepository, to_model, to_winner
+
+logger = logging.getLogger(__name__)
+
+# Seconds between background snapshots when a snapshot file is configured
+SNAPSHOT_INTERVAL_SECONDS = 5.0
+
+
+class Entry:
+    """One participant; `won_version` is the version whose draw removed it"""
+
+    __slots__ = ("seq", "name", "tickets", "won_version")
+
+    def __init__(self, seq, name, tickets=1):
+        self.seq = seq
+        self.name = name
+        self.tickets = tickets
+        self.won_version = None
+
+
+class MemoryGame:
+    """Mutable state of one game.
+
+    Participant batches and the winners list are never rewritten: a replace
+    installs a new tuple of batches and a reset a new winners list, while
+    draws only mark entries and append winners. Game documents hold on to
+    the batches and winners of their version, so a document read before a
+    write still describes the game as it was.
+    """
+
+    __slots__ = ("doc", "batches", "winners", "remaining", "next_seq")
+
+    def __init__(self, doc):
+        self.doc = doc
+        self.batches = ()
+        self.winners = []
+        # Entries not drawn yet, by seq
+        self.remaining = {}
+        self.next_seq = 0
+
+    def new_batch(self, names, tickets=None):
+        batch = [
+            Entry(self.next_seq + i, name, tickets[i] if tickets is not None else 1)
+            for i, name in enumerate(names)
+        ]
+        self.next_seq += len(names)
+        return batch
+
+    def header(self):
+        return dict(self.doc, _batches=self.batches, _winners=self.winners)
+
+
+def visible_entries(game):
+    """Participants of a game document as of its version"""
+    version = game.get("version", 0)
+    for batch in game["_batches"]:
+        for entry in batch:
+            if entry.won_version is None or entry.won_version > version:
+                yield entry
+
+
+class MemoryGameRepository(GameRepository):
+    """Games held in process memory, optionally snapshotted to a JSON file.
+
+    Every write runs under one asyncio lock and completes without awaiting
+    in between, so it is atomic for all other coroutines; reads need no
+    lock. With `snapshot_path` the games are loaded on start, written every
+    `snapshot_interval` seconds when something changed, and on close.
+    """
+
+    def __init__(self, snapshot_path=None, snapshot_interval=SNAPSHOT_INTERVAL_SECONDS):
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval = snapshot_interval
+        self._games = {}
+        self._active_id = None
+        # Event logs and their snapshots by game id, ordered by version
+        self._events = {}
+        self._event_snapshots = {}
+        # Archived games by id: (index entry, packed game)
+        self._archive = {}
+        self._lock = asyncio.Lock()
+        self._dirty = False
+        self._snapshot_task = None
+
+    async def start(self):
+        if not self.snapshot_path:
+            return
+        if os.path.exists(self.snapshot_path):
+            self._restore(await asyncio.to_thread(self._read_snapshot))
+            logger.info(f"Loaded {len(self._games)} games from {self.snapshot_path}")
+        if self.snapshot_interval:
+            self._snapshot_task = asyncio.create_task(self._snapshot_loop())
+
+    async def close(self):
+        if self._snapshot_task is not None:
+            self._snapshot_task.cancel()
+            try:
+                await self._snapshot_task
+            except asyncio.CancelledError:
+                pass
+            self._snapshot_task = None
+        await self.snapshot()
+
+    def _state(self, game):
+        state = self._games.get(str(game["_id"]))
+        if state is None:
+            raise HTTPException(status_code=404, detail="Game not found")
+        return state
+
+    # Reads
+
+    async def find_active(self):
+        state = self._games.get(self._active_id)
+        return state.header() if state is not None else None
+
+    async def find_game(self, game_id):
+        state = self._games.get(str(game_id))
+        return state.header() if state is not None else None
+
+    async def load_game(self, game, fields=None):
+        entries = list(visible_entries(game))
+        winners = [to_winner(winner) for winner in game["_winners"][:game.get("winner_count", 0)]]
+        model = to_model(
+            game,
+            [entry.name for entry in entries],
+            [entry.tickets for entry in entries],
+            winners
+        )
+        return project(model, fields)
+
+    async def load_pool_entries(self, game):
+        entries = list(visible_entries(game))
+        return (
+            [entry.seq for entry in entries],
+            [entry.name for entry in entries],
+            [entry.tickets for entry in entries]
+        )
+
+    async def iter_participant_names(self, game):
+        for entry in visible_entries(game):
+            yield entry.name
+
+    async def iter_participants(self, game, after=None, limit=None):
+        returned = 0
+        for entry in visible_entries(game):
+            if limit is not None and returned >= limit:
+                return
+            if after is None or entry.seq > after:
+                returned += 1
+                yield {"seq": entry.seq, "name": entry.name}
+
+    async def iter_winners(self, game, after=None, limit=None):
+        start = after or 0
+        end = game.get("winner_count", 0)
+        if limit is not None:
+            end = min(end, start + limit)
+        for winner in game["_winners"][start:end]:
+            yield dict(winner)
+
+    async def last_winner(self, game):
+        count = game.get("winner_count", 0)
+        return dict(game["_winners"][count - 1]) if count else None
+
+    async def search_participants(self, game, prefix, limit):
+        matches = []
+        for entry in visible_entries(game):
+            if len(matches) >= limit:
+                break
+            if any(key.startswith(prefix) for key in search_keys(entry.name)):
+                matches.append({"seq": entry.seq, "name": entry.name})
+        return matches
+
+    # Writes
+
+    async def create_game(self, names, tickets=None, only_if_missing=False, expected=None, activate=True):
+        async with self._lock:
+            current = self._games.get(self._active_id)
+            if activate and only_if_missing and current is not None:
+                return current.header()
+            if expected is not None and (
+                current is None
+                or current.doc["_id"] != expected["_id"]
+                or current.doc["version"] != expected.get("version", 0)
+            ):
+                raise precondition_failed()
+
+            now = datetime.utcnow()
+            state = MemoryGame({
+                "_id": ObjectId(),
+                "list_epoch": 0,
+                "participant_count": len(names),
+                "winner_count": 0,
+                "weighted": tickets is not None,
+                "created_at": now,
+                "updated_at": now,
+                "is_active": activate,
+                "version": 0
+            })
+            batch = state.new_batch(names, tickets)
+            state.batches = (batch,)
+            state.remaining = {entry.seq: entry for entry in batch}
+            game_id = str(state.doc["_id"])
+            self._games[game_id] = state
+            if activate:
+                if current is not None:
+                    current.doc["is_active"] = False
+                    current.doc["ended_at"] = now
+                    current.doc["version"] += 1
+                    await self.record_event(current.doc["_id"], current.doc["version"], ENDED)
+                self._active_id = game_id
+            self._dirty = True
+            await self.record_event(
+                state.doc["_id"], 0, CREATED,
+                participants=list(names), tickets=list(tickets) if tickets is not None else None,
+                first_seq=0, is_active=activate
+            )
+            return state.header()
+
+    def _replace(self, state, names, tickets, extra_set, expected_version):
+        if expected_version is not None and state.doc["version"] != expected_version:
+            raise precondition_failed()
+        first_seq = state.next_seq
+        batch = state.new_batch(names, tickets)
+        state.batches = (batch,)
+        state.remaining = {entry.seq: entry for entry in batch}
+        state.doc.update(
+            participant_count=len(names),
+            weighted=tickets is not None,
+            updated_at=datetime.utcnow(),
+            **(extra_set or {})
+        )
+        state.doc["version"] += 1
+        state.doc["list_epoch"] += 1
+        self._dirty = True
+        return first_seq
+
+    async def replace_participants(self, game, names, tickets=None, extra_set=None, expected_version=None):
+        async with self._lock:
+            state = self._state(game)
+            first_seq = self._replace(state, names, tickets, extra_set, expected_version)
+            await self.record_event(
+                state.doc["_id"], state.doc["version"], PARTICIPANTS_CHANGED, mode=REPLACE,
+                participants=list(names), tickets=list(tickets) if tickets is not None else None, first_seq=first_seq
+            )
+            return state.header()
+
+    async def append_participants(self, game, names, expected_version=None):
+        async with self._lock:
+            state = self._state(game)
+            if expected_version is not None and state.doc["version"] != expected_version:
+                raise precondition_failed()
+            if state.doc["list_epoch"] != game.get("list_epoch", 0):
+                raise HTTPException(status_code=409, detail="Participants were replaced concurrently, please retry")
+            first_seq = state.next_seq
+            batch = state.new_batch(names)
+            state.batches = state.batches + (batch,)
+            state.remaining.update((entry.seq, entry) for entry in batch)
+            state.doc["participant_count"] += len(names)
+            state.doc["updated_at"] = datetime.utcnow()
+            state.doc["version"] += 1
+            self._dirty = True
+            await self.record_event(
+                state.doc["_id"], state.doc["version"], PARTICIPANTS_CHANGED, mode=APPEND,
+                participants=list(names), first_seq=first_seq
+            )
+            return state.header()
+
+    async def reset_game(self, game, names, expected_version=None):
+        async with self._lock:
+            state = self._state(game)
+            first_seq = self._replace(state, names, None, {"winner_count": 0}, expected_version)
+            state.winners = []
+            await self.record_event(
+                state.doc["_id"], state.doc["version"], RESET, participants=list(names), first_seq=first_seq
+            )
+            return state.header()
+
+    async def commit_draw(self, game, winners, seqs):
+        async with self._lock:
+            state = self._games.get(str(game["_id"]))
+            if state is None or state.doc["version"] != game.get("version", 0):
+                return None
+            version = state.doc["version"] + 1
+            for seq in seqs:
+                state.remaining.pop(seq).won_version = version
+            state.winners.extend(winner.model_dump() for winner in winners)
+            state.doc["version"] = version
+            state.doc["winner_count"] += len(winners)
+            state.doc["participant_count"] -= len(winners)
+            state.doc["updated_at"] = winners[-1].timestamp
+            self._dirty = True
+            await self.record_event(
+                state.doc["_id"], version, SPIN,
+                winners=[dict(winner.model_dump(), participant_seq=seq) for winner, seq in zip(winners, seqs)],
+                seqs=list(seqs)
+            )
+            return state.header()
+
+    # Cold archive
+
+    async def find_archivable(self, before, limit):
+        return [
+            state.header() for state in self._games.values()
+            if "ended_at" in state.doc and state.doc["updated_at"] < before
+        ][:limit]
+
+    async def archive_game(self, game):
+        async with self._lock:
+            game_id = str(game["_id"])
+            state = self._games.get(game_id)
+            if state is None or "ended_at" not in state.doc or state.doc["version"] != game.get("version", 0):
+                return None
+            participants = [
+                {"seq": entry.seq, "name": entry.name, "tickets": entry.tickets, "won_version": entry.won_version}
+                for batch in state.batches for entry in batch
+            ]
+            codec, data, raw_bytes = archive.pack(
+                dict(state.doc, next_seq=state.next_seq), participants,
+                state.winners[:state.doc["winner_count"]], self._events.get(game_id, [])
+            )
+            entry = archive.describe(state.doc, codec, data, raw_bytes, state.winners[:state.doc["winner_count"]])
+            self._archive[game_id] = (entry, data)
+            del self._games[game_id]
+            self._events.pop(game_id, None)
+            self._event_snapshots.pop(game_id, None)
+            self._dirty = True
+            return entry
+
+    async def restore_game(self, game_id):
+        async with self._lock:
+            archived = self._archive.get(str(game_id))
+            if archived is None:
+                return None
+            entry, data = archived
+            doc, participants, winners, events = archive.unpack(entry["codec"], data)
+            state = MemoryGame({"list_epoch": 0, **{field: value for field, value in doc.items() if field != "next_seq"}})
+            # Written now, so it isn't archived again right away
+            state.doc["updated_at"] = datetime.utcnow()
+            batch = []
+            for participant in participants:
+                restored = Entry(participant["seq"], participant["name"], participant["tickets"])
+                restored.won_version = participant["won_version"]
+                batch.append(restored)
+            state.batches = (batch,)
+            state.remaining = {restored.seq: restored for restored in batch if restored.won_version is None}
+            state.next_seq = doc.get("next_seq", len(batch))
+            state.winners = winners
+            self._games[str(game_id)] = state
+            if events:
+                self._events[str(game_id)] = events
+            del self._archive[str(game_id)]
+            self._dirty = True
+            return state.header()
+
+    async def find_archived(self, game_id):
+        archived = self._archive.get(str(game_id))
+        return dict(archived[0]) if archived is not None else None
+
+    def _archived(self, since=None, until=None):
+        return [
+            (entry, data) for entry, data in self._archive.values()
+            if (since is None or entry["created_at"] >= since) and (until is None or entry["created_at"] < until)
+        ]
+
+    async def iter_archived(self, since=None, until=None, limit=None):
+        entries = sorted((entry for entry, _ in self._archived(since, until)), key=lambda entry: entry["created_at"], reverse=True)
+        for entry in entries[:limit]:
+            yield dict(entry)
+
+    # Analytics, over finished games: ones that were replaced as the active
+    # game, live or archived
+
+    def _finished(self, since=None, until=None):
+        return [
+            state for state in self._games.values()
+            if "ended_at" in state.doc
+            and (since is None or state.doc["created_at"] >= since)
+            and (until is None or state.doc["created_at"] < until)
+        ]
+
+    def _finished_winners(self, since=None, until=None):
+        live = [winner for state in self._finished(since, until) for winner in state.winners[:state.doc["winner_count"]]]
+        return live + [winner for entry, _ in self._archived(since, until) for winner in entry.get("winners", ())]
+
+    async def wins_per_name(self, since=None, until=None, limit=100):
+        return analytics.wins_per_name(self._finished_winners(since, until), limit)
+
+    async def draws_per_day(self, since=None, until=None):
+        return analytics.draws_per_day(self._finished_winners(since, until))
+
+    async def pool_size_stats(self, since=None, until=None):
+        games = len(self._finished(since, until)) + len(self._archived(since, until))
+        return analytics.pool_size_stats(games, self._finished_winners(since, until))
+
+    async def fairness(self, since=None, until=None, bins=10, limit=100):
+        # (created_at, live state or None, archived (entry, data) or None)
+        games = [(state.doc["created_at"], state, None) for state in self._finished(since, until) if state.doc["winner_count"]]
+        games += [(entry["created_at"], None, (entry, data)) for entry, data in self._archived(since, until) if entry["winner_count"]]
+        games.sort(key=lambda game: game[0], reverse=True)
+        reports = []
+        for _, state, archived in games[:limit]:
+            if archived is not None:
+                reports.append(archive.fairness(*archived, bins))
+                continue
+            entries = [entry for batch in state.batches for entry in batch]
+            if not entries:
+                continue
+            reports.append(analytics.fairness_report(
+                state.doc["_id"], state.doc["created_at"],
+                [entry.tickets for entry in entries], [entry.won_version is not None for entry in entries], bins
+            ))
+        return reports
+
+    # Event log
+
+    async def store_event(self, event):
+        events = self._events.setdefault(str(event["game_id"]), [])
+        index = bisect_left([stored["version"] for stored in events], event["version"])
+        if index < len(events) and events[index]["version"] == event["version"]:
+            events[index] = event
+        else:
+            events.insert(index, event)
+        self._dirty = True
+
+    async def iter_events(self, game_id, after=None, until=None, limit=None):
+        returned = 0
+        for event in list(self._events.get(str(game_id), ())):
+            if limit is not None and returned >= limit:
+                return
+            if after is not None and event["version"] <= after:
+                continue
+            if until is not None and event["version"] > until:
+                return
+            returned += 1
+            yield dict(event, game_id=str(event["game_id"]))
+
+    async def find_snapshot(self, game_id, version=None):
+        candidates = [
+            snapshot for snapshot in self._event_snapshots.get(str(game_id), ())
+            if version is None or snapshot["version"] <= version
+        ]
+        return candidates[-1] if candidates else None
+
+    async def store_snapshot(self, snapshot):
+        snapshots = self._event_snapshots.setdefault(str(snapshot["game_id"]), [])
+        snapshots[:] = sorted(
+            [stored for stored in snapshots if stored["version"] != snapshot["version"]] + [snapshot],
+            key=lambda stored: stored["version"]
+        )
+
+    # Snapshots
+
+    async def snapshot(self):
+        """Write every game to the snapshot file if anything changed since the last one"""
+        if not self.snapshot_path or not self._dirty:
+            return
+        async with self._lock:
+            data = self._dump()
+            self._dirty = False
+        await asyncio.to_thread(self._write_snapshot, data)
+
+    async def _snapshot_loop(self):
+        while True:
+            await asyncio.sleep(self.snapshot_interval)
+            try:
+                await self.snapshot()
+            except OSError:
+                logger.exception(f"Could not write snapshot {self.snapshot_path}")
+
+    def _dump(self):
+        games = []
+        for state in self._games.values():
+            games.append({
+                "doc": state.doc.copy(),
+                "next_seq": state.next_seq,
+                "participants": [
+                    [entry.seq, entry.name, entry.tickets, entry.won_version]
+                    for batch in state.batches for entry in batch
+                ],
+                "winners": [dict(winner) for winner in state.winners[:state.doc["winner_count"]]],
+                "events": list(self._events.get(str(state.doc["_id"]), ()))
+            })
+        archived = [
+            {"entry": entry, "data": base64.b64encode(data).decode()} for entry, data in self._archive.values()
+        ]
+        return {"active_id": self._active_id, "games": games, "archive": archived}
+
+    def _write_snapshot(self, data):
+        temporary = f"{self.snapshot_path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as snapshot:
+            json.dump(data, snapshot, default=archive.encode, ensure_ascii=False)
+        os.replace(temporary, self.snapshot_path)
+
+    def _read_snapshot(self):
+        with open(self.snapshot_path, encoding="utf-8") as snapshot:
+            return json.load(snapshot, object_hook=archive.decode)
+
+    def _restore(self, data):
+        self._games = {}
+        self._events = {}
+        for saved in data["games"]:
+            state = MemoryGame(saved["doc"])
+            batch = []
+            for seq, name, tickets, won_version in saved["participants"]:
+                entry = Entry(seq, name, tickets)
+                entry.won_version = won_version
+                batch.append(entry)
+            state.batches = (batch,)
+            state.remaining = {entry.seq: entry for entry in batch if entry.won_version is None}
+            state.next_seq = saved["next_seq"]
+            state.winners = saved["winners"]
+            game_id = str(state.doc["_id"])
+            self._games[game_id] = state
+            if saved.get("events"):
+                self._events[game_id] = saved["events"]
+        self._archive = {
+            str(archived["entry"]["_id"]): (archived["entry"], base64.b64decode(archived["data"]))
+            for archived in data.get("archive", ())
+        }
+        self._active_id = data.get("active_id")
@@ -0,0 +1,925 @@
+from fastapi import HTTPException
+from bson import Binary, ObjectId
+from pymongo import ASCENDING, DESCENDING, DeleteMany, ReplaceOne, ReturnDocument, UpdateMany, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from datetime import datetime, timedelta
+import logging
+import re
+
+from services import analytics, archive
+from services.conditional import precondition_failed
+from services.event_log import APPEND, CREATED, ENDED, MIGRATED, PARTICIPANTS_CHANGED, REPLACE, RESET, SPIN, make_event
+from services.paging import project
+from services.participant_index import search_keys
+from storage.base import GameRepository, to_model, to_winner
+
+logger = logging.getLogger(__name__)
+
+# Participant document status
+ACTIVE = "active"
+WON = "won"
+
+# Participant documents written per insert_many
+INSERT_BATCH_SIZE = 5_000
+# Creating a game can race with another create for the single active slot
+CREATE_GAME_RETRIES = 3
+DUPLICATE_KEY_ERROR = 11000
+# Packed games are split into documents of at most this size, well below
+# MongoDB's 16 MB document limit
+ARCHIVE_SEGMENT_BYTES = 8 * 1024 * 1024
+# Archive moves unfinished after this long were interrupted, not in progress
+INTERRUPTED_ARCHIVE_SECONDS = 10 * 60
+
+WINNER_FIELDS = {"_id": 0, "name": 1, "position": 1, "timestamp": 1, "total_participants": 1, "draw_seed": 1}
+# Archive index entries as returned; their winners are only read by analytics
+ARCHIVED_FIELDS = {"purged": 0, "winners": 0}
+
+
+def participant_filter(game):
+    """Participants visible at the game document's version.
+
+    Inserted participants only become visible once their batch is committed
+    to the game document, and a drawn participant stays visible to readers
+    of the versions before the draw.
+    """
+    return {
+        "game_id": game["_id"],
+        "batch": {"$in": game.get("batches", [])},
+        "$or": [{"status": ACTIVE}, {"won_version": {"$gt": game.get("version", 0)}}]
+    }
+
+
+def winner_filter(game, after=None):
+    """Winners committed at the game document's version, optionally after a position"""
+    position = {"$lte": game.get("winner_count", 0)}
+    if after is not None:
+        position["$gt"] = after
+    return {"game_id": game["_id"], "position": position}
+
+
+def as_object_id(game_id):
+    """Game ids are ObjectIds in every collection; routes pass them as strings"""
+    return ObjectId(game_id) if isinstance(game_id, str) and ObjectId.is_valid(game_id) else game_id
+
+
+def created_filter(since=None, until=None, **query):
+    """`query`, narrowed to documents created in [since, until)"""
+    created_at = {}
+    if since is not None:
+        created_at["$gte"] = since
+    if until is not None:
+        created_at["$lt"] = until
+    if created_at:
+        query["created_at"] = created_at
+    return query
+
+
+def finished_filter(since=None, until=None):
+    """Games replaced as the active game, optionally created in [since, until)"""
+    return created_filter(since, until, ended_at={"$exists": True})
+
+
+def archived_union(since=None, until=None):
+    """$unionWith stage adding the archived games created in [since, until), with the winners their index entries keep"""
+    return {
+        "$unionWith": {
+            "coll": "archived_games",
+            "pipeline": [{"$match": created_filter(since, until)}, {"$project": {"winners": 1}}]
+        }
+    }
+
+
+def winners_lookup(fields):
+    """$lookup stage adding each game's committed winners, with `fields`, as `winners`"""
+    return {
+        "$lookup": {
+            "from": "winners",
+            "let": {"game_id": "$_id", "winner_count": {"$ifNull": ["$winner_count", 0]}},
+            "pipeline": [
+                {"$match": {"$expr": {"$and": [
+                    {"$eq": ["$game_id", "$$game_id"]},
+                    {"$lte": ["$position", "$$winner_count"]}
+                ]}}},
+                {"$project": {"_id": 0, **fields}}
+            ],
+            "as": "winners"
+        }
+    }
+
+
+async def ignore_duplicates(write):
+    """Run an idempotent write, tolerating rows that already exist"""
+    try:
+        return await write
+    except DuplicateKeyError:
+        return None
+    except BulkWriteError as error:
+        if any(e.get("code") != DUPLICATE_KEY_ERROR for e in error.details.get("writeErrors", [])):
+            raise
+        return None
+
+
+def event_write(event):
+    """Upsert of a logged event, keyed by game and version"""
+    event = dict(event, game_id=as_object_id(event["game_id"]))
+    return ReplaceOne({"game_id": event["game_id"], "version": event["version"]}, event, upsert=True)
+
+
+class MongoGameRepository(GameRepository):
+    """Games, participants and winners stored in separate collections.
+
+    The game document is small and holds the counters that define what is
+    visible: committed participant `batches`, `winner_count` and `version`.
+    Participants and winners are written first and then committed with a
+    single update of the game document, so readers never see half a write.
+    Draws are committed as a `pending` record on the game document and then
+    rolled forward into the other collections by whoever reads it next.
+
+    With a `group_commit` (storage.group_commit.GroupCommit), those roll
+    forwards, event log writes and stale batch clean-ups of concurrent
+    requests share bulk writes. The version-guarded updates of the game
+    document stay one round trip each, as a bulk write can't tell which of
+    its conditional updates matched.
+    """
+
+    def __init__(self, db, group_commit=None):
+        self.db = db
+        self.group_commit = group_commit
+        self.games = db.games
+        self.participants = db.participants
+        self.winners = db.winners
+        self.events = db.game_events
+        self.snapshots = db.game_snapshots
+        self.archived = db.archived_games
+        self.archive_segments = db.archive_segments
+
+    async def start(self):
+        await self.ensure_indexes()
+        await self.migrate_embedded_games()
+        await self.backfill_ended_at()
+        await self.backfill_search_keys()
+
+    async def close(self):
+        if self.group_commit is not None:
+            await self.group_commit.close()
+
+    async def ensure_indexes(self):
+        # At most one game may be active; older deployments could have left
+        # several, so keep the newest one before enforcing the invariant
+        active_ids = [
+            game["_id"] async for game in self.games.find(
+                {"is_active": True}, {"_id": 1}
+            ).sort("created_at", DESCENDING)
+        ]
+        if len(active_ids) > 1:
+            logger.warning(f"Found {len(active_ids)} active games, deactivating all but the newest")
+            now = datetime.utcnow()
+            for game_id in active_ids[1:]:
+                await self._end_game({"_id": game_id, "is_active": True}, now)
+
+        await self.games.create_index(
+            [("is_active", ASCENDING)],
+            name="single_active_game",
+            unique=True,
+            partialFilterExpression={"is_active": True}
+        )
+        # Analytics select finished games by creation time
+        await self.games.create_index(
+            [("created_at", DESCENDING)],
+            name="finished_created_at",
+            partialFilterExpression={"ended_at": {"$exists": True}}
+        )
+        # The archiver selects finished games by last write
+        await self.games.create_index(
+            [("updated_at", ASCENDING)],
+            name="finished_updated_at",
+            partialFilterExpression={"ended_at": {"$exists": True}}
+        )
+        await self.participants.create_index(
+            [("game_id", ASCENDING), ("seq", ASCENDING)], name="game_seq", unique=True
+        )
+        await self.participants.create_index(
+            [("game_id", ASCENDING), ("status", ASCENDING), ("seq", ASCENDING)], name="game_status_seq"
+        )
+        await self.participants.create_index(
+            [("game_id", ASCENDING), ("won_version", ASCENDING)],
+            name="game_won_version",
+            partialFilterExpression={"won_version": {"$exists": True}}
+        )
+        # Anchored prefix searches on the folded names of one game
+        await self.participants.create_index(
+            [("game_id", ASCENDING), ("search_keys", ASCENDING)], name="game_search_keys"
+        )
+        await self.winners.create_index(
+            [("game_id", ASCENDING), ("position", ASCENDING)], name="game_position", unique=True
+        )
+        await self.events.create_index(
+            [("game_id", ASCENDING), ("version", ASCENDING)], name="game_version", unique=True
+        )
+        await self.snapshots.create_index(
+            [("game_id", ASCENDING), ("version", ASCENDING)], name="game_version", unique=True
+        )
+        await self.archived.create_index([("created_at", DESCENDING)], name="created_at")
+        await self.archive_segments.create_index(
+            [("game_id", ASCENDING), ("n", ASCENDING)], name="game_segment", unique=True
+        )
+
+    # Reads
+
+    async def find_active(self):
+        """Return the active game document, with any pending draw applied"""
+        game = await self.games.find_one({"is_active": True})
+        if game and game.get("pending"):
+            game = await self.apply_pending(game)
+        return game
+
+    async def find_game(self, game_id):
+        """Return a game document by id, with any pending draw applied"""
+        if not ObjectId.is_valid(game_id):
+            return None
+        game = await self.games.find_one({"_id": ObjectId(game_id)})
+        if game and game.get("pending"):
+            game = await self.apply_pending(game)
+        return game
+
+    async def load_game(self, game, fields=None):
+        """Assemble the API Game for a game document.
+
+        With `fields`, only the collections backing those fields are read and
+        the returned Game has just those fields set.
+        """
+        wanted = lambda field: fields is None or field in fields
+        participants, tickets, winners = [], [], []
+        if wanted("participants") or wanted("tickets"):
+            async for entry in self.participants.find(
+                participant_filter(game), {"_id": 0, "name": 1, "tickets": 1}
+            ).sort("seq", ASCENDING):
+                participants.append(entry["name"])
+                tickets.append(entry.get("tickets", 1))
+        if wanted("winners"):
+            winners = [to_winner(winner) async for winner in self.iter_winners(game)]
+        return project(to_model(game, participants, tickets, winners), fields)
+
+    async def load_pool_entries(self, game):
+        """Return seqs, names and tickets of the visible participants, in order"""
+        seqs, names, tickets = [], [], []
+        async for entry in self.participants.find(
+            participant_filter(game), {"_id": 0, "seq": 1, "name": 1, "tickets": 1}
+        ).sort("seq", ASCENDING):
+            seqs.append(entry["seq"])
+            names.append(entry["name"])
+            tickets.append(entry.get("tickets", 1))
+        return seqs, names, tickets
+
+    async def iter_participant_names(self, game):
+        async for entry in self.participants.find(
+            participant_filter(game), {"_id": 0, "name": 1}
+        ).sort("seq", ASCENDING):
+            yield entry["name"]
+
+    async def iter_participants(self, game, after=None, limit=None):
+        """Yield `{seq, name}` participant documents in order, paging on seq"""
+        query = participant_filter(game)
+        if after is not None:
+            query["seq"] = {"$gt": after}
+        cursor = self.participants.find(query, {"_id": 0, "seq": 1, "name": 1}).sort("seq", ASCENDING)
+        if limit is not None:
+            cursor = cursor.limit(limit)
+        async for entry in cursor:
+            yield entry
+
+    async def iter_winners(self, game, after=None, limit=None):
+        """Yield winner documents by position, paging on the (game_id, position) index"""
+        cursor = self.winners.find(winner_filter(game, after), WINNER_FIELDS).sort("position", ASCENDING)
+        if limit is not None:
+            cursor = cursor.limit(limit)
+        async for winner in cursor:
+            yield winner
+
+    async def last_winner(self, game):
+        if not game.get("winner_count"):
+            return None
+        return await self.winners.find_one(
+            {"game_id": game["_id"], "position": game["winner_count"]}, WINNER_FIELDS
+        )
+
+    async def search_participants(self, game, prefix, limit):
+        """Prefix search on the (game_id, search_keys) index"""
+        query = participant_filter(game)
+        query["search_keys"] = {"$regex": f"^{re.escape(prefix)}"}
+        cursor = self.participants.find(query, {"_id": 0, "seq": 1, "name": 1}).sort("seq", ASCENDING).limit(limit)
+        return [entry async for entry in cursor]
+
+    # Participant writes
+
+    async def _insert_participants(self, game_id, batch, seq_base, names, tickets=None):
+        for start in range(0, len(names), INSERT_BATCH_SIZE):
+            docs = [
+                {
+                    "game_id": game_id,
+                    "seq": seq_base + i,
+                    "batch": batch,
+                    "name": names[i],
+                    "search_keys": search_keys(names[i]),
+                    "tickets": tickets[i] if tickets is not None else 1,
+                    "status": ACTIVE
+                }
+                for i in range(start, min(start + INSERT_BATCH_SIZE, len(names)))
+            ]
+            await ignore_duplicates(self.participants.insert_many(docs, ordered=False))
+
+    async def _allocate(self, game_id, count):
+        """Reserve a batch id and `count` sequence numbers for new participants"""
+        game = await self.games.find_one_and_update(
+            {"_id": game_id},
+            {"$inc": {"next_batch": 1, "next_seq": count}},
+            projection={"next_batch": 1, "next_seq": 1, "list_epoch": 1},
+            return_document=ReturnDocument.BEFORE
+        )
+        if not game:
+            raise HTTPException(status_code=404, detail="No active game found")
+        return game.get("next_batch", 0), game.get("next_seq", 0), game.get("list_epoch", 0)
+
+    async def _drop_older_batches(self, game_id, batch):
+        # Batches allocated before `batch` can no longer be committed
+        stale = {"game_id": game_id, "batch": {"$lt": batch}}
+        if self.group_commit is not None:
+            await self.group_commit.write([(self.participants, [DeleteMany(stale)])])
+        else:
+            await self.participants.delete_many(stale)
+
+    async def replace_participants(self, game, names, tickets=None, extra_set=None, expected_version=None):
+        """Replace the participant list of a game, keeping its winners.
+
+        With `expected_version` the replace only happens at that version.
+        """
+        updated, seq_base = await self._replace(game, names, tickets, extra_set, expected_version)
+        await self.record_event(
+            game["_id"], updated["version"], PARTICIPANTS_CHANGED,
+            mode=REPLACE, participants=names, tickets=tickets, first_seq=seq_base
+        )
+        return updated
+
+    async def _replace(self, game, names, tickets, extra_set, expected_version):
+        batch, seq_base, _ = await self._allocate(game["_id"], len(names))
+        await self._insert_participants(game["_id"], batch, seq_base, names, tickets)
+        query = {"_id": game["_id"]}
+        if expected_version is not None:
+            query["version"] = expected_version
+        updated = await self.games.find_one_and_update(
+            query,
+            {
+                "$set": {
+                    "batches": [batch],
+                    "participant_count": len(names),
+                    "weighted": tickets is not None,
+                    "updated_at": datetime.utcnow(),
+                    **(extra_set or {})
+                },
+                "$inc": {"version": 1, "list_epoch": 1}
+            },
+            return_document=ReturnDocument.AFTER
+        )
+        if not updated:
+            await self.participants.delete_many({"game_id": game["_id"], "batch": batch})
+            if expected_version is not None:
+                raise precondition_failed()
+            raise HTTPException(status_code=404, detail="No active game found")
+        await self._drop_older_batches(game["_id"], batch)
+        return updated, seq_base
+
+    async def append_participants(self, game, names, expected_version=None):
+        """Append participants to a game without touching existing ones"""
+        batch, seq_base, epoch = await self._allocate(game["_id"], len(names))
+        await self._insert_participants(game["_id"], batch, seq_base, names)
+        # A replace or reset in between makes this batch stale
+        query = {"_id": game["_id"], "list_epoch": epoch if epoch else {"$in": [0, None]}}
+        if expected_version is not None:
+            query["version"] = expected_version
+        updated = await self.games.find_one_and_update(
+            query,
+            {
+                "$push": {"batches": batch},
+                "$inc": {"participant_count": len(names), "version": 1},
+                "$set": {"updated_at": datetime.utcnow()}
+            },
+            return_document=ReturnDocument.AFTER
+        )
+        if not updated:
+            await self.participants.delete_many({"game_id": game["_id"], "batch": batch})
+            if expected_version is not None:
+                raise precondition_failed()
+            raise HTTPException(status_code=409, detail="Participants were replaced concurrently, please retry")
+        await self.record_event(
+            game["_id"], updated["version"], PARTICIPANTS_CHANGED, mode=APPEND, participants=names, first_seq=seq_base
+        )
+        return updated
+
+    # Game lifecycle
+
+    async def create_game(self, names, tickets=None, only_if_missing=False, expected=None, activate=True):
+        """Create and activate a game, deactivating the current one.
+
+        With `only_if_missing` the current active game, if any, wins instead.
+        With `expected`, the current game document, it is only replaced while
+        it is still at that document's version. With `activate=False` the
+        game is a standalone room and no other game is touched.
+        """
+        now = datetime.utcnow()
+        game = {
+            "_id": ObjectId(),
+            "batches": [0],
+            "next_batch": 1,
+            "next_seq": len(names),
+            "list_epoch": 0,
+            "participant_count": len(names),
+            "winner_count": 0,
+            "weighted": tickets is not None,
+            "created_at": now,
+            "updated_at": now,
+            "is_active": activate,
+            "version": 0
+        }
+        # Participants first: they stay invisible until the game exists
+        await self._insert_participants(game["_id"], 0, 0, names, tickets)
+        if not activate:
+            await self.games.insert_one(game)
+            await self._record_created(game, names, tickets)
+            return game
+
+        if expected is not None:
+            replaced = await self._end_game(
+                {"_id": expected["_id"], "is_active": True, "version": expected.get("version", 0)}, now
+            )
+            if not replaced:
+                await self.participants.delete_many({"game_id": game["_id"]})
+                raise precondition_failed()
+
+        for attempt in range(CREATE_GAME_RETRIES):
+            if not only_if_missing:
+                # Only the single active game needs deactivating, archived games are untouched
+                await self._end_game({"is_active": True}, now)
+            try:
+                await self.games.insert_one(game)
+            except DuplicateKeyError:
+                if only_if_missing:
+                    break
+                # Another create activated its game in between, deactivate that one too
+                continue
+            await self._record_created(game, names, tickets)
+            return game
+
+        await self.participants.delete_many({"game_id": game["_id"]})
+        if only_if_missing:
+            return await self.find_active()
+        raise HTTPException(status_code=409, detail="Game is being modified concurrently, please retry")
+
+    async def _end_game(self, query, now):
+        """Deactivate the game matching `query` as finished at `now`; returns whether one matched.
+
+        Ending a game is a write of its own, so it gets a version and ETag of its own.
+        """
+        ended = await self.games.find_one_and_update(
+            query,
+            {"$set": {"is_active": False, "ended_at": now}, "$inc": {"version": 1}},
+            projection={"version": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if ended is None:
+            return False
+        await self.record_event(ended["_id"], ended["version"], ENDED)
+        return True
+
+    async def _record_created(self, game, names, tickets):
+        await self.record_event(
+            game["_id"], 0, CREATED, participants=names, tickets=tickets, first_seq=0, is_active=game["is_active"]
+        )
+
+    async def reset_game(self, game, names, expected_version=None):
+        """Restart a game with a fresh participant list and no winners; its event log is kept"""
+        reset_at = datetime.utcnow()
+        updated, seq_base = await self._replace(game, names, None, {"winner_count": 0}, expected_version)
+        if updated.get("pending"):
+            await self.games.update_one(
+                {"_id": game["_id"], "pending.version": updated["pending"]["version"]},
+                {"$unset": {"pending": ""}}
+            )
+            updated.pop("pending")
+        # Winners of later spins overwrite stale positions anyway; this only frees space
+        await self.winners.delete_many({"game_id": game["_id"], "timestamp": {"$lt": reset_at}})
+        await self.record_event(game["_id"], updated["version"], RESET, participants=names, first_seq=seq_base)
+        return updated
+
+    # Draws
+
+    async def commit_draw(self, game, winners, seqs):
+        """Commit drawn winners against the version of `game` they were drawn from.
+
+        Returns the updated game document, or None if the game changed first.
+        """
+        version = game.get("version", 0) + 1
+        pending = {
+            "version": version,
+            "winners": [dict(winner.model_dump(), participant_seq=seq) for winner, seq in zip(winners, seqs)],
+            "seqs": seqs
+        }
+        updated = await self.games.find_one_and_update(
+            {"_id": game["_id"], "version": game.get("version", 0), "pending": {"$exists": False}},
+            {
+                "$set": {"pending": pending, "updated_at": winners[-1].timestamp},
+                "$inc": {"version": 1, "winner_count": len(winners), "participant_count": -len(winners)}
+            },
+            return_document=ReturnDocument.AFTER
+        )
+        if updated is None:
+            return None
+        return await self.apply_pending(updated)
+
+    async def apply_pending(self, game):
+        """Roll a committed draw forward into the winners and participants collections.
+
+        Every step is idempotent, so any reader may finish a draw whose writer
+        went away.
+        """
+        pending = game["pending"]
+        winner_writes = [
+            ReplaceOne(
+                {"game_id": game["_id"], "position": winner["position"]},
+                dict(winner, game_id=game["_id"]),
+                upsert=True
+            )
+            for winner in pending["winners"]
+        ]
+        drawn = {"game_id": game["_id"], "seq": {"$in": pending["seqs"]}}
+        mark_won = {"$set": {"status": WON, "won_version": pending["version"]}}
+        committed = {"_id": game["_id"], "pending.version": pending["version"]}
+        if self.group_commit is not None:
+            event = make_event(game["_id"], pending["version"], SPIN, winners=pending["winners"], seqs=pending["seqs"])
+            await self.group_commit.write([
+                (self.winners, winner_writes),
+                (self.participants, [UpdateMany(drawn, mark_won)]),
+                (self.events, [event_write(event)])
+            ])
+            self.snapshot_if_due(game["_id"], pending["version"])
+            # Only once the rest is written, in a later batch
+            await self.group_commit.write([(self.games, [UpdateOne(committed, {"$unset": {"pending": ""}})])])
+        else:
+            await ignore_duplicates(self.winners.bulk_write(winner_writes, ordered=False))
+            await self.participants.update_many(drawn, mark_won)
+            await self.record_event(
+                game["_id"], pending["version"], SPIN, winners=pending["winners"], seqs=pending["seqs"]
+            )
+            await self.games.update_one(committed, {"$unset": {"pending": ""}})
+        game = dict(game)
+        del game["pending"]
+        return game
+
+    # Event log
+
+    async def store_event(self, event):
+        write = event_write(event)
+        if self.group_commit is not None:
+            await self.group_commit.write([(self.events, [write])])
+        else:
+            await ignore_duplicates(self.events.bulk_write([write]))
+
+    async def iter_events(self, game_id, after=None, until=None, limit=None):
+        query = {"game_id": as_object_id(game_id)}
+        if after is not None or until is not None:
+            query["version"] = {}
+            if after is not None:
+                query["version"]["$gt"] = after
+            if until is not None:
+                query["version"]["$lte"] = until
+        cursor = self.events.find(query, {"_id": 0}).sort("version", ASCENDING)
+        if limit is not None:
+            cursor = cursor.limit(limit)
+        async for event in cursor:
+            event["game_id"] = str(event["game_id"])
+            yield event
+
+    async def find_snapshot(self, game_id, version=None):
+        query = {"game_id": as_object_id(game_id)}
+        if version is not None:
+            query["version"] = {"$lte": version}
+        snapshot = await self.snapshots.find_one(query, {"_id": 0}, sort=[("version", DESCENDING)])
+        if snapshot is not None:
+            snapshot["game_id"] = str(snapshot["game_id"])
+        return snapshot
+
+    async def store_snapshot(self, snapshot):
+        # Documents are capped at 16 MB, so games of several hundred thousand
+        # participants are replayed from their events alone
+        snapshot = dict(snapshot, game_id=as_object_id(snapshot["game_id"]))
+        await ignore_duplicates(self.snapshots.replace_one(
+            {"game_id": snapshot["game_id"], "version": snapshot["version"]}, snapshot, upsert=True
+        ))
+
+    # Cold archive
+
+    async def find_archivable(self, before, limit):
+        cursor = self.games.find(
+            {"ended_at": {"$exists": True}, "updated_at": {"$lt": before}, "pending": {"$exists": False}}
+        ).limit(limit)
+        return [game async for game in cursor]
+
+    async def archive_game(self, game):
+        """Pack a game into `archive_segments`, index it in `archived_games`, then drop its live documents.
+
+        The game document is only deleted while it is still at the version
+        that was packed; otherwise the archive is dropped and the game stays
+        live. The index entry is marked `purged` once the participants,
+        winners and events are gone too.
+        """
+        game_id = game["_id"]
+        participants = [
+            {
+                "seq": entry["seq"],
+                "name": entry["name"],
+                "tickets": entry.get("tickets", 1),
+                "won_version": entry.get("won_version")
+            }
+            async for entry in self.participants.find(
+                {"game_id": game_id, "batch": {"$in": game.get("batches", [])}},
+                {"_id": 0, "seq": 1, "name": 1, "tickets": 1, "won_version": 1}
+            ).sort("seq", ASCENDING)
+        ]
+        winners = [winner async for winner in self.iter_winners(game)]
+        events = [event async for event in self.iter_events(game_id)]
+        codec, data, raw_bytes = archive.pack(game, participants, winners, events)
+        entry = archive.describe(game, codec, data, raw_bytes, winners)
+
+        await self.archive_segments.delete_many({"game_id": game_id})
+        await self.archive_segments.insert_many([
+            {"game_id": game_id, "n": n, "data": Binary(data[start:start + ARCHIVE_SEGMENT_BYTES])}
+            for n, start in enumerate(range(0, len(data), ARCHIVE_SEGMENT_BYTES))
+        ])
+        await self.archived.replace_one({"_id": game_id}, dict(entry, purged=False), upsert=True)
+        deleted = await self.games.delete_one({
+            "_id": game_id, "version": game.get("version", 0), "ended_at": {"$exists": True}, "pending": {"$exists": False}
+        })
+        if not deleted.deleted_count:
+            await self._drop_archive(game_id)
+            return None
+        await self._purge(game_id)
+        return entry
+
+    async def _purge(self, game_id):
+        for collection in (self.participants, self.winners, self.events, self.snapshots):
+            await collection.delete_many({"game_id": game_id})
+        await self.archived.update_one({"_id": game_id}, {"$set": {"purged": True}})
+
+    async def _drop_archive(self, game_id):
+        await self.archived.delete_one({"_id": game_id})
+        await self.archive_segments.delete_many({"game_id": game_id})
+
+    async def finish_archiving(self):
+        """Purge games whose archiver stopped after removing the game document, drop archives of games it never removed"""
+        interrupted_before = datetime.utcnow() - timedelta(seconds=INTERRUPTED_ARCHIVE_SECONDS)
+        async for entry in self.archived.find({"purged": False, "archived_at": {"$lt": interrupted_before}}, {"_id": 1}):
+            if await self.games.find_one({"_id": entry["_id"]}, {"_id": 1}):
+                await self._drop_archive(entry["_id"])
+            else:
+                await self._purge(entry["_id"])
+
+    async def restore_game(self, game_id):
+        """Unpack an archived game into the live collections, game document last.
+
+        Every insert tolerates rows that already exist, so a restore that
+        stopped part way is completed by the next one. The restored game
+        counts as written now, so it isn't archived again right away.
+        """
+        game_id = as_object_id(game_id)
+        entry = await self.archived.find_one({"_id": game_id})
+        if entry is None:
+            return None
+        if not entry.get("purged"):
+            raise HTTPException(status_code=409, detail="Game is being archived, please retry")
+        doc, participants, winners, events = archive.unpack(entry["codec"], await self._archive_data(game_id))
+
+        for start in range(0, len(participants), INSERT_BATCH_SIZE):
+            docs = []
+            for participant in participants[start:start + INSERT_BATCH_SIZE]:
+                restored = {
+                    "game_id": game_id,
+                    "seq": participant["seq"],
+                    "batch": 0,
+                    "name": participant["name"],
+                    "search_keys": search_keys(participant["name"]),
+                    "tickets": participant["tickets"],
+                    "status": ACTIVE if participant["won_version"] is None else WON
+                }
+                if participant["won_version"] is not None:
+                    restored["won_version"] = participant["won_version"]
+                docs.append(restored)
+            await ignore_duplicates(self.participants.insert_many(docs, ordered=False))
+        if winners:
+            await ignore_duplicates(self.winners.insert_many(
+                [dict(winner, game_id=game_id) for winner in winners], ordered=False
+            ))
+        for event in events:
+            await self.store_event(event)
+
+        game = dict(
+            doc,
+            batches=[0],
+            next_batch=1,
+            next_seq=doc.get("next_seq", len(participants)),
+            updated_at=datetime.utcnow()
+        )
+        await ignore_duplicates(self.games.insert_one(game))
+        await self._drop_archive(game_id)
+        return await self.find_game(str(game_id))
+
+    async def _archive_data(self, game_id):
+        return b"".join([
+            segment["data"] async for segment in self.archive_segments.find({"game_id": game_id}).sort("n", ASCENDING)
+        ])
+
+    async def find_archived(self, game_id):
+        return await self.archived.find_one({"_id": as_object_id(game_id)}, ARCHIVED_FIELDS)
+
+    async def iter_archived(self, since=None, until=None, limit=None):
+        cursor = self.archived.find(created_filter(since, until), ARCHIVED_FIELDS).sort("created_at", DESCENDING)
+        if limit is not None:
+            cursor = cursor.limit(limit)
+        async for entry in cursor:
+            yield entry
+
+    # Analytics, over finished games: ones that were replaced as the active
+    # game, live or archived
+
+    async def wins_per_name(self, since=None, until=None, limit=100):
+        pipeline = [
+            {"$match": finished_filter(since, until)},
+            {"$project": {"winner_count": 1}},
+            winners_lookup({"name": 1}),
+            archived_union(since, until),
+            {"$unwind": "$winners"},
+            {"$group": {"_id": "$winners.name", "wins": {"$sum": 1}}},
+            {"$sort": {"wins": DESCENDING, "_id": ASCENDING}},
+            {"$limit": limit},
+            {"$project": {"_id": 0, "name": "$_id", "wins": 1}}
+        ]
+        return [row async for row in self.games.aggregate(pipeline)]
+
+    async def draws_per_day(self, since=None, until=None):
+        pipeline = [
+            {"$match": finished_filter(since, until)},
+            {"$project": {"winner_count": 1}},
+            winners_lookup({"timestamp": 1}),
+            archived_union(since, until),
+            {"$unwind": "$winners"},
+            {"$group": {
+                "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$winners.timestamp"}},
+                "draws": {"$sum": 1}
+            }},
+            {"$sort": {"_id": ASCENDING}},
+            {"$project": {"_id": 0, "day": "$_id", "draws": 1}}
+        ]
+        return [row async for row in self.games.aggregate(pipeline)]
+
+    async def pool_size_stats(self, since=None, until=None):
+        pipeline = [
+            {"$match": finished_filter(since, until)},
+            {"$project": {"winner_count": 1}},
+            winners_lookup({"total_participants": 1}),
+            archived_union(since, until),
+            {"$group": {
+                "_id": None,
+                "games": {"$sum": 1},
+                "draws": {"$sum": {"$size": "$winners"}},
+                "pool_total": {"$sum": {"$sum": "$winners.total_participants"}}
+            }}
+        ]
+        rows = [row async for row in self.games.aggregate(pipeline)]
+        if not rows:
+            return {"games": 0, "draws": 0, "average_pool_size": None}
+        row = rows[0]
+        average = row["pool_total"] / row["draws"] if row["draws"] else None
+        return {"games": row["games"], "draws": row["draws"], "average_pool_size": average}
+
+    async def fairness(self, since=None, until=None, bins=10, limit=100):
+        query = finished_filter(since, until)
+        query["winner_count"] = {"$gt": 0}
+        # Binned in Python like the memory backend and archived games, so every game gets the same bins
+        reports = []
+        async for game in self.games.find(query).sort("created_at", DESCENDING).limit(limit):
+            if game.get("pending"):
+                game = await self.apply_pending(game)
+            tickets, won = [], []
+            async for entry in self.participants.find(
+                {"game_id": game["_id"], "batch": {"$in": game.get("batches", [])}},
+                {"_id": 0, "tickets": 1, "status": 1}
+            ).sort("seq", ASCENDING):
+                tickets.append(entry.get("tickets", 1))
+                won.append(entry["status"] == WON)
+            if tickets:
+                reports.append(analytics.fairness_report(game["_id"], game["created_at"], tickets, won, bins))
+        # Archived games are unpacked for their participant lists, only those among the newest `limit`
+        archived = self.archived.find(
+            created_filter(since, until, winner_count={"$gt": 0}), {"created_at": 1, "codec": 1}
+        ).sort("created_at", DESCENDING).limit(limit)
+        async for entry in archived:
+            if len(reports) >= limit and entry["created_at"] <= reports[-1]["created_at"]:
+                break
+            reports.append(archive.fairness(entry, await self._archive_data(entry["_id"]), bins))
+            reports.sort(key=lambda report: report["created_at"], reverse=True)
+            del reports[limit:]
+        return reports
+
+    # Migration
+
+    async def migrate_embedded_games(self):
+        """Move participants and winners embedded in old game documents into their collections"""
+        migrated = 0
+        async for game in self.games.find(
+            {"$or": [{"participants": {"$exists": True}}, {"winners": {"$exists": True}}]}
+        ):
+            names = game.get("participants") or []
+            tickets = game.get("tickets")
+            winners = game.get("winners") or []
+            fields = {
+                "batches": [0],
+                "next_batch": 1,
+                "next_seq": len(names),
+                "list_epoch": 0,
+                "participant_count": len(names),
+                "winner_count": len(winners),
+                "weighted": tickets is not None,
+                "version": game.get("version", 0)
+            }
+            if not game.get("is_active") and "ended_at" not in game:
+                # Embedded games were only ever deactivated by a newer game replacing them
+                fields["ended_at"] = game.get("updated_at", game.get("created_at"))
+            await self._insert_participants(game["_id"], 0, 0, names, tickets)
+            if winners:
+                await ignore_duplicates(self.winners.insert_many(
+                    [dict(winner, game_id=game["_id"]) for winner in winners], ordered=False
+                ))
+            await self.games.update_one(
+                {"_id": game["_id"]},
+                {"$set": fields, "$unset": {"participants": "", "winners": "", "tickets": ""}}
+            )
+            await self.record_event(
+                game["_id"], game.get("version", 0), MIGRATED,
+                participants=names, tickets=tickets, first_seq=0, winners=winners
+            )
+            migrated += 1
+        if migrated:
+            logger.info(f"Migrated {migrated} games to separate participant and winner collections")
+        return migrated
+
+    async def backfill_ended_at(self):
+        """Mark games replaced as the active game before `ended_at` was stored as finished at their last write.
+
+        Rooms are inactive from the start and never finish; their creation
+        event tells them apart.
+        """
+        filled = 0
+        cursor = self.games.find(
+            {"is_active": False, "ended_at": {"$exists": False}}, {"created_at": 1, "updated_at": 1}
+        )
+        while True:
+            games = await cursor.to_list(INSERT_BATCH_SIZE)
+            if not games:
+                break
+            rooms = {
+                event["game_id"] async for event in self.events.find(
+                    {"game_id": {"$in": [game["_id"] for game in games]}, "type": CREATED, "is_active": False},
+                    {"game_id": 1}
+                )
+            }
+            writes = [
+                UpdateOne(
+                    {"_id": game["_id"], "ended_at": {"$exists": False}},
+                    {"$set": {"ended_at": game.get("updated_at", game.get("created_at"))}}
+                )
+                for game in games if game["_id"] not in rooms
+            ]
+            if writes:
+                await self.games.bulk_write(writes, ordered=False)
+                filled += len(writes)
+        if filled:
+            logger.info(f"Marked {filled} games replaced before they were timestamped as finished")
+        return filled
+
+    async def backfill_search_keys(self):
+        """Add the search keys to participants written before they were stored"""
+        filled = 0
+        while True:
+            missing = [
+                entry async for entry in self.participants.find(
+                    {"search_keys": {"$exists": False}}, {"name": 1}
+                ).limit(INSERT_BATCH_SIZE)
+            ]
+            if not missing:
+                break
+            await self.participants.bulk_write([
+                UpdateOne({"_id": entry["_id"]}, {"$set": {"search_keys": search_keys(entry["name"])}})
+                for entry in missing
+            ], ordered=False)
+            filled += len(missing)
+        if filled:
+            logger.info(f"Added search keys to {filled} participants")
+        return filled
@@ -0,0 +1,80 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+import time
+
+# Buckets remembered by the in-memory store before the least recently used are dropped
+MAX_MEMORY_BUCKETS = 100_000
+# Shared buckets untouched this long are removed, and start out full again
+IDLE_BUCKET_SECONDS = 10 * 60
+
+
+class MemoryRateLimitStore:
+    """Token buckets of this worker, in a bounded LRU.
+
+    Each worker enforces the limits on its own, so with several workers a
+    client can get up to one burst per worker.
+    """
+
+    def __init__(self, max_buckets=MAX_MEMORY_BUCKETS, clock=time.monotonic):
+        self.max_buckets = max_buckets
+        self.clock = clock
+        # key -> (tokens, refilled_at)
+        self._buckets = OrderedDict()
+
+    async def start(self):
+        pass
+
+    async def take(self, key, rate, burst, cost=1):
+        """Take `cost` tokens from `key`'s bucket; return 0 or the seconds until they are available"""
+        now = self.clock()
+        bucket = self._buckets.get(key)
+        tokens = burst if bucket is None else min(burst, bucket[0] + (now - bucket[1]) * rate)
+        wait = 0.0
+        if tokens >= cost:
+            tokens -= cost
+        else:
+            wait = (cost - tokens) / rate
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_buckets:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+class MongoRateLimitStore:
+    """Token buckets shared by all workers, one document per key.
+
+    Refilling and taking happen in a single pipeline update, so concurrent
+    requests from different workers never both spend the same token. Costs
+    a MongoDB round trip per limited request; a TTL index removes buckets
+    that have been idle long enough to be full again.
+    """
+
+    def __init__(self, db):
+        self.buckets = db.rate_limits
+
+    async def start(self):
+        await self.buckets.create_index("expires_at", name="rate_limit_ttl", expireAfterSeconds=0)
+
+    async def take(self, key, rate, burst, cost=1):
+        now = datetime.utcnow()
+        elapsed_seconds = {"$divide": [{"$subtract": [now, {"$ifNull": ["$refilled_at", now]}]}, 1000]}
+        bucket = await self.buckets.find_one_and_update(
+            {"_id": key},
+            [
+                {"$set": {
+                    "tokens": {"$min": [burst, {"$add": [
+                        {"$ifNull": ["$tokens", burst]}, {"$multiply": [elapsed_seconds, rate]}
+                    ]}]},
+                    "refilled_at": now,
+                    "expires_at": now + timedelta(seconds=IDLE_BUCKET_SECONDS)
+                }},
+                {"$set": {"allowed": {"$gte": ["$tokens", cost]}}},
+                {"$set": {"tokens": {"$cond": ["$allowed", {"$subtract": ["$tokens", cost]}, "$tokens"]}}}
+            ],
+            projection={"tokens": 1, "allowed": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return 0.0 if bucket["allowed"] else (cost - bucket["tokens"]) / rate
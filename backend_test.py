@@ -7,6 +7,7 @@ Tests all API endpoints and verifies MongoDB operations
 import requests
 import json
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Dict, List, Any
 
@@ -315,6 +316,51 @@ class RouletteAPITester:
             self.log_test("Multiple Spins Flow", False, f"Exception: {str(e)}")
             return False
     
+    def test_concurrent_spins(self):
+        """Test 11: Parallel spins each get a distinct winner and position"""
+        try:
+            reset_result = self.test_reset_game()
+            if not reset_result:
+                return False
+            
+            # Spin until one participant is left; every spin needs at least two
+            spin_count = len(reset_result.get('participants', [])) - 1
+            
+            def spin_once(_):
+                return requests.post(f"{self.base_url}/api/roulette/spin")
+            
+            with ThreadPoolExecutor(max_workers=spin_count) as executor:
+                responses = list(executor.map(spin_once, range(spin_count)))
+            
+            failed = [r.status_code for r in responses if r.status_code != 200]
+            if failed:
+                self.log_test("Concurrent Spins", False, f"Spins failed with HTTP {failed}")
+                return False
+            
+            winners = [r.json()['winner'] for r in responses]
+            names = [w['name'] for w in winners]
+            positions = sorted(w['position'] for w in winners)
+            
+            if len(set(names)) != spin_count:
+                self.log_test("Concurrent Spins", False, f"Duplicate winners drawn: {names}")
+                return False
+            if positions != list(range(1, spin_count + 1)):
+                self.log_test("Concurrent Spins", False, f"Positions not 1..{spin_count}: {positions}")
+                return False
+            
+            winners_history = self.test_get_winners()
+            if not winners_history or len(winners_history) != spin_count:
+                self.log_test("Concurrent Spins", False, 
+                            f"Winners history incorrect: expected {spin_count}, got {len(winners_history) if winners_history else 0}")
+                return False
+            
+            self.log_test("Concurrent Spins", True, 
+                        f"{spin_count} parallel spins produced distinct winners: {names}")
+            return True
+        except Exception as e:
+            self.log_test("Concurrent Spins", False, f"Exception: {str(e)}")
+            return False
+    
     def run_all_tests(self):
         """Run all tests in sequence"""
         print("🎯 Starting Roulette Backend API Tests")
@@ -331,7 +377,8 @@ class RouletteAPITester:
             self.test_get_winners,
             self.test_spin_with_insufficient_participants,
             self.test_reset_game,
-            self.test_multiple_spins_flow
+            self.test_multiple_spins_flow,
+            self.test_concurrent_spins
         ]
         
         passed = 0
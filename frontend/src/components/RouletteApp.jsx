@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from "react";
+import React, { useState, useEffect, useRef } from "react";
 import RouletteWheel from "./RouletteWheel";
 import ParticipantEditor from "./ParticipantEditor";
 import WinnerHistory from "./WinnerHistory";
@@ -17,6 +17,8 @@ const RouletteApp = () => {
   const [showWinnerModal, setShowWinnerModal] = useState(false);
   const [isLoading, setIsLoading] = useState(true);
   const [isOnline, setIsOnline] = useState(true);
+  // Id of the game on screen, which stream events must name to be applied
+  const gameIdRef = useRef(null);
   const { toast } = useToast();
 
   // Load data on component mount
@@ -24,6 +26,50 @@ const RouletteApp = () => {
     loadGameData();
   }, []);
 
+  // Keep in sync with spins and edits made by other viewers
+  useEffect(() => {
+    // Events without a game_id (a resync after falling behind) apply to any game
+    const forShownGame = (handler) => (data) => {
+      if (data.game_id && data.game_id !== gameIdRef.current) return;
+      handler(data);
+    };
+    const unsubscribe = rouletteApi.subscribeToGame({
+      game: (game) => {
+        // Another game is only shown once it becomes the active one
+        if (game.id !== gameIdRef.current && !game.is_active) return;
+        if (!game.participants) return;
+        gameIdRef.current = game.id;
+        setParticipants(game.participants);
+        setWinners(game.winners || []);
+      },
+      spin: forShownGame(({ winner, removed }) => {
+        setParticipants(prev => removeOnce(prev, removed));
+        setWinners(prev => addWinner(prev, winner));
+      }),
+      draw: forShownGame(({ winners: drawn, removed }) => {
+        setParticipants(prev => removeOnce(prev, removed));
+        setWinners(prev => drawn.reduce(addWinner, prev));
+      }),
+      participants: forShownGame(({ participants }) => setParticipants(participants)),
+      resync: forShownGame(() => loadGameData()),
+    });
+    return unsubscribe;
+  }, []);
+
+  // Drop one entry per removed name; other people may share the winner's name
+  const removeOnce = (list, removed) => {
+    const next = [...list];
+    removed.forEach(name => {
+      const index = next.indexOf(name);
+      if (index !== -1) next.splice(index, 1);
+    });
+    return next;
+  };
+
+  // Spins can arrive both from our own request and from the stream
+  const addWinner = (winners, winner) =>
+    winners.some(w => w.position === winner.position) ? winners : [...winners, winner];
+
   const loadGameData = async () => {
     try {
       setIsLoading(true);
@@ -33,6 +79,7 @@ const RouletteApp = () => {
       await rouletteApi.healthCheck();
       
       const game = await rouletteApi.getCurrentGame();
+      gameIdRef.current = game.id;
       setParticipants(game.participants || []);
       setWinners(game.winners || []);
       
@@ -89,7 +136,7 @@ const RouletteApp = () => {
           
           // Update local state
           setParticipants(spinResult.remaining_participants);
-          setWinners(prev => [...prev, spinResult.winner]);
+          setWinners(prev => addWinner(prev, spinResult.winner));
           
           console.log("✅ Spin completed successfully");
         } catch (error) {
@@ -111,6 +158,7 @@ const RouletteApp = () => {
   const handleResetGame = async () => {
     try {
       const game = await rouletteApi.resetGame();
+      gameIdRef.current = game.id;
       setParticipants(game.participants || []);
       setWinners([]);
       setCurrentWinner(null);
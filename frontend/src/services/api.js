@@ -36,6 +36,34 @@ api.interceptors.response.use(
   }
 );
 
+// Writes that must not run twice carry an Idempotency-Key; retries reuse
+// it, so the server replays the first result instead of drawing again
+const IDEMPOTENT_RETRIES = 3;
+const RETRY_DELAY_MS = 250;
+
+const newIdempotencyKey = () =>
+  window.crypto?.randomUUID?.() ?? `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+
+const postIdempotent = async (url, data) => {
+  const headers = { 'Idempotency-Key': newIdempotencyKey() };
+  for (let attempt = 0; ; attempt += 1) {
+    try {
+      return await api.post(url, data, { headers });
+    } catch (error) {
+      // Retry when no response arrived, the first attempt is still running
+      // or the server shed the request under load
+      const status = error.response && error.response.status;
+      const retriable = !error.response || [409, 429, 503].includes(status);
+      if (!retriable || attempt >= IDEMPOTENT_RETRIES) {
+        throw error;
+      }
+      const retryAfter = Number(error.response && error.response.headers['retry-after']);
+      const delay = retryAfter > 0 ? retryAfter * 1000 : RETRY_DELAY_MS * 2 ** attempt;
+      await new Promise((resolve) => setTimeout(resolve, delay));
+    }
+  }
+};
+
 export const rouletteApi = {
   // Get current game
   getCurrentGame: async () => {
@@ -48,10 +76,21 @@ export const rouletteApi = {
     }
   },
 
+  // Get counts, last winner and version without the participant/winner lists
+  getGameSummary: async () => {
+    try {
+      const response = await api.get('/roulette/game/summary');
+      return response.data;
+    } catch (error) {
+      console.error('Error getting game summary:', error);
+      throw error;
+    }
+  },
+
   // Create new game
   createGame: async (participants = []) => {
     try {
-      const response = await api.post('/roulette/game', { participants });
+      const response = await postIdempotent('/roulette/game', { participants });
       return response.data;
     } catch (error) {
       console.error('Error creating game:', error);
@@ -73,7 +112,7 @@ export const rouletteApi = {
   // Spin the roulette
   spin: async () => {
     try {
-      const response = await api.post('/roulette/spin');
+      const response = await postIdempotent('/roulette/spin');
       return response.data;
     } catch (error) {
       console.error('Error spinning roulette:', error);
@@ -81,6 +120,17 @@ export const rouletteApi = {
     }
   },
 
+  // Draw several winners at once
+  spinBatch: async (count) => {
+    try {
+      const response = await postIdempotent('/roulette/spin/batch', { count });
+      return response.data;
+    } catch (error) {
+      console.error('Error drawing winners:', error);
+      throw error;
+    }
+  },
+
   // Get winners
   getWinners: async () => {
     try {
@@ -114,6 +164,20 @@ export const rouletteApi = {
     }
   },
 
+  // Subscribe to live changes of a game, or of the active game without an id,
+  // pushed by the server (Server-Sent Events)
+  subscribeToGame: (handlers, gameId = null) => {
+    const path = gameId ? `/roulette/games/${gameId}/stream` : '/roulette/stream';
+    const source = new EventSource(`${API_BASE}${path}`);
+    Object.entries(handlers).forEach(([event, handler]) => {
+      source.addEventListener(event, (message) => handler(JSON.parse(message.data)));
+    });
+    source.onerror = (error) => {
+      console.error('❌ Game stream error:', error);
+    };
+    return () => source.close();
+  },
+
   // Health check
   healthCheck: async () => {
     try {
@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException, Request
+
+from services import admission
+from services.admission import WriteAdmission, client_key
+from storage.rate_limits import MemoryRateLimitStore
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_request(forwarded_for=None):
+    headers = [(b"x-forwarded-for", forwarded_for.encode())] if forwarded_for else []
+    return Request({"type": "http", "method": "POST", "path": "/", "headers": headers, "query_string": b"", "client": ("10.0.0.1", 0)})
+
+
+def test_token_bucket_allows_a_burst_then_the_rate():
+    async def run():
+        clock = Clock()
+        store = MemoryRateLimitStore(clock=clock)
+        assert [await store.take("client:a", 2, 3) for _ in range(3)] == [0, 0, 0]
+        assert await store.take("client:a", 2, 3) == pytest.approx(0.5)
+        # Other keys have their own bucket
+        assert await store.take("client:b", 2, 3) == 0
+        clock.now += 0.5
+        assert await store.take("client:a", 2, 3) == 0
+        clock.now += 100
+        # Refilled up to the burst, not beyond
+        assert [await store.take("client:a", 2, 3) for _ in range(4)] == [0, 0, 0, pytest.approx(0.5)]
+
+    asyncio.run(run())
+
+
+def test_the_bucket_store_is_bounded():
+    async def run():
+        store = MemoryRateLimitStore(max_buckets=2)
+        for key in ("a", "b", "c"):
+            await store.take(key, 1, 1)
+        assert list(store._buckets) == ["b", "c"]
+
+    asyncio.run(run())
+
+
+def test_forwarded_for_is_only_trusted_when_enabled(monkeypatch):
+    monkeypatch.setattr(admission, "TRUST_FORWARDED_FOR", False)
+    assert client_key(make_request("1.2.3.4, 10.0.0.9")) == "10.0.0.1"
+    monkeypatch.setattr(admission, "TRUST_FORWARDED_FOR", True)
+    assert client_key(make_request("1.2.3.4, 10.0.0.9")) == "1.2.3.4"
+    assert client_key(make_request()) == "10.0.0.1"
+
+
+def test_writes_beyond_the_slots_and_queue_get_503():
+    async def run():
+        gate = WriteAdmission(limit=1, queue_size=1, queue_timeout=5)
+        release = asyncio.Event()
+
+        async def write():
+            async with gate.slot():
+                await release.wait()
+
+        running = asyncio.create_task(write())
+        queued = asyncio.create_task(write())
+        await asyncio.sleep(0)
+        assert gate.running == 1 and gate.waiting == 1
+        with pytest.raises(HTTPException) as error:
+            await write()
+        assert error.value.status_code == 503 and error.value.headers["Retry-After"] == "1"
+        release.set()
+        await asyncio.gather(running, queued)
+        assert gate.running == 0 and gate.waiting == 0
+
+    asyncio.run(run())
+
+
+def test_queued_writes_give_up_after_the_timeout():
+    async def run():
+        gate = WriteAdmission(limit=1, queue_size=4, queue_timeout=0.01)
+        release = asyncio.Event()
+
+        async def write():
+            async with gate.slot():
+                await release.wait()
+
+        running = asyncio.create_task(write())
+        await asyncio.sleep(0)
+        with pytest.raises(HTTPException) as error:
+            await write()
+        assert error.value.status_code == 503 and gate.waiting == 0
+        release.set()
+        await running
+
+    asyncio.run(run())
+
+
+def test_no_limit_admits_everything():
+    async def run():
+        gate = WriteAdmission(limit=0)
+        async with gate.slot():
+            async with gate.slot():
+                pass
+
+    asyncio.run(run())
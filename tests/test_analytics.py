@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta, timezone
+import asyncio
+import json
+
+import pytest
+from fastapi import Request, Response
+
+from routes.analytics import get_draws_per_day, get_fairness, get_pool_size, get_wins_per_name
+from routes.roulette import spin_roulette
+from services.analytics import analytics_cache
+from services.archive import archive_games
+from storage.memory import MemoryGameRepository
+
+
+@pytest.fixture(autouse=True)
+def clear_reports():
+    analytics_cache.clear()
+    yield
+    analytics_cache.clear()
+
+
+def empty_request():
+    return Request({"type": "http", "method": "POST", "path": "/", "headers": [], "query_string": b""})
+
+
+async def finished_game(repo, names, spins):
+    game = await repo.create_game(names)
+    for _ in range(spins):
+        await spin_roulette(empty_request(), Response(), game_id=str(game["_id"]), repo=repo)
+    return game
+
+
+def test_wins_since_accepts_an_aware_time():
+    async def run():
+        repo = MemoryGameRepository()
+        await finished_game(repo, ["Ann", "Bob", "Cid"], 2)
+        await repo.create_game(["Dee", "Eve"])
+
+        response = await get_wins_per_name(since=datetime(2000, 1, 1, tzinfo=timezone.utc), repo=repo)
+        assert sum(row["wins"] for row in json.loads(response.body)) == 2
+
+        analytics_cache.clear()
+        tomorrow = datetime.now(timezone(timedelta(hours=2))) + timedelta(days=1)
+        response = await get_wins_per_name(since=tomorrow, repo=repo)
+        assert json.loads(response.body) == []
+
+    asyncio.run(run())
+
+
+def test_since_and_until_select_games_by_creation_time():
+    async def run():
+        repo = MemoryGameRepository()
+        first = await finished_game(repo, ["Ann", "Bob"], 1)
+        second = await finished_game(repo, ["Cid", "Dee", "Eve"], 2)
+        await repo.create_game(["Fay", "Gus"])
+        split = (first["created_at"] + (second["created_at"] - first["created_at"]) / 2).replace(tzinfo=timezone.utc)
+
+        older = json.loads((await get_draws_per_day(until=split, repo=repo)).body)
+        newer = json.loads((await get_draws_per_day(since=split, repo=repo)).body)
+        assert sum(row["draws"] for row in older) == 1
+        assert sum(row["draws"] for row in newer) == 2
+
+    asyncio.run(run())
+
+
+def test_only_replaced_games_count_as_finished():
+    async def run():
+        repo = MemoryGameRepository()
+        room = await repo.create_game(["Ann", "Bob"], activate=False)
+        await spin_roulette(empty_request(), Response(), game_id=str(room["_id"]), repo=repo)
+        await finished_game(repo, ["Cid", "Dee", "Eve"], 1)
+
+        assert json.loads((await get_wins_per_name(repo=repo)).body) == []
+
+        await repo.create_game(["Fay", "Gus"])
+        analytics_cache.clear()
+        assert [row["name"] for row in json.loads((await get_wins_per_name(repo=repo)).body)][0] in ("Cid", "Dee", "Eve")
+
+    asyncio.run(run())
+
+
+def test_archived_games_stay_in_the_reports():
+    async def run():
+        repo = MemoryGameRepository()
+        await finished_game(repo, ["Ann", "Bob", "Cid", "Dee"], 2)
+        await finished_game(repo, ["Eve", "Fay", "Gus"], 1)
+        await repo.create_game(["Hal", "Ida"])
+        before = [json.loads((await report(repo=repo)).body) for report in (get_wins_per_name, get_pool_size, get_fairness)]
+
+        assert await archive_games(repo, older_than_days=-1) == 2
+        analytics_cache.clear()
+        after = [json.loads((await report(repo=repo)).body) for report in (get_wins_per_name, get_pool_size, get_fairness)]
+        assert after == before
+        assert after[1]["games"] == 2 and after[1]["draws"] == 3
+
+    asyncio.run(run())
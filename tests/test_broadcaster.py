@@ -0,0 +1,60 @@
+from services.broadcaster import Broadcaster, change_to_events
+
+
+def frames(subscription):
+    received = []
+    while not subscription.queue.empty():
+        received.append(subscription.queue.get_nowait())
+    return received
+
+
+def spin(game_id, version):
+    return {"game_id": game_id, "version": version, "winner": {"name": "Ann"}, "removed": ["Ann"]}
+
+
+def test_events_reach_the_subscribers_of_their_game():
+    broadcaster = Broadcaster()
+    broadcaster.activate("active")
+    following = broadcaster.subscribe()
+    room = broadcaster.subscribe("room")
+    active = broadcaster.subscribe("active")
+
+    broadcaster.publish("spin", spin("room", 1))
+    broadcaster.publish("spin", spin("active", 1))
+    broadcaster.publish("spin", spin("elsewhere", 1))
+
+    assert ['"game_id":"room"' in frame for frame in frames(room)] == [True]
+    assert ['"game_id":"active"' in frame for frame in frames(following)] == [True]
+    assert ['"game_id":"active"' in frame for frame in frames(active)] == [True]
+
+
+def test_subscribers_of_the_active_game_follow_a_new_one():
+    broadcaster = Broadcaster()
+    broadcaster.activate("old")
+    following = broadcaster.subscribe()
+    old = broadcaster.subscribe("old")
+
+    broadcaster.activate("new")
+    broadcaster.publish("game", {"id": "new", "is_active": True, "version": 0})
+    broadcaster.publish("spin", spin("old", 2))
+
+    assert [frame.split("\n")[1] for frame in frames(following)] == ["event: game"]
+    assert [frame.split("\n")[1] for frame in frames(old)] == ["event: spin"]
+
+
+def test_unsubscribing_the_last_subscriber_stops_local_events():
+    broadcaster = Broadcaster()
+    subscriptions = [broadcaster.subscribe("room"), broadcaster.subscribe()]
+    assert broadcaster.subscriber_count == 2 and broadcaster.wants_local_events
+    for subscription in subscriptions:
+        broadcaster.unsubscribe(subscription)
+    assert broadcaster.subscriber_count == 0 and not broadcaster.wants_local_events
+
+
+def test_change_stream_draws_name_their_game():
+    change = {
+        "operationType": "update",
+        "fullDocument": {"_id": "room", "version": 3},
+        "updateDescription": {"updatedFields": {"pending": {"version": 3, "winners": [{"name": "Ann"}]}}}
+    }
+    assert [(event, data["game_id"]) for event, data in change_to_events(change)] == [("spin", "room")]
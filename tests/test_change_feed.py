@@ -0,0 +1,95 @@
+import asyncio
+import json
+
+from fastapi import Request, Response
+
+from models.game import BatchSpinRequest
+from routes.roulette import get_current_game, get_game_changes, spin_roulette, spin_roulette_batch
+from services.change_feed import APPEND, SPIN, ChangeFeed
+from storage.memory import MemoryGameRepository
+
+
+def make_request():
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": [], "query_string": b""})
+
+
+def test_changes_since_a_version():
+    feed = ChangeFeed(size=8)
+    feed.restart("g", 3)
+    feed.record("g", 4, SPIN, removed=[0])
+    feed.record("g", 5, APPEND, participants=["x"])
+
+    assert [change["version"] for change in feed.since("g", 3, 5)] == [4, 5]
+    assert feed.since("g", 4, 5) == [{"version": 5, "type": APPEND, "participants": ["x"]}]
+    assert feed.since("g", 5, 5) == []
+
+
+def test_unknown_and_out_of_date_feeds_answer_none():
+    feed = ChangeFeed(size=8)
+    assert feed.since("g", 0, 1) is None
+    feed.record("g", 1, SPIN, removed=[0])
+    # The game moved on through a write this worker didn't see
+    assert feed.since("g", 0, 2) is None
+    # A client ahead of the feed
+    assert feed.since("g", 2, 1) is None
+
+
+def test_a_missed_version_restarts_the_feed():
+    feed = ChangeFeed(size=8)
+    feed.record("g", 1, SPIN, removed=[0])
+    feed.record("g", 3, SPIN, removed=[1])
+    assert feed.since("g", 0, 3) is None
+    assert [change["version"] for change in feed.since("g", 2, 3)] == [3]
+
+
+def test_clients_further_behind_than_the_ring_get_none():
+    feed = ChangeFeed(size=2)
+    feed.restart("g", 0)
+    for version in range(1, 5):
+        feed.record("g", version, SPIN, removed=[0])
+    assert feed.since("g", 1, 4) is None
+    assert [change["version"] for change in feed.since("g", 2, 4)] == [3, 4]
+
+
+def test_restart_forgets_earlier_changes():
+    feed = ChangeFeed(size=8)
+    feed.record("g", 1, SPIN, removed=[0])
+    feed.restart("g", 2)
+    assert feed.since("g", 1, 2) is None
+    assert feed.since("g", 2, 2) == []
+
+
+def test_only_the_latest_games_are_kept():
+    feed = ChangeFeed(size=8, max_games=2)
+    for game_id in ("a", "b"):
+        feed.restart(game_id, 0)
+    feed.since("a", 0, 0)
+    feed.restart("c", 0)
+    assert len(feed) == 2
+    assert feed.since("b", 0, 0) is None and feed.since("a", 0, 0) == []
+    feed.discard("a")
+    assert feed.since("a", 0, 0) is None
+
+
+def test_applying_the_changes_route_reproduces_the_game():
+    async def run():
+        repo = MemoryGameRepository()
+        room = await repo.create_game([f"p{i}" for i in range(12)], activate=False)
+        game_id = str(room["_id"])
+        held = json.loads((await get_current_game(make_request(), Response(), game_id=game_id, repo=repo)).body)
+        await spin_roulette(make_request(), Response(), game_id=game_id, repo=repo)
+        await spin_roulette_batch(BatchSpinRequest(count=3), make_request(), Response(), game_id=game_id, repo=repo)
+
+        delta = json.loads((await get_game_changes(make_request(), Response(), since=held["version"], game_id=game_id, repo=repo)).body)
+        participants, winners = held["participants"], held["winners"]
+        for change in delta["changes"]:
+            for position in sorted(change["removed"], reverse=True):
+                del participants[position]
+            winners += change["winners"]
+
+        current = json.loads((await get_current_game(make_request(), Response(), game_id=game_id, repo=repo)).body)
+        assert delta["version"] == current["version"]
+        assert participants == current["participants"]
+        assert [winner["name"] for winner in winners] == [winner["name"] for winner in current["winners"]]
+
+    asyncio.run(run())
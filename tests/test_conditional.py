@@ -0,0 +1,66 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import HTTPException, Request, Response
+
+from models.game import GameCreate
+from routes.roulette import create_game, get_current_game, spin_roulette
+from services.conditional import check_precondition, if_match, make_etag, not_modified
+from storage.memory import MemoryGameRepository
+
+
+def make_request(method="GET", **headers):
+    encoded = [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]
+    return Request({"type": "http", "method": method, "path": "/", "headers": encoded, "query_string": b""})
+
+
+def test_matching_if_none_match_is_not_modified():
+    for header in ('"g.3"', 'W/"g.3"', '"g.2", "g.3"', "*"):
+        cached = not_modified(make_request(if_none_match=header), Response(), "g", 3)
+        assert cached.status_code == 304 and cached.headers["etag"] == make_etag("g", 3)
+
+
+def test_other_versions_get_the_etag_set():
+    response = Response()
+    assert not_modified(make_request(if_none_match='"g.2"'), response, "g", 3) is None
+    assert response.headers["etag"] == '"g.3"'
+    assert not_modified(make_request(), Response(), "g", 3) is None
+
+
+def test_if_match_names_one_game_version():
+    assert if_match(make_request(if_match='"g.7"')) == ("g", 7)
+    assert if_match(make_request(if_match='W/"g.7"')) == ("g", 7)
+    assert if_match(make_request(if_match="*")) is None
+    assert if_match(make_request()) is None
+    for header in ('"g.1", "g.2"', '"g"', '"g.x"'):
+        with pytest.raises(HTTPException) as error:
+            if_match(make_request(if_match=header))
+        assert error.value.status_code == 412
+
+
+def test_preconditions_compare_game_and_version():
+    check_precondition(None, "g", 1)
+    check_precondition(("g", 1), "g", 1)
+    for game_id, version in (("g", 2), ("h", 1)):
+        with pytest.raises(HTTPException) as error:
+            check_precondition(("g", 1), game_id, version)
+        assert error.value.status_code == 412
+
+
+def test_replacing_the_active_game_changes_its_etag():
+    async def run():
+        repo = MemoryGameRepository()
+        old = await repo.create_game(["a", "b", "c"])
+        old_id = str(old["_id"])
+        etag = (await get_current_game(make_request(), Response(), game_id=old_id, repo=repo)).headers["etag"]
+
+        await create_game(GameCreate(participants=["d", "e"]), make_request("POST"), Response(), repo=repo, keys=None, admitted=None)
+        response = await get_current_game(make_request(if_none_match=etag), Response(), game_id=old_id, repo=repo)
+        assert response.status_code == 200 and response.headers["etag"] != etag
+        assert json.loads(response.body)["is_active"] is False
+        with pytest.raises(HTTPException) as error:
+            await spin_roulette(make_request("POST", if_match=etag), Response(), game_id=old_id, repo=repo)
+        assert error.value.status_code == 412
+
+    asyncio.run(run())
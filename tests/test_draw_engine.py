@@ -0,0 +1,90 @@
+from collections import Counter
+import copy
+import pickle
+import random
+
+from services.draw_engine import AuditableRandom, DrawPool, FenwickTree, PoolCache, make_rng
+
+
+def test_fenwick_tree_matches_running_sums():
+    rng = random.Random(7)
+    weights = [rng.randrange(0, 5) for _ in range(37)]
+    tree = FenwickTree(weights)
+    for _ in range(50):
+        index = rng.randrange(len(weights))
+        delta = rng.randrange(-weights[index], 4)
+        weights[index] += delta
+        tree.add(index, delta)
+
+    assert tree.total == sum(weights)
+    assert [tree.prefix_sum(i) for i in range(len(weights) + 1)] == [sum(weights[:i]) for i in range(len(weights) + 1)]
+    for target in range(tree.total):
+        index = tree.find(target)
+        assert sum(weights[:index]) <= target < sum(weights[:index + 1])
+
+
+def test_fenwick_tree_of_nothing():
+    tree = FenwickTree([])
+    assert tree.total == 0 and tree.prefix_sum(0) == 0
+
+
+def test_draw_pool_never_picks_entries_without_tickets():
+    pool = DrawPool(["a", "b", "c", "d"], tickets=[0, 3, 0, 1])
+    rng = random.Random(1)
+    counts = Counter(pool.names[pool.pick(rng)] for _ in range(4_000))
+    assert set(counts) == {"b", "d"}
+    assert 2.5 < counts["b"] / counts["d"] < 3.5
+
+
+def test_sample_draws_distinct_entries_and_leaves_the_pool_as_is():
+    pool = DrawPool([f"p{i}" for i in range(10)], tickets=list(range(1, 11)))
+    drawn = pool.sample(10, random.Random(3))
+    assert sorted(drawn) == list(range(10))
+    assert pool.remaining == 10 and pool.total_tickets == 55
+
+
+def test_positions_count_only_remaining_entries():
+    # Same names stay distinct entries
+    pool = DrawPool(["a", "b", "a", "c"], ids=[10, 11, 12, 13])
+    pool.remove(1)
+    assert [pool.position_of(index) for index in (0, 2, 3)] == [0, 1, 2]
+    assert pool.remaining_names() == ["a", "a", "c"]
+    assert pool.remaining == 3 and pool.total_tickets == 3
+    assert sorted(pool.ids[index] for index in pool.sample(3, random.Random(5))) == [10, 12, 13]
+
+
+def test_auditable_random_replays_from_its_seed():
+    first, second = AuditableRandom("seed"), AuditableRandom("seed")
+    draws = [first.randrange(1_000_000) for _ in range(20)]
+    assert draws == [second.randrange(1_000_000) for _ in range(20)]
+    assert draws != [AuditableRandom("other").randrange(1_000_000) for _ in range(20)]
+
+
+def test_auditable_random_state_round_trips():
+    rng = AuditableRandom("seed")
+    rng.getrandbits(5)
+    state = rng.getstate()
+    expected = [rng.random() for _ in range(5)]
+
+    rng.setstate(state)
+    assert [rng.random() for _ in range(5)] == expected
+    rng.setstate(state)
+    assert copy.deepcopy(rng).random() == expected[0]
+    assert pickle.loads(pickle.dumps(rng)).random() == expected[0]
+
+
+def test_make_rng_only_reports_a_seed_when_audited():
+    rng, seed = make_rng("audited")
+    assert seed is not None and isinstance(rng, AuditableRandom)
+    assert make_rng("secure")[1] is None and make_rng("pseudo")[1] is None
+
+
+def test_pool_cache_keeps_one_version_per_game_and_evicts_the_oldest():
+    cache = PoolCache(max_pools=2)
+    pools = [DrawPool(["a", "b"]) for _ in range(3)]
+    cache.put("one", 1, pools[0])
+    cache.put("two", 1, pools[1])
+    assert cache.get("one", 2) is None
+    assert cache.get("one", 1) is pools[0]
+    cache.put("three", 1, pools[2])
+    assert cache.get("two", 1) is None and len(cache) == 2
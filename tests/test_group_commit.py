@@ -0,0 +1,108 @@
+import asyncio
+
+from pymongo.errors import BulkWriteError
+
+from storage.group_commit import GroupCommit
+from storage.mongo import DUPLICATE_KEY_ERROR
+
+
+class Collection:
+    """Records bulk writes; operations listed in `errors` fail with that code"""
+
+    def __init__(self, name, errors=None):
+        self.full_name = f"test.{name}"
+        self.errors = errors or {}
+        self.calls = []
+        self.written = []
+
+    async def bulk_write(self, operations, ordered):
+        assert ordered
+        self.calls.append(list(operations))
+        for index, operation in enumerate(operations):
+            if operation in self.errors:
+                # Consumed, so a retry of the rest doesn't fail on it again
+                code = self.errors.pop(operation)
+                raise BulkWriteError({"writeErrors": [{"index": index, "code": code, "errmsg": "failed"}]})
+            self.written.append(operation)
+
+
+def test_concurrent_writes_share_one_bulk_write_per_collection():
+    async def run():
+        group = GroupCommit(window=0.01)
+        winners, events = Collection("winners"), Collection("events")
+        await asyncio.gather(
+            group.write([(winners, ["w1", "w2"]), (events, ["e1"])]),
+            group.write([(winners, ["w3"])]),
+            group.write([(events, ["e2"])])
+        )
+        assert winners.calls == [["w1", "w2", "w3"]]
+        assert events.calls == [["e1", "e2"]]
+
+    asyncio.run(run())
+
+
+def test_a_full_batch_is_written_without_waiting():
+    async def run():
+        group = GroupCommit(window=60, max_ops=2)
+        collection = Collection("events")
+        await asyncio.wait_for(asyncio.gather(group.write([(collection, ["a"])]), group.write([(collection, ["b"])])), 1)
+        assert collection.calls == [["a", "b"]]
+
+    asyncio.run(run())
+
+
+def test_duplicate_keys_are_skipped():
+    async def run():
+        group = GroupCommit(window=0.001)
+        collection = Collection("events", errors={"b": DUPLICATE_KEY_ERROR})
+        await asyncio.gather(group.write([(collection, ["a", "b"])]), group.write([(collection, ["c"])]))
+        assert collection.written == ["a", "c"]
+
+    asyncio.run(run())
+
+
+def test_an_error_fails_only_the_write_it_belongs_to():
+    async def run():
+        group = GroupCommit(window=0.001)
+        collection = Collection("events", errors={"b": 121})
+        results = await asyncio.gather(
+            group.write([(collection, ["a"])]),
+            group.write([(collection, ["b"])]),
+            group.write([(collection, ["c"])]),
+            return_exceptions=True
+        )
+        assert results[0] is None and results[2] is None
+        assert isinstance(results[1], BulkWriteError)
+        assert collection.written == ["a", "c"]
+
+    asyncio.run(run())
+
+
+def test_close_writes_the_batch_being_filled():
+    async def run():
+        group = GroupCommit(window=60)
+        collection = Collection("events")
+        write = asyncio.create_task(group.write([(collection, ["a"])]))
+        await asyncio.sleep(0)
+        await group.close()
+        await asyncio.wait_for(write, 1)
+        assert collection.written == ["a"]
+
+    asyncio.run(run())
+
+
+def test_other_failures_fail_every_write_of_the_collection():
+    async def run():
+        class Broken(Collection):
+            async def bulk_write(self, operations, ordered):
+                raise ConnectionError("down")
+
+        group = GroupCommit(window=0.001)
+        broken, fine = Broken("events"), Collection("winners")
+        results = await asyncio.gather(
+            group.write([(broken, ["a"])]), group.write([(fine, ["b"])]), return_exceptions=True
+        )
+        assert isinstance(results[0], ConnectionError) and results[1] is None
+        assert fine.written == ["b"]
+
+    asyncio.run(run())
@@ -0,0 +1,133 @@
+from datetime import timedelta
+import asyncio
+
+import pytest
+from fastapi import HTTPException, Request
+from fastapi.responses import Response
+
+from services.idempotency import idempotent
+from storage.idempotency import IN_PROGRESS_TIMEOUT_SECONDS, MemoryIdempotencyStore
+
+
+def make_request(key=None, body=b"", path="/api/roulette/spin"):
+    headers = [(b"idempotency-key", key.encode())] if key is not None else []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    return Request({"type": "http", "method": "POST", "path": path, "headers": headers, "query_string": b""}, receive)
+
+
+class Write:
+    """A write counting its runs, answering with the run number"""
+
+    def __init__(self):
+        self.runs = 0
+
+    async def __call__(self):
+        self.runs += 1
+        return Response(content=str(self.runs).encode(), headers={"ETag": f'"game.{self.runs}"'})
+
+
+def test_requests_without_a_key_always_run():
+    async def run():
+        keys, write = MemoryIdempotencyStore(), Write()
+        await idempotent(make_request(), keys, write)
+        await idempotent(make_request(), keys, write)
+        assert write.runs == 2
+
+    asyncio.run(run())
+
+
+def test_a_retry_replays_the_first_response():
+    async def run():
+        keys, write = MemoryIdempotencyStore(), Write()
+        first = await idempotent(make_request("k"), keys, write)
+        retry = await idempotent(make_request("k"), keys, write)
+
+        assert write.runs == 1
+        assert retry.body == first.body and retry.status_code == first.status_code
+        assert retry.headers["etag"] == first.headers["etag"]
+        assert retry.headers["idempotent-replayed"] == "true"
+
+    asyncio.run(run())
+
+
+def test_a_key_reused_for_another_request_is_rejected():
+    async def run():
+        keys, write = MemoryIdempotencyStore(), Write()
+        await idempotent(make_request("k", body=b'{"count": 2}'), keys, write)
+        with pytest.raises(HTTPException) as error:
+            await idempotent(make_request("k", body=b'{"count": 3}'), keys, write)
+        assert error.value.status_code == 422 and write.runs == 1
+
+    asyncio.run(run())
+
+
+def test_a_retry_during_the_first_request_is_a_conflict():
+    async def run():
+        keys, started, finish = MemoryIdempotencyStore(), asyncio.Event(), asyncio.Event()
+
+        async def slow():
+            started.set()
+            await finish.wait()
+            return Response(content=b"done")
+
+        first = asyncio.create_task(idempotent(make_request("k"), keys, slow))
+        await started.wait()
+        with pytest.raises(HTTPException) as error:
+            await idempotent(make_request("k"), keys, slow)
+        assert error.value.status_code == 409
+        finish.set()
+        assert (await first).body == b"done"
+
+    asyncio.run(run())
+
+
+def test_a_failed_request_releases_its_key():
+    async def run():
+        keys, write = MemoryIdempotencyStore(), Write()
+
+        async def failing():
+            raise HTTPException(status_code=409, detail="busy")
+
+        with pytest.raises(HTTPException):
+            await idempotent(make_request("k"), keys, failing)
+        assert (await idempotent(make_request("k"), keys, write)).body == b"1"
+
+    asyncio.run(run())
+
+
+def test_keys_must_not_be_empty():
+    async def run():
+        with pytest.raises(HTTPException) as error:
+            await idempotent(make_request(""), MemoryIdempotencyStore(), Write())
+        assert error.value.status_code == 400
+
+    asyncio.run(run())
+
+
+def test_abandoned_and_expired_keys_can_be_claimed_again():
+    async def run():
+        keys = MemoryIdempotencyStore(ttl_seconds=60)
+        assert await keys.claim("lost", "a") is None
+        keys._records["lost"]["created_at"] -= timedelta(seconds=IN_PROGRESS_TIMEOUT_SECONDS + 1)
+        assert await keys.claim("lost", "a") is None
+
+        await keys.claim("old", "a")
+        await keys.save("old", 200, b"{}", {})
+        assert (await keys.claim("old", "a"))["status"] == 200
+        keys._records["old"]["created_at"] -= timedelta(seconds=61)
+        assert await keys.claim("old", "a") is None
+
+    asyncio.run(run())
+
+
+def test_the_memory_store_keeps_the_latest_keys():
+    async def run():
+        keys = MemoryIdempotencyStore(max_keys=2)
+        for key in ("a", "b", "c"):
+            await keys.claim(key, key)
+        assert list(keys._records) == ["b", "c"]
+
+    asyncio.run(run())
@@ -0,0 +1,164 @@
+from datetime import datetime
+import asyncio
+import os
+import random
+
+import pytest
+
+from services import spin_engine
+from services.archive import archive_games
+from services.event_log import rebuild
+from storage.memory import MemoryGameRepository
+from storage.mongo import MongoGameRepository
+
+TEST_DB = "roulette_test"
+LEGACY_AT = datetime(2024, 3, 1, 12, 0)
+
+
+async def scratch_database():
+    """(database, on a server): the MongoDB at TEST_MONGO_URL when set, emptied first, otherwise mongomock"""
+    url = os.environ.get("TEST_MONGO_URL")
+    if url:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        client = AsyncIOMotorClient(url)
+        await client.drop_database(TEST_DB)
+        return client[TEST_DB], True
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    return mongomock_motor.AsyncMongoMockClient()[TEST_DB], False
+
+
+def needs_server(on_server):
+    if not on_server:
+        pytest.skip("mongomock runs neither $lookup pipelines nor $unionWith; set TEST_MONGO_URL")
+
+
+async def insert_legacy_games(db):
+    """An embedded game replaced before this storage existed, with one winner, and the one that replaced it"""
+    finished = await db.games.insert_one({
+        "participants": ["Ann", "Bob", "Cid"],
+        "winners": [{"name": "Dee", "position": 1, "timestamp": LEGACY_AT, "total_participants": 4}],
+        "created_at": LEGACY_AT,
+        "updated_at": LEGACY_AT,
+        "is_active": False
+    })
+    await db.games.insert_one({
+        "participants": ["Eve"],
+        "winners": [],
+        "created_at": LEGACY_AT,
+        "updated_at": LEGACY_AT,
+        "is_active": True
+    })
+    return finished.inserted_id
+
+
+def test_migration_marks_replaced_embedded_games_finished():
+    async def run():
+        db, _ = await scratch_database()
+        game_id = await insert_legacy_games(db)
+        repo = MongoGameRepository(db)
+        await repo.start()
+
+        games = {game["_id"]: game async for game in db.games.find()}
+        assert games[game_id]["ended_at"] == LEGACY_AT
+        assert [game for game in games.values() if "ended_at" not in game] == [
+            game for game in games.values() if game["is_active"]
+        ]
+        assert [report["game_id"] for report in await repo.fairness()] == [str(game_id)]
+
+    asyncio.run(run())
+
+
+def test_backfill_finishes_replaced_games_but_not_rooms():
+    async def run():
+        db, _ = await scratch_database()
+        repo = MongoGameRepository(db)
+        await repo.start()
+        replaced = await repo.create_game(["Ann", "Bob"])
+        await repo.create_game(["Cid"])
+        room = await repo.create_game(["Dee"], activate=False)
+        # As left by a deployment from before games were timestamped when replaced
+        await db.games.update_one({"_id": replaced["_id"]}, {"$unset": {"ended_at": ""}})
+
+        assert await repo.backfill_ended_at() == 1
+        assert "ended_at" in await db.games.find_one({"_id": replaced["_id"]})
+        assert "ended_at" not in await db.games.find_one({"_id": room["_id"]})
+        assert await repo.backfill_ended_at() == 0
+
+    asyncio.run(run())
+
+
+def test_replacing_the_active_game_is_a_logged_write():
+    async def run():
+        db, _ = await scratch_database()
+        repo = MongoGameRepository(db)
+        await repo.start()
+        old = await repo.create_game(["Ann", "Bob"])
+        await repo.create_game(["Cid"])
+
+        ended = await repo.find_game(str(old["_id"]))
+        assert (ended["is_active"], ended["version"]) == (False, old["version"] + 1)
+        state = await rebuild(repo, old["_id"])
+        assert state.version == ended["version"] and state.missing_versions == []
+        assert state.as_dict()["participants"] == ["Ann", "Bob"]
+
+    asyncio.run(run())
+
+
+def test_migrated_finished_games_are_archived_and_restored():
+    async def run():
+        db, _ = await scratch_database()
+        game_id = await insert_legacy_games(db)
+        repo = MongoGameRepository(db)
+        await repo.start()
+
+        assert [game["_id"] for game in await repo.find_archivable(datetime.utcnow(), 10)] == [game_id]
+        assert await archive_games(repo) == 1
+        assert await db.games.find_one({"_id": game_id}) is None
+        assert await db.participants.count_documents({"game_id": game_id}) == 0
+        entry = await repo.find_archived(str(game_id))
+        assert (entry["participant_count"], entry["winner_count"]) == (3, 1)
+
+        restored = await repo.restore_game(str(game_id))
+        game = await repo.load_game(restored)
+        assert game.participants == ["Ann", "Bob", "Cid"]
+        assert [winner.name for winner in game.winners] == ["Dee"]
+        assert restored["ended_at"] == LEGACY_AT
+
+    asyncio.run(run())
+
+
+def test_fairness_bins_the_same_on_every_backend():
+    async def run():
+        db, _ = await scratch_database()
+        mongo = MongoGameRepository(db)
+        await mongo.start()
+        names = [f"p{i}" for i in range(23)]
+        tickets = [1 + i % 4 for i in range(23)]
+        reports = []
+        for repo in (MemoryGameRepository(), mongo):
+            await repo.create_game(names, tickets)
+            await spin_engine.draw(repo, 6, rng=random.Random(7))
+            await repo.create_game(["x", "y"])
+            reports.append(await repo.fairness(bins=10))
+        await archive_games(mongo, -1)
+        reports.append(await mongo.fairness(bins=10))
+
+        rows = [[(row["participants"], row["winners"], row["bins"], row["chi_square"]) for row in report] for report in reports]
+        assert rows[0][0][:3] == (23, 6, 10)
+        assert rows[0] == rows[1] == rows[2]
+
+    asyncio.run(run())
+
+
+def test_analytics_include_migrated_finished_games():
+    async def run():
+        db, on_server = await scratch_database()
+        needs_server(on_server)
+        game_id = await insert_legacy_games(db)
+        repo = MongoGameRepository(db)
+        await repo.start()
+
+        assert await repo.wins_per_name() == [{"name": "Dee", "wins": 1}]
+        assert await repo.draws_per_day() == [{"day": "2024-03-01", "draws": 1}]
+
+    asyncio.run(run())
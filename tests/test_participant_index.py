@@ -0,0 +1,79 @@
+import asyncio
+
+from services.event_log import APPEND, CREATED, PARTICIPANTS_CHANGED, SPIN
+from services.participant_index import ParticipantIndex, ParticipantIndexes, search_key
+from storage.memory import MemoryGameRepository
+
+NAMES = ["Ana García", "Carlos Rodríguez", "María López", "Ana Gómez", "Garcia Ruiz"]
+
+
+def names(results):
+    return [name for _, name, _ in results]
+
+
+def test_search_matches_any_word_ignoring_case_and_accents():
+    index = ParticipantIndex(0, enumerate(NAMES))
+    assert search_key("  MaRÍA   López ") == "maria lopez"
+    assert sorted(names(index.search("garc", 10))) == ["Ana García", "Garcia Ruiz"]
+    assert names(index.search("LOP", 10)) == ["María López"]
+    assert names(index.search("ana", 1)) in (["Ana García"], ["Ana Gómez"])
+
+
+def test_typos_come_after_exact_matches():
+    index = ParticipantIndex(0, enumerate(["Carlos", "Carla", "Marcos"]))
+    assert index.search("carlso", 10) == [(0, "Carlos", False)]
+    assert index.search("carl", 10, typos=False) == [(1, "Carla", True), (0, "Carlos", True)]
+    # Short queries only match exactly
+    assert index.search("crl", 10) == []
+
+
+def test_removed_participants_are_no_longer_found():
+    index = ParticipantIndex(0, enumerate(NAMES))
+    index.remove([0])
+    assert names(index.search("garc", 10)) == ["Garcia Ruiz"]
+    index.remove(range(1, 5))
+    assert index.search("a", 10) == [] and len(index) == 0
+
+
+def test_events_bring_the_index_forward():
+    index = ParticipantIndex(0, enumerate(["Ana", "Bea"]))
+    index.apply({"type": SPIN, "version": 1, "seqs": [0]})
+    index.apply({"type": PARTICIPANTS_CHANGED, "mode": APPEND, "version": 2, "first_seq": 2, "participants": ["Cira"]})
+    assert index.version == 2 and sorted(index.names.values()) == ["Bea", "Cira"]
+    index.apply({"type": CREATED, "version": 3, "first_seq": 0, "participants": ["Dora"]})
+    assert index.names == {0: "Dora"} and names(index.search("bea", 10)) == []
+
+
+def test_duplicates_group_equal_and_one_letter_apart_names():
+    index = ParticipantIndex(0, enumerate(["Ana García", "ana garcia", "Jonathan", "Jonatan", "Li", "Lu"]))
+    assert index.duplicates() == [
+        (True, [(0, "Ana García"), (1, "ana garcia")]),
+        (False, [(2, "Jonathan"), (3, "Jonatan")])
+    ]
+
+
+def test_indexes_catch_up_with_writes_from_the_event_log():
+    async def run():
+        repo = MemoryGameRepository()
+        game = await repo.create_game(["Ana", "Bea"])
+        indexes = ParticipantIndexes()
+        first = await indexes.get(repo, game)
+        game = await repo.append_participants(game, ["Cira"])
+        caught_up = await indexes.get(repo, game)
+
+        assert caught_up is first and caught_up.version == game["version"]
+        assert names(caught_up.search("cir", 10)) == ["Cira"]
+
+        indexes.apply_draw(str(game["_id"]), [0], game["version"] + 1)
+        assert names(caught_up.search("ana", 10)) == []
+
+    asyncio.run(run())
+
+
+def test_big_games_are_not_indexed():
+    async def run():
+        repo = MemoryGameRepository()
+        game = await repo.create_game(["Ana", "Bea", "Cira"])
+        assert await ParticipantIndexes(max_participants=2).get(repo, game) is None
+
+    asyncio.run(run())
@@ -0,0 +1,103 @@
+import asyncio
+import json
+import random
+
+import pytest
+from fastapi import HTTPException, Request, Response
+
+from routes.roulette import spin_roulette
+from services import spin_engine
+from storage.memory import MemoryGameRepository
+
+
+class RoundTripRepository(MemoryGameRepository):
+    """Lets other requests run between reading a game and committing a draw, as a database round trip does"""
+
+    def __init__(self):
+        super().__init__()
+        self.conflicts = 0
+
+    async def find_game(self, game_id):
+        await asyncio.sleep(0)
+        return await super().find_game(game_id)
+
+    async def commit_draw(self, game, winners, seqs):
+        await asyncio.sleep(0)
+        updated = await super().commit_draw(game, winners, seqs)
+        self.conflicts += updated is None
+        return updated
+
+
+def test_batch_draw_commits_distinct_winners_in_one_version():
+    async def run():
+        repo = MemoryGameRepository()
+        game = await repo.create_game([f"p{i}" for i in range(10)])
+        result = await spin_engine.draw(repo, 4, rng=random.Random(2))
+
+        assert result.version == game["version"] + 1
+        assert len({winner.name for winner in result.winners}) == 4
+        assert [winner.position for winner in result.winners] == [1, 2, 3, 4]
+        assert [winner.total_participants for winner in result.winners] == [10, 9, 8, 7]
+        stored = await repo.find_active()
+        assert stored["winner_count"] == 4 and stored["participant_count"] == 6
+        assert sorted(result.pool.remaining_names() + [winner.name for winner in result.winners]) == sorted(
+            f"p{i}" for i in range(10)
+        )
+
+    asyncio.run(run())
+
+
+def test_batch_draw_leaves_one_participant():
+    async def run():
+        repo = MemoryGameRepository()
+        await repo.create_game(["a", "b", "c"])
+        with pytest.raises(HTTPException) as error:
+            await spin_engine.draw(repo, 3)
+        assert error.value.status_code == 400
+        assert len((await spin_engine.draw(repo, 2)).winners) == 2
+
+    asyncio.run(run())
+
+
+def test_draw_against_a_stale_version_is_a_precondition_failure():
+    async def run():
+        repo = MemoryGameRepository()
+        game = await repo.create_game(["a", "b", "c", "d"])
+        await spin_engine.spin(repo)
+        with pytest.raises(HTTPException) as error:
+            await spin_engine.draw(repo, 1, expected=(str(game["_id"]), game["version"]))
+        assert error.value.status_code == 412
+        current = await repo.find_active()
+        assert (await spin_engine.draw(repo, 1, expected=(str(current["_id"]), current["version"]))).version == current["version"] + 1
+
+    asyncio.run(run())
+
+
+def test_concurrent_draws_of_one_game_never_repeat_a_winner():
+    async def run():
+        repo = MemoryGameRepository()
+        game = await repo.create_game([f"p{i}" for i in range(30)])
+        game_id = str(game["_id"])
+        results = await asyncio.gather(*[spin_engine.draw(repo, 2, game_id=game_id) for _ in range(10)])
+
+        winners = [winner for result in results for winner in result.winners]
+        assert len({winner.name for winner in winners}) == 20
+        assert sorted(winner.position for winner in winners) == list(range(1, 21))
+
+    asyncio.run(run())
+
+
+def test_spins_of_the_active_game_queue_with_spins_by_its_id():
+    async def run():
+        repo = RoundTripRepository()
+        game = await repo.create_game([f"p{i}" for i in range(30)])
+        request = Request({"type": "http", "method": "POST", "path": "/", "headers": [], "query_string": b""})
+        results = await asyncio.gather(*[
+            spin_roulette(request, Response(), game_id=game_id, repo=repo)
+            for _ in range(5) for game_id in (None, str(game["_id"]))
+        ])
+
+        assert repo.conflicts == 0
+        assert sorted(json.loads(result.body)["total_winners"] for result in results) == list(range(1, 11))
+
+    asyncio.run(run())